@@ -1,36 +1,30 @@
 import json
-from typing import List, Dict, Any, Callable, Optional
+from typing import List, Dict, Any, Callable, Optional, Tuple, TYPE_CHECKING
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 import requests
 import logging
 import os
-from langchain.agents import AgentExecutor
-from langchain_core.tools import Tool
-from langchain.prompts import MessagesPlaceholder
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import OllamaLLM
-from langchain.chains import LLMChain
-from langchain_community.tools import DuckDuckGoSearchRun
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
-import aiohttp
 import asyncio
 from urllib.parse import urlparse, quote_plus, parse_qs
-from langchain.agents import create_structured_chat_agent
-from Bio import Entrez  # For PubMed API (if needed)
-from transformers import pipeline  # For summarization
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
 import re
 import time
-from selenium.common.exceptions import TimeoutException
+from summarizers import extractive_summarize, key_points
+from knowledge_index import get_knowledge_index
+from fetcher import get_fetcher, MAX_RESPONSE_BYTES
+from dedup import merge_near_duplicates
+from extractors import extract_text
+from pubmed import get_pubmed_client, articles_to_text, PUBMED_TIMEOUT_S
+from deadline import Deadline, DeadlineExceeded, stage_timeout
+from degradation import DegradationPlan, NORMAL_PLAN, get_degradation_controller
+
+# langchain, transformers/torch and selenium are imported lazily where they are
+# used. Pulling them in here costs seconds of worker boot and several hundred MB
+# of memory, and simple-mode chats never touch most of them.
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import Tool
 
 logging.basicConfig(
     level=logging.INFO,
@@ -47,62 +41,86 @@ class MedicalTool(BaseModel):
     function: Callable
 
 
-class AreyaAgent:
-    def __init__(self):
-        # Try to initialize the LLM with error handling
+# Pages shorter than this are summarized extractively; the abstractive model
+# adds seconds of latency without much benefit on short text.
+EXTRACTIVE_MAX_CHARS = int(os.getenv("AREYA_EXTRACTIVE_MAX_CHARS", "4000"))
+# Below this many seconds of latency budget, skip the transformer entirely.
+ABSTRACTIVE_MIN_BUDGET_S = float(os.getenv("AREYA_ABSTRACTIVE_MIN_BUDGET_S", "8"))
+
+# Display names for source domains, checked in order (first substring match wins).
+SOURCE_NAMES = [
+    ("pubmed", "PubMed (National Library of Medicine)"),
+    ("ncbi.nlm.nih.gov", "PubMed (National Library of Medicine)"),
+    ("mayoclinic", "Mayo Clinic"),
+    ("medlineplus", "MedlinePlus (NIH)"),
+    ("nih.gov", "National Institutes of Health"),
+    ("webmd", "WebMD"),
+    ("healthline", "Healthline"),
+    ("cdc.gov", "Centers for Disease Control and Prevention"),
+    ("who.int", "World Health Organization"),
+    ("google.com", "Google Search Results"),
+]
+
+# Stop starting new page scrapes when less than this much of the deadline is left.
+MIN_SCRAPE_BUDGET_S = 3.0
+# Skip the emergency fallback generation when less than this much is left.
+MIN_FALLBACK_BUDGET_S = 5.0
+
+# Scraped page text is cut to this many characters before summarizing/indexing.
+SCRAPE_MAX_CHARS = 20000
+SCRAPE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Shared per worker process: the distilbart weights are ~1 GB, so load them once
+# on first use instead of once per AreyaAgent.
+_summarizer = None
+
+
+def get_summarizer():
+    """Return the process-wide summarization pipeline, loading it on first use."""
+    global _summarizer
+    if _summarizer is None:
         try:
-            self.llm = OllamaLLM(
-            model="gemma3:4b",
-            base_url="http://localhost:11434",
-                temperature=0.7,
-                streaming=False  # Disable streaming to get the complete response at once
+            # Use CPU explicitly since there are compatibility issues with GPU
+            from transformers import pipeline
+            # Use PyTorch backend instead of TensorFlow to avoid the XNNPACK delegate error
+            _summarizer = pipeline(
+                "summarization",
+                model="sshleifer/distilbart-cnn-12-6",
+                framework="pt",  # Use PyTorch instead of TensorFlow
+                device=-1  # Force CPU usage for better compatibility
             )
-            # Test the LLM connection
-            logging.info("Testing Ollama LLM connection...")
-            response = requests.get("http://localhost:11434/api/tags")
-            if response.status_code != 200:
-                logging.warning(
-                    f"Ollama server responded with status code {response.status_code}")
-            else:
-                logging.info("Ollama LLM connection successful")
+            logging.info("Summarization pipeline initialized successfully using PyTorch on CPU")
         except Exception as e:
-            logging.error(f"Failed to initialize Ollama LLM: {e}")
-            self.llm = None  
+            logging.error(f"Failed to initialize summarization pipeline: {e}")
+            # Create a simple fallback summarizer
+            _summarizer = lambda text, **kwargs: [{"summary_text": text[:500] + "..."}]
+    return _summarizer
 
-        # Configure Chrome to run in proper headless mode
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")  # New headless mode
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--window-size=1920,1080")  # Set window size
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-infobars")
-        chrome_options.add_argument("--disable-notifications")
 
-        # Initialize the Chrome driver 
-        try:
-            self.driver = webdriver.Chrome(service=Service(
-                ChromeDriverManager().install()), options=chrome_options)
-            logging.info("Chrome WebDriver initialized in headless mode")
-        except Exception as e:
-            logging.error(f"Failed to initialize Chrome WebDriver: {e}")
-            # Fallback to simpler initialization if ChromeDriverManager fails
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-                logging.info("Chrome WebDriver initialized with fallback method")
-            except Exception as e2:
-                logging.error(f"Chrome WebDriver initialization failed completely: {e2}")
-                raise
+class AreyaAgent:
+    def __init__(self):
+        # The LLM client, Chrome driver, search tool and summarizer are built on
+        # first access (see the properties below) so that simple-mode requests
+        # don't pay for browser startup or model loading.
+        self._llm = None
+        self._llm_initialized = False
+        self._driver = None
+        self._search = None
+        self._tools = None
+        self._prompt = None
 
-        self.search = DuckDuckGoSearchRun()
         self.conversation_history = []
-        self.tools = self._initialize_tools()
-        self.prompt = self._create_prompt()
+        # Optional per-request latency budget (seconds) for summarization; when
+        # set below ABSTRACTIVE_MIN_BUDGET_S the extractive path is used.
+        self.summary_latency_budget = None
 
-        # IMPORTANT: Initialize session to None, not as an aiohttp.ClientSession()
-        # This avoids the "no running event loop" error
-        self.session = None
+        # Research HTTP goes through the per-worker fetch scheduler: per-domain
+        # rate limits, 429/503 backoff and one keep-alive pool shared by all requests.
+        self.fetcher = get_fetcher()
 
         self.greeting_words = {'hi', 'hello', 'hey', 'greetings',
             'good morning', 'good afternoon', 'good evening'}
@@ -125,65 +143,108 @@ class AreyaAgent:
             'medline': 'https://medlineplus.gov/search?q='
         }
 
-        # Initialize the summarizer
+    @property
+    def llm(self):
+        if not self._llm_initialized:
+            self._llm_initialized = True
+            # Try to initialize the LLM with error handling
+            try:
+                from langchain_ollama import OllamaLLM
+                self._llm = OllamaLLM(
+                    model="gemma3:4b",
+                    base_url="http://localhost:11434",
+                    temperature=0.7,
+                    streaming=False  # Disable streaming to get the complete response at once
+                )
+                # Test the LLM connection
+                logging.info("Testing Ollama LLM connection...")
+                response = requests.get("http://localhost:11434/api/tags")
+                if response.status_code != 200:
+                    logging.warning(
+                        f"Ollama server responded with status code {response.status_code}")
+                else:
+                    logging.info("Ollama LLM connection successful")
+            except Exception as e:
+                logging.error(f"Failed to initialize Ollama LLM: {e}")
+                self._llm = None
+        return self._llm
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self._create_driver()
+        return self._driver
+
+    def _create_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        # Configure Chrome to run in proper headless mode
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")  # New headless mode
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--window-size=1920,1080")  # Set window size
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-infobars")
+        chrome_options.add_argument("--disable-notifications")
+
+        # Initialize the Chrome driver 
         try:
-            # Use CPU explicitly since there are compatibility issues with GPU
-            from transformers import pipeline
-            # Use PyTorch backend instead of TensorFlow to avoid the XNNPACK delegate error
-            self.summarizer = pipeline(
-                "summarization",
-                model="sshleifer/distilbart-cnn-12-6",
-                framework="pt",  # Use PyTorch instead of TensorFlow
-                device=-1  # Force CPU usage for better compatibility
-            )
-            logging.info("Summarization pipeline initialized successfully using PyTorch on CPU")
+            from webdriver_manager.chrome import ChromeDriverManager
+            driver = webdriver.Chrome(service=Service(
+                ChromeDriverManager().install()), options=chrome_options)
+            logging.info("Chrome WebDriver initialized in headless mode")
         except Exception as e:
-            logging.error(f"Failed to initialize summarization pipeline: {e}")
-            # Create a simple fallback summarizer
-            self.summarizer = lambda text, **kwargs: [{"summary_text": text[:500] + "..."}]
+            logging.error(f"Failed to initialize Chrome WebDriver: {e}")
+            # Fallback to simpler initialization if ChromeDriverManager fails
+            try:
+                driver = webdriver.Chrome(options=chrome_options)
+                logging.info("Chrome WebDriver initialized with fallback method")
+            except Exception as e2:
+                logging.error(f"Chrome WebDriver initialization failed completely: {e2}")
+                raise
+        return driver
+
+    @property
+    def search(self):
+        if self._search is None:
+            from langchain_community.tools import DuckDuckGoSearchRun
+            self._search = DuckDuckGoSearchRun()
+        return self._search
+
+    @property
+    def tools(self) -> List["Tool"]:
+        if self._tools is None:
+            self._tools = self._initialize_tools()
+        return self._tools
+
+    @property
+    def prompt(self) -> "ChatPromptTemplate":
+        if self._prompt is None:
+            self._prompt = self._create_prompt()
+        return self._prompt
+
+    @property
+    def summarizer(self):
+        return get_summarizer()
+
+    def close(self):
+        """Shut down the Chrome driver if this agent started one."""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception as e:
+                logging.warning(f"Error shutting down Chrome WebDriver: {e}")
+            self._driver = None
 
     async def __aenter__(self):
-        await self._ensure_session()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session and not self.session.closed:
-            await self.session.close()
-
-    # Add method to ensure session is available with better error handling
-    async def _ensure_session(self):
-        try:
-            if self.session is None or self.session.closed:
-                logging.info("Creating new aiohttp ClientSession")
-                # Create a connector with higher connection limits
-                connector = aiohttp.TCPConnector(
-                    limit=20,  # Increase from default 100 to avoid connection pool issues
-                    limit_per_host=10,  # Allow more connections per host
-                    force_close=False,  # Keep connections alive
-                    enable_cleanup_closed=True  # Clean up closed connections
-                )
-                self.session = aiohttp.ClientSession(
-                    connector=connector, timeout=aiohttp.ClientTimeout(total=30))
-                logging.info("Created new aiohttp session with improved connection settings")
-            return self.session
-        except RuntimeError as e:
-            if "no running event loop" in str(e):
-                logging.warning("No running event loop detected, creating new event loop")
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                # Create a connector with higher connection limits
-                connector = aiohttp.TCPConnector(
-                    limit=20,
-                    limit_per_host=10,
-                    force_close=False,
-                    enable_cleanup_closed=True
-                )
-                self.session = aiohttp.ClientSession(
-                    connector=connector, timeout=aiohttp.ClientTimeout(total=30))
-                logging.info("Created new aiohttp session with event loop recovery")
-                return self.session
-            else:
-                raise
+        self.close()
 
     def set_user_context(self, user_data: Dict[str, Any]):
         """Set the current user context for personalized interactions"""
@@ -213,10 +274,10 @@ This information is for educational purposes only.
         if (last_visit := self.current_user.get('last_visit')) and (last_condition := self.current_user.get('last_condition')):
             greeting += f"• On your last visit, we discussed: {last_condition}\n"
             greeting += "• How have you been feeling since then?\n"
-        if medical_history := self.current_user.get('medical_history', []):
+        if conditions := self.current_user.get('conditions', []):
             greeting += "\n## Quick Health Overview"
             greeting += "\n• I have access to your medical history"
-            greeting += "\n• Key conditions: " + ", ".join(medical_history[:3])
+            greeting += "\n• Key conditions: " + ", ".join(conditions[:3])
         greeting += """\n
 ## How Can I Help?
 • Feel free to ask any medical questions
@@ -229,7 +290,11 @@ This information is for educational purposes only.
 • For specific medical advice, please consult your healthcare provider"""
         return greeting
 
-    def _create_prompt(self) -> ChatPromptTemplate:
+    def _create_prompt(self) -> "ChatPromptTemplate":
+        from langchain.prompts import MessagesPlaceholder
+        from langchain_core.messages import SystemMessage, HumanMessage
+        from langchain_core.prompts import ChatPromptTemplate
+
         return ChatPromptTemplate.from_messages([
             SystemMessage(content="""You are Areya, an advanced medical AI assistant.
 YOU MUST FORMAT YOUR RESPONSES EXACTLY AS FOLLOWS:
@@ -249,7 +314,9 @@ Strictly adhere to this format.
             HumanMessage(content="{input}")
         ])
 
-    def _initialize_tools(self) -> List[Tool]:
+    def _initialize_tools(self) -> List["Tool"]:
+        from langchain_core.tools import Tool
+
         return [
             Tool(
                 name="web_search",
@@ -275,94 +342,75 @@ Strictly adhere to this format.
         return f"Symptom analysis for: {symptoms}"
 
     def _format_conversation_history(self) -> str:
+        from langchain_core.messages import HumanMessage
+
         formatted = ""
         for message in self.conversation_history[-5:]:
             role = "User" if isinstance(message, HumanMessage) else "Assistant"
             formatted += f"{role}: {message.content}\n"
         return formatted
 
-    async def _scrape_webpage(self, url: str) -> Optional[str]:
-        """Scrape a webpage to extract content for medical research."""
+    async def _scrape_webpage(self, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Scrape a webpage to extract content for medical research.
+
+        Tries a streamed, byte-capped HTTP fetch first and only falls back to the
+        browser when the static HTML has no usable text (JavaScript-rendered pages)."""
         logging.info(f"Scraping webpage: {url}")
+        try:
+            timeout = stage_timeout(deadline, 15, "page fetch")
+            # wait_for as well, so the deadline holds even if the fetcher hop or a retry overruns
+            page = await asyncio.wait_for(self.fetcher.fetch_page(url, headers=SCRAPE_HEADERS, timeout=timeout),
+                                          timeout)
+            if page.skipped:
+                logging.info(f"Not scraping {url}: unsupported content type {page.content_type}")
+                return None
+            if page.status < 400:
+                content = self._extract_page_text(page.text, url)
+                if content and len(content) >= 100:
+                    return self._accept_scraped_content(url, content)
+            logging.info(f"HTTP fetch of {url} returned no usable content (status {page.status}), using the browser")
+        except DeadlineExceeded as e:
+            logging.warning(f"Not scraping {url}: {e}")
+            return None
+        except Exception as e:
+            logging.warning(f"HTTP fetch of {url} failed ({e}), using the browser")
+        return await self._scrape_with_browser(url, deadline)
+
+    async def _scrape_with_browser(self, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Load `url` in headless Chrome and extract its text."""
         retries = 2
-        timeout = 15  # seconds
 
         for attempt in range(retries):
             try:
-                # Set page load timeout for Selenium
+                # Respect the per-domain rate limit before the browser hits the host
+                await self.fetcher.throttle(url, timeout=stage_timeout(deadline, 15, "page load"))
+
+                # Set page load timeout for Selenium from what's left of the request deadline
+                timeout = stage_timeout(deadline, 15, "page load")
                 self.driver.set_page_load_timeout(timeout)
 
                 # Navigate to the URL
-                await asyncio.to_thread(lambda: self.driver.get(url))
+                load_start = time.monotonic()
+                try:
+                    await asyncio.to_thread(lambda: self.driver.get(url))
+                except Exception:
+                    self.fetcher.record(url, time.monotonic() - load_start, error=True)
+                    raise
 
                 # Wait for the page to load
-                await asyncio.to_thread(lambda: time.sleep(3))
+                settle_s = 3 if deadline is None else min(3, deadline.remaining())
+                await asyncio.to_thread(lambda: time.sleep(settle_s))
 
-                # Get the page source
+                # Get the page source, capped like the HTTP path so huge pages don't blow up parsing
                 page_source = await asyncio.to_thread(lambda: self.driver.page_source)
+                self.fetcher.record(url, time.monotonic() - load_start, nbytes=len(page_source))
+                page_source = page_source[:MAX_RESPONSE_BYTES]
 
-                # Parse with BeautifulSoup
-                soup = BeautifulSoup(page_source, 'html.parser')
-
-                # Remove unwanted elements
-                for element in soup(['script', 'style', 'nav', 'footer', 'iframe', 'noscript', 'svg', 'header']):
-                    element.decompose()
-
-                # Remove elements that are likely advertisements or menus
-                for element in soup.find_all(class_=lambda c: c and any(x in str(c).lower() for x in ['ad', 'banner', 'menu', 'nav', 'sidebar', 'footer', 'cookie', 'popup'])):
-                    element.decompose()
-
-                # Common content selectors in medical websites
-                content_selectors = [
-                    'article', 'main', '.content', '#content', '.article', '.post-content', '.entry-content',
-                    '.main-content', '#main-content', '.article-content', '.page-content', '.post-body',
-                    '.abstract', '.summary', '#maincontent', '.maincontent', '[role="main"]',
-                    '.mw-parser-output'  # For Wikipedia
-                ]
-
-                # Try to find the main content area
-                main_content = None
-                for selector in content_selectors:
-                    main_content = soup.select_one(selector)
-                    if main_content:
-                        logging.info(f"Found main content using selector: {selector}")
-                    break
-
-                if main_content:
-                    # Extract text from the main content
-                    content = main_content.get_text(separator=' ', strip=True)
-                else:
-                    # If no main content area found, extract from body
-                    logging.info("No main content area found, extracting from body")
-                    body = soup.body
-                    if not body:
-                        return None
-
-                    # Get all paragraphs and headings
-                    paragraphs = body.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
-
-                    # Extract text from each element
-                    content_parts = []
-                    for p in paragraphs:
-                        text = p.get_text(strip=True)
-                        if text and len(text) > 20:  # Only include non-trivial text
-                            content_parts.append(text)
-
-                    if not content_parts:
-                        # If no paragraphs found, fall back to all text
-                        content = body.get_text(separator=' ', strip=True)
-                    else:
-                        content = ' '.join(content_parts)
-
-                # Clean up the content
-                # Replace multiple spaces with a single space
-                content = re.sub(r'\s+', ' ', content)
-                # Replace newlines, tabs with spaces
-                content = re.sub(r'[\n\r\t]', ' ', content)
+                content = self._extract_page_text(page_source, url)
 
                 # Check if content is meaningful
                 if not content or len(content) < 100:
-                    if attempt < retries - 1:
+                    if attempt < retries - 1 and self._has_time(deadline, MIN_SCRAPE_BUDGET_S + 2):
                         logging.warning(f"Insufficient content extracted, retrying ({attempt + 1}/{retries})")
                         # Wait before retrying
                         await asyncio.to_thread(lambda: time.sleep(2))
@@ -371,17 +419,13 @@ Strictly adhere to this format.
                         logging.warning("Failed to extract meaningful content after retries")
                         return None
 
-                # Truncate very long content to a reasonable size
-                if len(content) > 20000:
-                    content = content[:20000]
-                    logging.info("Content truncated due to excessive length")
-
-                # Log success
-                logging.info(f"Successfully scraped content from {url} ({len(content)} chars)")
-                return content
+                return self._accept_scraped_content(url, content)
+            except DeadlineExceeded as e:
+                logging.warning(f"Not scraping {url}: {e}")
+                return None
             except Exception as e:
                 logging.error(f"Error scraping {url} (attempt {attempt + 1}/{retries}): {str(e)}")
-                if attempt < retries - 1:
+                if attempt < retries - 1 and self._has_time(deadline, MIN_SCRAPE_BUDGET_S + 2):
                     # Wait before retrying
                     await asyncio.to_thread(lambda: time.sleep(2))
                 else:
@@ -389,400 +433,334 @@ Strictly adhere to this format.
 
         return None
 
-    async def _enhanced_web_search(self, query: str) -> str:
-        """Perform a web search and return formatted research/search results for UI"""
+    def _extract_page_text(self, page_source: str, url: Optional[str] = None) -> Optional[str]:
+        """Pull the main readable text out of an HTML page (per-domain rule, else generic)."""
+        return extract_text(page_source, url)
+
+    def _accept_scraped_content(self, url: str, content: str) -> str:
+        """Truncate, log and index a successfully scraped page."""
+        # Truncate very long content to a reasonable size
+        if len(content) > SCRAPE_MAX_CHARS:
+            content = content[:SCRAPE_MAX_CHARS]
+            logging.info("Content truncated due to excessive length")
+
+        # Log success
+        logging.info(f"Successfully scraped content from {url} ({len(content)} chars)")
+        self._index_scraped_page(url, content)
+        return content
+
+    @staticmethod
+    def _is_pubmed_search(url: str) -> bool:
+        parsed = urlparse(url)
+        return parsed.netloc == "pubmed.ncbi.nlm.nih.gov" and parsed.path in ("", "/") and "term=" in parsed.query
+
+    async def _pubmed_articles(self, query: str, deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """Abstracts for `query` from E-utilities; [] on failure so the caller can fall back to scraping."""
+        try:
+            # research() makes several E-utilities calls; the timeout applies to each, so bound the total too
+            timeout = stage_timeout(deadline, PUBMED_TIMEOUT_S, "PubMed")
+            articles = await asyncio.wait_for(get_pubmed_client().research(query, timeout=timeout), timeout)
+        except Exception as e:
+            logging.error(f"PubMed E-utilities lookup failed for '{query}': {e}")
+            return []
+        # Articles served from the client's cache were indexed when they were first fetched
+        for article in articles:
+            if article["fetched"]:
+                self._index_scraped_page(article["url"], f"{article['title']} {article['abstract']}")
+        return articles
+
+    def _index_scraped_page(self, url: str, content: str):
+        """Feed a successfully scraped page into the local knowledge index."""
+        try:
+            get_knowledge_index().add_document(url, content)
+        except Exception as e:
+            logging.error(f"Error adding {url} to the knowledge index: {e}")
+
+    def _research_from_index(self, query: str, max_sources: int = 4, deadline: Optional[Deadline] = None,
+                             plan: DegradationPlan = NORMAL_PLAN) -> Dict[str, Dict[str, str]]:
+        """Build scraped_contents from indexed passages, or return {} if coverage/freshness is too low.
+
+        When load shedding has turned web research off, any matching passages are used."""
+        try:
+            index = get_knowledge_index()
+            hits = index.search(query, top_k=max_sources * 3)
+            if not hits or (plan.web_research and not index.has_coverage(hits)):
+                return {}
+        except Exception as e:
+            logging.error(f"Knowledge index lookup failed: {e}")
+            return {}
+
+        passages_by_url: Dict[str, List[Dict[str, Any]]] = {}
+        for hit in hits:
+            if hit["url"] in passages_by_url or len(passages_by_url) < max_sources:
+                passages_by_url.setdefault(hit["url"], []).append(hit)
+
+        pages = []
+        for url, passages in passages_by_url.items():
+            content = " ".join(p["text"] for p in sorted(passages, key=lambda p: p["position"]))
+            pages.append({"url": url, "domain": passages[0]["domain"], "content": content})
+
+        scraped_contents = {}
+        for page in self._merge_near_duplicates(pages):
+            scraped_contents[page["domain"]] = {
+                "url": page["url"],
+                "content": page["content"][:300] + "...",  # Preview
+                "summary": self._summarize_text(page["content"], latency_budget=self._summary_budget(deadline, plan)),
+                "mirrors": page["mirrors"]
+            }
+        return scraped_contents
+
+    def _merge_near_duplicates(self, pages: List[Dict[str, Any]], summarize_min_chars: int = 0,
+                               progress: Optional[Callable[..., None]] = None) -> List[Dict[str, Any]]:
+        """Fold mirrored/syndicated pages into one source before they are summarized."""
+        try:
+            merged = merge_near_duplicates(pages, summarize_min_chars=summarize_min_chars)
+        except Exception as e:
+            logging.error(f"Near-duplicate detection failed: {e}")
+            return [{**page, "mirrors": []} for page in pages]
+        duplicates = len(pages) - len(merged)
+        if duplicates:
+            logging.info(f"Merged {duplicates} near-duplicate source(s) before summarization")
+            self._report(progress, "deduplicated", progress=72, duplicates=duplicates, sources=len(merged),
+                         message=f"Merged {duplicates} duplicate source(s)")
+        return merged
+
+    @staticmethod
+    def _time_left(deadline: Optional[Deadline]) -> Optional[float]:
+        """Seconds left on `deadline`, or None when the request has no deadline."""
+        return deadline.remaining() if deadline is not None else None
+
+    def _summary_budget(self, deadline: Optional[Deadline], plan: DegradationPlan) -> Optional[float]:
+        """Latency budget for a summary; 0 forces the extractive path when load shedding says so."""
+        return self._time_left(deadline) if plan.allow_abstractive else 0.0
+
+    @staticmethod
+    def _has_time(deadline: Optional[Deadline], seconds: float) -> bool:
+        return deadline is None or deadline.remaining() >= seconds
+
+    @staticmethod
+    def _report(callback: Optional[Callable[..., None]], stage: str, **data):
+        """Send a progress event to the research job, if one is listening."""
+        if callback is None:
+            return
+        try:
+            callback(stage, **data)
+        except Exception as e:
+            logging.warning(f"Progress callback failed for stage {stage}: {e}")
+
+    async def _enhanced_web_search(self, query: str, progress: Optional[Callable[..., None]] = None,
+                                   deadline: Optional[Deadline] = None,
+                                   plan: DegradationPlan = NORMAL_PLAN) -> Dict[str, Any]:
+        """Perform a web search and return structured research for the UI.
+
+        Returns {"query", "sources": [{"domain", "url", "title", "summary"?, "preview"?,
+        "mirrors"?}], "partial"}; summary/preview are only set for scraped sources.
+        `progress(stage, **data)` is called as the pipeline advances (see research_jobs.py).
+        When `deadline` runs out, scraping stops and the sources finished so far are
+        returned with partial=True. `plan` (degradation.py) caps sources, disables
+        abstractive summaries or restricts research to the local knowledge index."""
+        partial = False
         try:
             logging.info(f"Starting enhanced web search for query: {query}")
+            self._report(progress, "searching", progress=5, message="Searching medical sources...")
             
-            # Making  the search query more specific for medical information
-            medical_query = f"medical information about {query}"
+            # Answer from the local knowledge index when it already covers the query
+            scraped_contents = self._research_from_index(query, max_sources=min(4, plan.max_sources),
+                                                         deadline=deadline, plan=plan)
+            if scraped_contents:
+                search_results = [data["url"] for data in scraped_contents.values()]
+                logging.info(f"Serving research for '{query}' from the local knowledge index ({len(search_results)} sources)")
+                self._report(progress, "search_done", progress=80, sources=len(search_results), from_index=True,
+                             message=f"Found {len(search_results)} sources in the local knowledge index")
+            elif not plan.web_research:
+                # Load shedding: no web search or scraping, and nothing local matched
+                search_results = []
+                logging.info(f"Web research skipped for '{query}' ({plan.tier}); no local coverage")
+                self._report(progress, "search_done", progress=80, sources=0, from_index=True,
+                             message="No previously collected sources for this question")
+            else:
+                # Making  the search query more specific for medical information
+                medical_query = f"medical information about {query}"
             
-            # Use the search engine API to get better results
-            search_results = []
+                # Use the search engine API to get better results
+                search_results = []
             
-            try:
-                # First trying DuckDuckGo search
-                search_results = await self.perform_duckduckgo_search(medical_query)
-                logging.info(f"DuckDuckGo search returned {len(search_results)} results")
+                try:
+                    # First trying DuckDuckGo search
+                    search_results = await self.perform_duckduckgo_search(medical_query, deadline=deadline)
+                    logging.info(f"DuckDuckGo search returned {len(search_results)} results")
                 
-                # Explicitly add medical sources regardless of search results
-                medical_sources = [
-                    f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}",
-                    f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}",
-                    f"https://medlineplus.gov/search?query={quote_plus(query)}",
-                    f"https://www.nih.gov/search?term={quote_plus(query)}",
-                    f"https://www.cdc.gov/search/?query={quote_plus(query)}",
-                    f"https://www.google.com/search?q={quote_plus('medical information ' + query)}"
-                ]
+                    # Explicitly add medical sources regardless of search results
+                    medical_sources = [
+                        f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}",
+                        f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}",
+                        f"https://medlineplus.gov/search?query={quote_plus(query)}",
+                        f"https://www.nih.gov/search?term={quote_plus(query)}",
+                        f"https://www.cdc.gov/search/?query={quote_plus(query)}",
+                        f"https://www.google.com/search?q={quote_plus('medical information ' + query)}"
+                    ]
                 
-                # Adding medical sources to the start of the search results
-                for source in medical_sources:
-                    if source not in search_results:
-                        search_results.insert(0, source)
+                    # Adding medical sources to the start of the search results
+                    for source in medical_sources:
+                        if source not in search_results:
+                            search_results.insert(0, source)
                 
-                logging.info(f"After adding medical sources, total results: {len(search_results)}")
+                    logging.info(f"After adding medical sources, total results: {len(search_results)}")
                 
-            except Exception as search_error:
-                logging.error(f"Error during search: {search_error}")
-                # Provide medical sources as a fallback
-                search_results = [
-                    f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}",
-                    f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}",
-                    f"https://medlineplus.gov/search?query={quote_plus(query)}",
-                    f"https://www.nih.gov/search?term={quote_plus(query)}",
-                    f"https://www.webmd.com/search/search_results/default.aspx?query={quote_plus(query)}",
-                    f"https://www.google.com/search?q={quote_plus('medical information ' + query)}"
-                ]
-                logging.info(f"Using fallback medical sources: {len(search_results)} sources")
-
-            # Actually scrape content from each source
-            scraped_contents = {}
+                except Exception as search_error:
+                    logging.error(f"Error during search: {search_error}")
+                    # Provide medical sources as a fallback
+                    search_results = [
+                        f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}",
+                        f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}",
+                        f"https://medlineplus.gov/search?query={quote_plus(query)}",
+                        f"https://www.nih.gov/search?term={quote_plus(query)}",
+                        f"https://www.webmd.com/search/search_results/default.aspx?query={quote_plus(query)}",
+                        f"https://www.google.com/search?q={quote_plus('medical information ' + query)}"
+                    ]
+                    logging.info(f"Using fallback medical sources: {len(search_results)} sources")
+
+                self._report(progress, "search_done", progress=15, sources=len(search_results),
+                             message=f"Found {len(search_results)} candidate sources")
+
+                # Scrape every source first, then fold mirrored/syndicated copies together
+                # so the summarizer only runs once per distinct page.
+                pages = []
             
-            # Limit to 4 sources to avoid overloading
-            for url in search_results[:4]:
-                try:
-                    content = await self._scrape_webpage(url)
-                    if content and len(content) > 200:  # Only use content that has reasonable length
-                        # Get domain for identification
-                        domain = url.split("//")[1].split("/")[0]
-                        if "www." in domain:
-                            domain = domain.split("www.")[1]
-                        
-                        # Summarize the content if it's too long
-                        if len(content) > 1000:
-                            summary = self._summarize_text(content)
-                            scraped_contents[domain] = {
-                                "url": url,
-                                "content": content[:300] + "...",  # Preview
-                                "summary": summary
-                            }
+                # At most plan.max_sources sources to avoid overloading. PubMed comes first
+                # wherever the search ranked it: it goes through E-utilities, not a browser page load.
+                pubmed_urls = [url for url in search_results if self._is_pubmed_search(url)]
+                to_scrape = (pubmed_urls + [url for url in search_results if url not in pubmed_urls])[:plan.max_sources]
+                for source_number, url in enumerate(to_scrape, 1):
+                    if not self._has_time(deadline, MIN_SCRAPE_BUDGET_S):
+                        logging.warning(f"Research deadline reached after {source_number - 1} of {len(to_scrape)} sources")
+                        self._report(progress, "deadline_reached", scraped=len(pages), total=len(to_scrape), progress=70,
+                                     message=f"Time budget reached; using {len(pages)} of {len(to_scrape)} sources")
+                        partial = True
+                        break
+                    try:
+                        articles = None
+                        if self._is_pubmed_search(url):
+                            articles = await self._pubmed_articles(query, deadline)
+                            content = articles_to_text(articles) if articles else await self._scrape_webpage(url, deadline=deadline)
                         else:
-                            scraped_contents[domain] = {
-                                "url": url,
-                                "content": content,
-                                "summary": content[:200] + "..."
-                            }
+                            content = await self._scrape_webpage(url, deadline=deadline)
+                        if content and len(content) > 200:  # Only use content that has reasonable length
+                            # Get domain for identification
+                            domain = self._source_domain(url)
+                            pages.append({"url": url, "domain": domain, "content": content, "articles": articles})
                         
-                        logging.info(f"Successfully scraped content from {domain} ({len(content)} chars)")
-                except Exception as scrape_error:
-                    logging.error(f"Error scraping {url}: {str(scrape_error)}")
+                            logging.info(f"Successfully scraped content from {domain} ({len(content)} chars)")
+                            self._report(progress, "source_scraped", source=source_number, total=len(to_scrape),
+                                         domain=domain, url=url,
+                                         progress=15 + int(55 * source_number / len(to_scrape)),
+                                         message=f"Scraped source {source_number} of {len(to_scrape)} ({domain})")
+                        else:
+                            self._report(progress, "source_skipped", source=source_number, total=len(to_scrape), url=url,
+                                         progress=15 + int(55 * source_number / len(to_scrape)),
+                                         message=f"Source {source_number} of {len(to_scrape)} had no usable content")
+                    except Exception as scrape_error:
+                        logging.error(f"Error scraping {url}: {str(scrape_error)}")
+                        self._report(progress, "source_skipped", source=source_number, total=len(to_scrape), url=url,
+                                     progress=15 + int(55 * source_number / len(to_scrape)),
+                                     message=f"Source {source_number} of {len(to_scrape)} could not be loaded")
+
+                pages = self._merge_near_duplicates(pages, summarize_min_chars=1000, progress=progress)
+
+                scraped_contents = {}
+                for page_number, page in enumerate(pages, 1):
+                    content = page["content"]
+                    # Summarize the content if it's too long
+                    if len(content) > 1000:
+                        summary = self._summarize_text(content, latency_budget=self._summary_budget(deadline, plan))
+                        scraped_contents[page["domain"]] = {
+                            "url": page["url"],
+                            "content": content[:300] + "...",  # Preview
+                            "summary": summary,
+                            "mirrors": page["mirrors"],
+                            "articles": page.get("articles")
+                        }
+                    else:
+                        scraped_contents[page["domain"]] = {
+                            "url": page["url"],
+                            "content": content,
+                            "summary": content[:200] + "...",
+                            "mirrors": page["mirrors"],
+                            "articles": page.get("articles")
+                        }
+                    self._report(progress, "source_summarized", source=page_number, total=len(pages),
+                                 domain=page["domain"], url=page["url"],
+                                 progress=72 + int(18 * page_number / len(pages)),
+                                 message=f"Summarized source {page_number} of {len(pages)} ({page['domain']})")
                 
-            # Format results for research display
-            formatted_results = []
-            source_id = 0
+            self._report(progress, "summarized", progress=92, sources=len(scraped_contents),
+                         message="Compiling research findings...")
+
+            # Structured sources; areya.html renders them from its research-source template
+            sources = []
+            mirrored_urls = {mirror for data in scraped_contents.values() for mirror in data.get("mirrors", [])}
             
-            # Process each URL and create HTML for it
             for url in search_results[:6]:  # Limit to 6 sources
+                if url in mirrored_urls:
+                    continue  # Listed under "mirrors" of the source it duplicates
                 try:
-                    source_id += 1
-                    domain = url.split("//")[1].split("/")[0]
-                    if "www." in domain:
-                        domain = domain.split("www.")[1]
-                    
-                    # Determine source name based on domain
-                    source_name = domain
-                    if "pubmed" in domain or "ncbi.nlm.nih.gov" in domain:
-                        source_name = "PubMed (National Library of Medicine)"
-                    elif "mayoclinic" in domain:
-                        source_name = "Mayo Clinic"
-                    elif "medlineplus" in domain:
-                        source_name = "MedlinePlus (NIH)"
-                    elif "nih.gov" in domain:
-                        source_name = "National Institutes of Health"
-                    elif "webmd" in domain:
-                        source_name = "WebMD"
-                    elif "healthline" in domain:
-                        source_name = "Healthline"
-                    elif "cdc.gov" in domain:
-                        source_name = "Centers for Disease Control and Prevention"
-                    elif "who.int" in domain:
-                        source_name = "World Health Organization"
-                    elif "google.com" in domain:
-                        source_name = "Google Search Results"
-                    
-                    # Create a unique source ID for this source
-                    sourceId = f"source-{source_id}"
-                    
-                    # Get scraped content if available
-                    scraped_content_html = ""
-                    if domain in scraped_contents:
-                        scraped_data = scraped_contents[domain]
-                        scraped_content_html = f"""
-                        <div class="scraped-content">
-                            <h5>Content Summary:</h5>
-                            <p class="content-summary">{scraped_data.get('summary', 'No summary available')}</p>
-                            <div class="full-content" style="display: none;">
-                                <h5>Full Content:</h5>
-                                <div class="scrollable-content">{scraped_data.get('content', 'No content available')}</div>
-                            </div>
-                            <button class="toggle-full-content" onclick="toggleFullContent(this)">Show Full Content</button>
-                        </div>
-                        """
-                    
-                    # Create HTML for this source
-                    source_html = f"""
-                    <div class="research-source" id="container-{sourceId}" data-url="{url}">
-                        <div class="source-header">
-                            <i class="fas fa-external-link-alt"></i>
-                            <div class="source-domain">{domain}</div>
-                        </div>
-                        <div class="source-content">
-                            <h4>{source_name}</h4>
-                            <p>This resource provides medical information about {query}, including potential symptoms, causes, treatments, and other health details.</p>
-                            {scraped_content_html}
-                        </div>
-                        <div class="source-actions">
-                            <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('container-{sourceId}'))">
-                                <i class="fas fa-eye"></i> Preview Source
-                            </button>
-                            <a href="{url}" target="_blank" class="external-link">
-                                <i class="fas fa-external-link-alt"></i> Visit Source
-                            </a>
-                        </div>
-                        <div class="source-preview">
-                            <div class="iframe-container">
-                                <iframe src="{url}" title="{source_name}" loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                            </div>
-                        </div>
-                    </div>
-                    """
-                    formatted_results.append(source_html)
-                    logging.info(f"Added source to research panel: {source_name} ({domain})")
-                        
+                    domain = self._source_domain(url)
+                    source = {"domain": domain, "url": url, "title": self._source_name(domain)}
+                    scraped_data = scraped_contents.get(domain)
+                    if scraped_data:
+                        source["summary"] = scraped_data.get("summary", "")
+                        source["preview"] = scraped_data.get("content", "")
+                        source["mirrors"] = scraped_data.get("mirrors", [])
+                        if scraped_data.get("articles"):
+                            source["articles"] = [
+                                {key: article[key] for key in ("pmid", "title", "journal", "year", "url")}
+                                for article in scraped_data["articles"]
+                            ]
+                    sources.append(source)
                 except Exception as format_error:
                     logging.error(f"Error formatting search result: {format_error}")
                     
             # If we couldn't get any results, provide a fallback
-            if not formatted_results:
-                logging.warning("No formatted results generated, using fallback sources")
-                source_id = 0
-                fallback_sources = [
-                    {"url": f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}", "name": "Mayo Clinic"},
-                    {"url": f"https://medlineplus.gov/search?query={quote_plus(query)}", "name": "MedlinePlus (NIH)"},
-                    {"url": f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}", "name": "PubMed"},
-                    {"url": f"https://www.google.com/search?q={quote_plus('medical ' + query)}", "name": "Google Search"}
-                ]
-                
-                for source in fallback_sources:
-                    source_id += 1
-                    sourceId = f"source-{source_id}"
-                    domain = source["url"].split("//")[1].split("/")[0]
-                    if "www." in domain:
-                        domain = domain.split("www.")[1]
-                        
-                    source_html = f"""
-                    <div class="research-source" id="container-{sourceId}" data-url="{source["url"]}">
-                        <div class="source-header">
-                            <i class="fas fa-external-link-alt"></i>
-                            <div class="source-domain">{domain}</div>
-                        </div>
-                        <div class="source-content">
-                            <h4>{source["name"]}</h4>
-                            <p>This resource may provide reliable medical information about {query}.</p>
-                        </div>
-                        <div class="source-actions">
-                            <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('container-{sourceId}'))">
-                                <i class="fas fa-eye"></i> Preview Source
-                            </button>
-                            <a href="{source["url"]}" target="_blank" class="external-link">
-                                <i class="fas fa-external-link-alt"></i> Visit Source
-                            </a>
-                        </div>
-                        <div class="source-preview">
-                            <div class="iframe-container">
-                                <iframe src="{source["url"]}" title="{source["name"]}" loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                            </div>
-                        </div>
-                    </div>
-                    """
-                    formatted_results.append(source_html)
-            
-            # Log the number of sources that will be displayed
-            logging.info(f"Total formatted medical sources: {len(formatted_results)}")
-                
-            # Add medical disclaimer
-            medical_disclaimer = """
-            <div class="medical-disclaimer">
-                <h3>Medical Information Disclaimer</h3>
-                <p>The information provided here is for educational purposes only and not a substitute for professional medical advice. 
-                Always consult with a qualified healthcare provider for medical concerns.</p>
-            </div>
-            """
-            
-            # Create JavaScript for toggling full content
-            toggle_content_script = """
-            <script>
-            function toggleFullContent(button) {
-                const contentDiv = button.previousElementSibling;
-                if (contentDiv.style.display === "none" || !contentDiv.style.display) {
-                    contentDiv.style.display = "block";
-                    button.textContent = "Hide Full Content";
-                } else {
-                    contentDiv.style.display = "none";
-                    button.textContent = "Show Full Content";
-                }
-            }
-            </script>
-            """
-            
-            # Create JavaScript function for toggling previews
-            toggle_script = """
-            <script>
-            function toggleSourcePreview(sourceId) {
-                if (sourceId instanceof HTMLElement) {
-                    const sourceElement = sourceId;
-                    const previewElement = sourceElement.querySelector('.source-preview');
-                    if (previewElement) {
-                        previewElement.classList.toggle('active');
-                        
-                        const button = sourceElement.querySelector('.preview-button');
-                        if (button) {
-                            if (previewElement.classList.contains('active')) {
-                                button.innerHTML = '<i class="fas fa-eye-slash"></i> Hide Preview';
-                                
-                                const iframe = previewElement.querySelector('iframe');
-                                if (iframe && !iframe.src) {
-                                    const url = sourceElement.getAttribute('data-url');
-                                    if (url) iframe.src = url;
-                                }
-                            } else {
-                                button.innerHTML = '<i class="fas fa-eye"></i> Preview Source';
-                            }
-                        }
-                    }
-                }
-            }
-            </script>
-            """
+            if not sources:
+                logging.warning("No sources collected, using fallback sources")
+                sources = self._fallback_sources(query)
             
-            # Combine all elements
-            research_html = f"""
-            <h2>Medical Research Sources for "{query}"</h2>
-            <p>Below are medical sources with web-scraped content about "<strong>{query}</strong>":</p>
-            <div class="sources-container">
-                {''.join(formatted_results)}
-            </div>
-            {medical_disclaimer}
-            {toggle_content_script}
-            {toggle_script}
-            """
-            
-            logging.info(f"Returning formatted research content with {len(formatted_results)} sources")
-            return research_html
+            logging.info(f"Returning research with {len(sources)} sources")
+            return {"query": query, "sources": sources, "partial": partial}
             
         except Exception as e:
             logging.error(f"Error in enhanced web search: {e}")
-            
-            # Return a simplified fallback with generic medical sources
-            fallback_html = f"""
-            <h2>Medical Resources</h2>
-            <p>Here are some reliable medical resources for information about "{query}":</p>
-            
-            <div class="research-source" id="fallback-source-1" data-url="https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}">
-                <div class="source-header">
-                    <i class="fas fa-external-link-alt"></i>
-                    <div class="source-domain">mayoclinic.org</div>
-                </div>
-                <div class="source-content">
-                    <h4>Mayo Clinic</h4>
-                    <p>The Mayo Clinic offers comprehensive information about various medical conditions.</p>
-                </div>
-                <div class="source-actions">
-                    <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('fallback-source-1'))">
-                        <i class="fas fa-eye"></i> Preview Source
-                    </button>
-                    <a href="https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}" target="_blank" class="external-link">
-                        <i class="fas fa-external-link-alt"></i> Visit Source
-                    </a>
-                </div>
-                <div class="source-preview">
-                    <div class="iframe-container">
-                        <iframe loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="research-source" id="fallback-source-2" data-url="https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}">
-                <div class="source-header">
-                    <i class="fas fa-external-link-alt"></i>
-                    <div class="source-domain">pubmed.ncbi.nlm.nih.gov</div>
-                </div>
-                <div class="source-content">
-                    <h4>PubMed</h4>
-                    <p>PubMed provides access to scientific research and medical literature from the National Library of Medicine.</p>
-                </div>
-                <div class="source-actions">
-                    <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('fallback-source-2'))">
-                        <i class="fas fa-eye"></i> Preview Source
-                    </button>
-                    <a href="https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}" target="_blank" class="external-link">
-                        <i class="fas fa-external-link-alt"></i> Visit Source
-                    </a>
-                </div>
-                <div class="source-preview">
-                    <div class="iframe-container">
-                        <iframe loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="research-source" id="fallback-source-3" data-url="https://www.cdc.gov/search/?query={quote_plus(query)}">
-                <div class="source-header">
-                    <i class="fas fa-external-link-alt"></i>
-                    <div class="source-domain">cdc.gov</div>
-                </div>
-                <div class="source-content">
-                    <h4>Centers for Disease Control and Prevention</h4>
-                    <p>The CDC provides trusted information about diseases, treatments, and health guidance.</p>
-                </div>
-                <div class="source-actions">
-                    <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('fallback-source-3'))">
-                        <i class="fas fa-eye"></i> Preview Source
-                    </button>
-                    <a href="https://www.cdc.gov/search/?query={quote_plus(query)}" target="_blank" class="external-link">
-                        <i class="fas fa-external-link-alt"></i> Visit Source
-                    </a>
-                </div>
-                <div class="source-preview">
-                    <div class="iframe-container">
-                        <iframe loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="research-source" id="fallback-source-4" data-url="https://www.google.com/search?q={quote_plus('medical ' + query)}">
-                <div class="source-header">
-                    <i class="fas fa-external-link-alt"></i>
-                    <div class="source-domain">google.com</div>
-                </div>
-                <div class="source-content">
-                    <h4>Google Search Results</h4>
-                    <p>Google search results for medical information about {query}.</p>
-                </div>
-                <div class="source-actions">
-                    <button class="preview-button" onclick="toggleSourcePreview(document.getElementById('fallback-source-4'))">
-                        <i class="fas fa-eye"></i> Preview Source
-                    </button>
-                    <a href="https://www.google.com/search?q={quote_plus('medical ' + query)}" target="_blank" class="external-link">
-                        <i class="fas fa-external-link-alt"></i> Visit Source
-                    </a>
-                </div>
-                <div class="source-preview">
-                    <div class="iframe-container">
-                        <iframe loading="lazy" sandbox="allow-scripts allow-same-origin"></iframe>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="medical-disclaimer">
-                <h3>Medical Information Disclaimer</h3>
-                <p>The information provided here is for educational purposes only and not a substitute for professional medical advice. 
-                Always consult with a qualified healthcare provider for medical concerns.</p>
-            </div>
-            """
-            
-            logging.info("Using fallback HTML for research due to error")
-            return fallback_html
+            logging.info("Using fallback sources for research due to error")
+            return {"query": query, "sources": self._fallback_sources(query), "partial": False}
+
+    @staticmethod
+    def _source_domain(url: str) -> str:
+        domain = url.split("//")[1].split("/")[0]
+        if "www." in domain:
+            domain = domain.split("www.")[1]
+        return domain
+
+    @staticmethod
+    def _source_name(domain: str) -> str:
+        """Display name for a source domain."""
+        for needle, name in SOURCE_NAMES:
+            if needle in domain:
+                return name
+        return domain
+
+    def _fallback_sources(self, query: str) -> List[Dict[str, Any]]:
+        """Reliable search pages to show when no source could be collected."""
+        urls = [
+            f"https://www.mayoclinic.org/search/search-results?q={quote_plus(query)}",
+            f"https://medlineplus.gov/search?query={quote_plus(query)}",
+            f"https://pubmed.ncbi.nlm.nih.gov/?term={quote_plus(query)}",
+            f"https://www.google.com/search?q={quote_plus('medical ' + query)}"
+        ]
+        sources = []
+        for url in urls:
+            domain = self._source_domain(url)
+            sources.append({"domain": domain, "url": url, "title": self._source_name(domain)})
+        return sources
 
     def _extract_urls(self, search_results: str) -> List[str]:
         urls = []
@@ -798,43 +776,70 @@ Strictly adhere to this format.
     def _extract_key_points(self, content: str, max_points: int = 3) -> str:
         if not content:
             return "• Information not available\n"
-        sentences = content.split('.')
-        key_points = []
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if (len(sentence) > 20 and 
-                any(term in sentence.lower() for term in ['treatment', 'therapy', 'research', 'study', 'clinical', 'patient', 'effect', 'medicine', 'result', 'trial', 'evidence']) and
-                not any(skip in sentence.lower() for skip in ['cookie', 'privacy', 'advertisement', 'subscribe'])):
-                key_points.append(f"• {sentence}.")
-                if len(key_points) >= max_points:
-                    break
-        return '\n'.join(key_points) if key_points else "• No relevant information found\n"
-
-    def _summarize_text(self, text: str) -> str:
+        points = key_points(content, max_points=max_points,
+                            query_terms=['treatment', 'therapy', 'research', 'study', 'clinical', 'patient',
+                                         'effect', 'medicine', 'result', 'trial', 'evidence'])
+        return '\n'.join(f"• {point}" for point in points) if points else "• No relevant information found\n"
+
+    def _use_extractive(self, text: str, latency_budget: Optional[float]) -> bool:
+        if len(text) <= EXTRACTIVE_MAX_CHARS:
+            return True
+        if latency_budget is not None and latency_budget < ABSTRACTIVE_MIN_BUDGET_S:
+            return True
+        return False
+
+    def _summarize_text(self, text: str, latency_budget: Optional[float] = None) -> str:
         try:
             if len(text) < 50:
                 return text
+            if latency_budget is None:
+                latency_budget = self.summary_latency_budget
+            if self._use_extractive(text, latency_budget):
+                return extractive_summarize(text, max_sentences=3)
             summary = self.summarizer(text, max_length=150, min_length=30, do_sample=False)[0]["summary_text"]
             return summary
         except Exception as e:
             logging.error(f"Error summarizing text: {e}")
             return "Summary not available."
 
-    async def process_message(self, user_input: str, patient_context: Dict[str, Any] = None, deep_research_mode: bool = False, show_thinking: bool = False) -> str:
+    async def deep_research(self, query: str, progress: Optional[Callable[..., None]] = None,
+                            deadline: Optional[Deadline] = None, plan: DegradationPlan = NORMAL_PLAN) -> Dict[str, Any]:
+        """Run the web research pipeline on its own (used by background research jobs)."""
+        return await self._enhanced_web_search(query.rstrip('/').strip(), progress=progress, deadline=deadline,
+                                               plan=plan)
+
+    def is_greeting(self, user_input: str) -> bool:
+        return any(word.lower() in user_input.lower() for word in self.greeting_words)
+
+    async def process_message(self, user_input: str, patient_context: Dict[str, Any] = None, deep_research_mode: bool = False, show_thinking: bool = False, run_research: bool = True, deadline: Optional[Deadline] = None, plan: DegradationPlan = NORMAL_PLAN) -> Tuple[str, Any]:
+        """Answer `user_input`; returns (reply, research).
+
+        `research` is the structured deep-research result (a dict with
+        "sources", see _enhanced_web_search) or an HTML/text note.
+
+        With deep_research_mode and run_research=False the web research step is
+        skipped so the caller can run it as a background job. Stage timeouts are
+        taken from `deadline` when one is given; `plan` limits the research step.
+        A "prompt_context" entry in `patient_context` is added to the prompt."""
         try:
-            # Initialize default timeout value
-            llm_timeout = 90  # Default timeout of 90 seconds for all queries
 
             # Clean up user input - remove trailing slashes and trim whitespace
             user_input = user_input.rstrip('/').strip()
 
             if patient_context:
                 self.set_user_context(patient_context)
+
+            # Token-budgeted patient record (allergies, medications, relevant history)
+            # from app.load_patient_context; empty when there is none
+            patient_section = ""
+            if patient_context and patient_context.get("prompt_context"):
+                patient_section = ("Patient context (use it where it is relevant to the question):\n"
+                                   f"{patient_context['prompt_context']}\n\n")
             
             # Simple greeting detection and response
-            if any(word.lower() in user_input.lower() for word in self.greeting_words):
+            if self.is_greeting(user_input):
                 greeting = self._create_personalized_greeting()
-                return f"{greeting}\\n|||\\n<h3>No Research Needed</h3>"
+                return f"{greeting}\\n", "\\n<h3>No Research Needed</h3>"
 
             current_temperature = 0.7
             # For standard medical queries in simple mode, use a clearer prompt template
@@ -842,6 +847,7 @@ Strictly adhere to this format.
                 current_temperature = 0.4 # Lower temperature for more focused normal mode
                 prompt = (
                     "You are Areya, a medical AI assistant. "
+                    f"{patient_section}"
                     f"The user asked: '{user_input}'\n\n"
                     "Please provide a clear, concise, and well-structured explanation. "
                     "Use Markdown for formatting. Your response should include:\n"
@@ -876,6 +882,7 @@ Strictly adhere to this format.
                 # In deep research mode, provide comprehensive information with citations
                 prompt = (
                     "You are Areya, a medical AI assistant providing exhaustive medical information. "
+                    f"{patient_section}"
                     f"User asked: '{user_input}'\\n\\n"
                     "Your response must be EXTREMELY DETAILED (800-1000 words), using Markdown headings for sections like: "
                     "## Definition, ## Epidemiology, ## Pathophysiology, ## Causes, ## Symptoms, ## Diagnosis, ## Treatment, ## Management, ## Prognosis, ## Prevention, ## Research Directions.\\n\\n"
@@ -905,13 +912,20 @@ Strictly adhere to this format.
                     "num_predict": current_num_predict
                 }
                 
+                # At most 90 seconds, less if the request deadline is closer
+                llm_timeout = stage_timeout(deadline, 90, "LLM generation")
                 logging.info(f"Making direct API call to Ollama. Mode: {'Deep Research' if deep_research_mode else 'Normal'}. Num_predict: {current_num_predict}, Temp: {current_temperature}, Raw: False")
-                api_response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    headers=headers,
-                    json=request_data,
-                    timeout=llm_timeout
-                )
+                # Counted as in flight so load shedding can see how busy Ollama is
+                # In a thread, so the caller's other coroutines (e.g. the patient
+                # context fetch) keep running on the loop during generation
+                with get_degradation_controller().track_llm():
+                    api_response = await asyncio.to_thread(
+                        requests.post,
+                        "http://localhost:11434/api/generate",
+                        headers=headers,
+                        json=request_data,
+                        timeout=llm_timeout
+                    )
                 api_response.raise_for_status()
                 response_data = api_response.json()
                 
@@ -972,35 +986,38 @@ Strictly adhere to this format.
                         research_content = "Research section not identified; full output treated as response."
                     else:
                         logging.warning("Final response is too short or empty after parsing. Generating fallback.")
-                        final_response = self._generate_fallback_response(user_input).replace("<response>","").replace("</response>","") # Use internal fallback
+                        # Blocking Ollama call, so it runs in a thread like the main generation
+                        fallback = await asyncio.to_thread(self._generate_fallback_response, user_input, deadline)
+                        final_response = fallback.replace("<response>","").replace("</response>","") # Use internal fallback
                         research_content = "Default fallback response generated."
                 
                 # For deep research mode, we'll perform an actual web search and replace research_content
-                if deep_research_mode:
+                if deep_research_mode and not run_research:
+                    complete_response = final_response, ""
+                elif deep_research_mode:
                     try:
                         logging.info("Deep research mode activated, performing web search")
-                        research_html = await self._enhanced_web_search(user_input)
-                        logging.info(f"Web search results retrieved: {len(research_html)} characters")
-                        complete_response = f"{final_response}|||{research_html}"
+                        research = await self._enhanced_web_search(user_input, deadline=deadline, plan=plan)
+                        logging.info(f"Web search results retrieved: {len(research['sources'])} sources")
+                        complete_response = final_response, research
                     except Exception as search_error:
                         logging.error(f"Error in deep research mode: {search_error}")
-                        complete_response = f"{final_response}|||{research_content}" # Use LLM's research if web search fails
+                        complete_response = final_response, research_content # Use LLM's research if web search fails
                 else:
                     # Ensure research_content has some value for normal mode
                     if not research_content.strip():
                         research_content = "Standard medical information presented."
-                    complete_response = f"{final_response}|||<h3>Simple Mode Context</h3><p>{research_content}</p>"
+                    complete_response = final_response, f"<h3>Simple Mode Context</h3><p>{research_content}</p>"
                 
                 return complete_response
                 
-            except requests.exceptions.RequestException as e:
+            except (requests.exceptions.RequestException, DeadlineExceeded) as e:
                 logging.error(f"Error calling Ollama API: {e}")
                 error_response = (
                     "<response>\n"
                     "I apologize, but I'm having trouble processing your request at the moment. "
                     "Please try again in a few moments.\n"
-                    "</response>\n"
-                    "|||"
+                    "</response>\n",
                     "<h3>Error Details</h3>"
                     f"<p>Error: {str(e)}</p>"
                 )
@@ -1008,10 +1025,13 @@ Strictly adhere to this format.
                 
         except Exception as e:
             logging.error(f"Error in process_message: {e}")
-            return f"<response>An error occurred: {str(e)}</response>|||<h3>Error</h3><p>{str(e)}</p>"
+            return f"<response>An error occurred: {str(e)}</response>", f"<h3>Error</h3><p>{str(e)}</p>"
+
+    def _generate_fallback_response(self, user_input: str, deadline: Optional[Deadline] = None) -> str:
+        """Generate a helpful fallback response when the model fails to provide a good answer.
 
-    def _generate_fallback_response(self, user_input: str) -> str:
-        """Generate a helpful fallback response when the model fails to provide a good answer."""
+        The emergency model call is skipped, and the canned reply returned, when
+        `deadline` has less than MIN_FALLBACK_BUDGET_S left."""
         try:
             # Simplify the user query to extract the key term
             cleaned_query = user_input.lower().strip().rstrip('?').strip()
@@ -1022,6 +1042,8 @@ Strictly adhere to this format.
             
             # Make a final desperate attempt to directly get a definition
             try:
+                if not self._has_time(deadline, MIN_FALLBACK_BUDGET_S):
+                    raise DeadlineExceeded(f"{deadline.remaining():.1f}s left, skipping the emergency definition")
                 logging.info(f"Making emergency fallback definition attempt for: '{cleaned_query}'")
                 emergency_prompt = (
                     f"Define the term '{cleaned_query}' in medical context with a comprehensive explanation (at least 150 words). "
@@ -1049,7 +1071,7 @@ Strictly adhere to this format.
                             "seed": 123
                         }
                     },
-                    timeout=30  # Quick timeout for emergency attempt
+                    timeout=stage_timeout(deadline, 30, "fallback")  # Quick timeout for emergency attempt
                 )
                 
                 if emergency_response.status_code == 200:
@@ -1109,7 +1131,7 @@ I'm designed to provide medical information dynamically, but sometimes need more
             return """<response>I apologize, but I'm unable to provide a complete answer at this moment. Please try rephrasing your question or try again later.</response>"""
 
     # Add DuckDuckGo search function
-    async def perform_duckduckgo_search(self, query: str) -> List[str]:
+    async def perform_duckduckgo_search(self, query: str, deadline: Optional[Deadline] = None) -> List[str]:
         """Perform a DuckDuckGo search and return a list of URLs"""
         search_urls = []
         ddg_query = f"{query} medical health"
@@ -1132,65 +1154,66 @@ I'm designed to provide medical information dynamically, but sometimes need more
                 'Upgrade-Insecure-Requests': '1',
             }
             
-            # Use aiohttp for the request
-            async with self.session.get(ddg_url, headers=headers, timeout=15) as response:
-                if response.status == 200:
-                    html_content = await response.text()
-                    
-                    # Parse the HTML with BeautifulSoup
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    
-                    # Extract result links - DuckDuckGo HTML results have different structure than Google
-                    result_elements = soup.select('.result__a') or soup.select('.result-link')
-                    
-                    # Alternative selectors if the primary ones don't work
-                    if not result_elements:
-                        logging.info("Using alternative DuckDuckGo selectors")
-                        result_elements = soup.select('a.result__url') or soup.select('a[href^="http"]')
-                    
-                    # Process found elements
-                    seen_urls = set()
-                    for element in result_elements:
-                        try:
-                            # Get the href attribute
-                            url = element.get('href')
+            # Fetch through the per-domain scheduler (rate limits, backoff, shared pool)
+            response = await self.fetcher.fetch_text(ddg_url, headers=headers,
+                                                     timeout=stage_timeout(deadline, 15, "search"))
+            if response.status == 200:
+                html_content = response.text
+                
+                # Parse the HTML with BeautifulSoup
+                soup = BeautifulSoup(html_content, 'html.parser')
+                
+                # Extract result links - DuckDuckGo HTML results have different structure than Google
+                result_elements = soup.select('.result__a') or soup.select('.result-link')
+                
+                # Alternative selectors if the primary ones don't work
+                if not result_elements:
+                    logging.info("Using alternative DuckDuckGo selectors")
+                    result_elements = soup.select('a.result__url') or soup.select('a[href^="http"]')
+                
+                # Process found elements
+                seen_urls = set()
+                for element in result_elements:
+                    try:
+                        # Get the href attribute
+                        url = element.get('href')
+                        
+                        # DuckDuckGo sometimes uses redirects, extract the actual URL
+                        if url and '/redirect/' in url:
+                            parsed = urlparse(url)
+                            query_params = parse_qs(parsed.query)
+                            if 'uddg' in query_params:
+                                url = query_params['uddg'][0]
                             
-                            # DuckDuckGo sometimes uses redirects, extract the actual URL
-                            if url and '/redirect/' in url:
-                                parsed = urlparse(url)
-                                query_params = parse_qs(parsed.query)
-                                if 'uddg' in query_params:
-                                    url = query_params['uddg'][0]
-                                
-                            # Filter valid URLs
-                            if (url and 
-                                url.startswith('http') and 
-                                'duckduckgo.com' not in url and
-                                url not in seen_urls and
-                                not any(ad_term in url.lower() for ad_term in ['ad.', 'ads.', 'advertisement'])):
-                                
-                                # Prioritize medical websites
-                                medical_domains = ['nih.gov', 'mayoclinic.org', 'who.int', 'healthline.com', 
-                                                  'webmd.com', 'medlineplus.gov', 'cdc.gov', 'health.harvard.edu']
-                                
-                                is_medical = any(domain in url.lower() for domain in medical_domains)
+                        # Filter valid URLs
+                        if (url and 
+                            url.startswith('http') and 
+                            'duckduckgo.com' not in url and
+                            url not in seen_urls and
+                            not any(ad_term in url.lower() for ad_term in ['ad.', 'ads.', 'advertisement'])):
+                            
+                            # Prioritize medical websites
+                            medical_domains = ['nih.gov', 'mayoclinic.org', 'who.int', 'healthline.com', 
+                                              'webmd.com', 'medlineplus.gov', 'cdc.gov', 'health.harvard.edu']
+                            
+                            is_medical = any(domain in url.lower() for domain in medical_domains)
+                            
+                            # Add medical sites first, then others
+                            if is_medical or len(search_urls) < 5:
+                                search_urls.append(url)
+                                seen_urls.add(url)
+                                logging.info(f"Found DuckDuckGo URL: {url}")
                                 
-                                # Add medical sites first, then others
-                                if is_medical or len(search_urls) < 5:
-                                    search_urls.append(url)
-                                    seen_urls.add(url)
-                                    logging.info(f"Found DuckDuckGo URL: {url}")
-                                    
-                                    # Stop once we have enough results
-                                    if len(search_urls) >= 8:
-                                        break
-                        except Exception as e:
-                            logging.error(f"Error extracting DuckDuckGo URL: {str(e)}")
-                            continue
-                    
-                    logging.info(f"Found {len(search_urls)} URLs from DuckDuckGo")
-                else:
-                    logging.error(f"DuckDuckGo returned status code: {response.status}")
+                                # Stop once we have enough results
+                                if len(search_urls) >= 8:
+                                    break
+                    except Exception as e:
+                        logging.error(f"Error extracting DuckDuckGo URL: {str(e)}")
+                        continue
+                
+                logging.info(f"Found {len(search_urls)} URLs from DuckDuckGo")
+            else:
+                logging.error(f"DuckDuckGo returned status code: {response.status}")
         except Exception as e:
             logging.error(f"DuckDuckGo search error: {str(e)}")
     
@@ -1208,8 +1231,8 @@ This information is for educational purposes only.
 • Consult with your healthcare provider.
 • Contact support if the issue persists."""
 
-def ask_medical_chatbot_sync(user_query: str, point_id: str, deep_research_mode: bool = False, patient_context: Optional[Dict[str, Any]] = None) -> str:
-    """Synchronous wrapper for ask_medical_chatbot"""
+def ask_medical_chatbot_sync(user_query: str, point_id: str, deep_research_mode: bool = False, patient_context: Optional[Dict[str, Any]] = None) -> Tuple[str, Any]:
+    """Synchronous wrapper for ask_medical_chatbot; returns (reply, research)"""
     agent = AreyaAgent()
     return asyncio.run(agent.process_message(user_query, patient_context, deep_research_mode))
 
@@ -1,14 +1,23 @@
 import os
 from dotenv import load_dotenv
+# Before the local imports below: vectors, deadline etc. read their settings at import.
+load_dotenv()  # Load variables from .env
 from datetime import datetime, timezone
 import requests
 import postgres # Assuming this is your local postgress.py module
+import hmac
 import json
 import uuid
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_mail import Mail, Message # Added for Flask-Mail
-from vectors import get_existing_record,ask_medical_chatbot,update_patient_record
-from agents import AreyaAgent  # Make sure AreyaAgent is defined in agents.py
+from vectors import get_patient_payload,ask_medical_chatbot,find_patient_point_id,get_embeddings
+from vectors import patient_filter, search_patient_records, search_patient_records_batch
+from vectors import aget_patient_payload, close_async_client
+from vectors import QDRANT_URL, RecordNotFound, VectorStoreError, VectorStoreTimeout, VectorStoreUnavailable
+from deadline import Deadline, CHAT_DEADLINE_S, RESEARCH_DEADLINE_S, stage_timeout
+from degradation import NORMAL_PLAN, get_degradation_controller
+# agents.py (langchain, selenium, transformers) is imported inside chatbot() so
+# workers that only serve login/appointments never load it.
 import logging
 from threading import Thread
 import asyncio
@@ -17,7 +26,6 @@ import asyncio
 logging.basicConfig(level=logging.DEBUG, 
                     format='%(asctime)s - %(levelname)s - %(name)s - %(funcName)s - %(message)s')
 
-load_dotenv()  # Load variables from .env
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.debug = True
 
@@ -30,6 +38,11 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME') # Your email address
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD') # Your email password or app password
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 
+# /api/metrics exposes fetch statistics, queue depths and load-shedding state.
+# With METRICS_TOKEN set it needs "Authorization: Bearer <token>"; without it,
+# only requests from this host (e.g. a local scraper or sidecar) are served.
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
 mail = Mail(app)
 
 # Existing Routes
@@ -104,38 +117,22 @@ def api_login():
                 patient_name = f"{first_name} {last_name}"
                 logging.info(f"Processing login for patient: {patient_name} (GUID: {patient_GUID})")
 
-                # Retrieve patient data from qdrant
-                qdrant_url = os.getenv("QDRANT_URL")
-                if not qdrant_url:
-                    logging.error("QDRANT_URL environment variable not set.")
-                    return jsonify({"message": "Qdrant service misconfiguration."}), 500
-                
-                qdrant_scroll_url = f"{qdrant_url}/collections/patient_records/points/scroll"
-                payload = {
-                    "filter": {
-                        "should": [
-                            {"key": "guid", "match": {"value": patient_GUID}},
-                            {"key": "name", "match": {"value": patient_name}}
-                        ]
-                    }
-                }
-                headers = {
-                    "Content-Type": "application/json",
-                    "api-key": os.getenv("QDRANT_API_KEY") # Default can be handled by Qdrant or env
-                }
-                
-                qdrant_response = requests.post(qdrant_scroll_url, json=payload, headers=headers, timeout=10)
-                qdrant_response.raise_for_status() # Will raise HTTPError for bad responses (4xx or 5xx)
-                
-                qdrant_result = qdrant_response.json()
-                points = qdrant_result.get("result", {}).get("points", [])
-                
-                if points:
-                    point_id = points[0].get('id')
-                    if not point_id:
-                        logging.error(f"Qdrant point_id missing for user {username}. Qdrant result: {qdrant_result}")
-                        return jsonify({"message": "Patient vector record incomplete."}), 500
-                        
+                # The patients row carries its Qdrant point ID (migrations/002), so
+                # login needs no Qdrant call; Qdrant is read when the record is.
+                point_id = result.get("qdrant_point_id")
+                if point_id:
+                    # Integer point IDs come back from the TEXT column as digits
+                    point_id = int(point_id) if str(point_id).isdigit() else point_id
+                else:
+                    # Not backfilled yet: look the record up once and remember it
+                    if not QDRANT_URL:
+                        logging.error("QDRANT_URL environment variable not set.")
+                        return jsonify({"message": "Qdrant service misconfiguration."}), 500
+                    point_id = find_patient_point_id(patient_GUID, patient_name)
+                    if point_id:
+                        postgres.set_patient_point_id(patient_GUID, point_id)
+
+                if point_id:
                     # Create response object
                     response_data = {"guid": patient_GUID, "point_id": point_id, "userType": userType, "username": username, "name": patient_name}
                     response = jsonify(response_data)
@@ -166,15 +163,15 @@ def api_login():
                 logging.warning(f"Invalid patient credentials for username: {username}")
                 return jsonify({"message": "Invalid username or password"}), 401 # 401 for unauthorized
             
-        except requests.exceptions.HTTPError as http_err:
-            logging.error(f"HTTP error occurred during Qdrant request for user {username}: {http_err} - Response: {http_err.response.text}")
-            return jsonify({"message": "Error communicating with Qdrant service."}), 502 # 502 Bad Gateway
-        except requests.exceptions.ConnectionError as conn_err:
+        except VectorStoreUnavailable as conn_err:
             logging.error(f"Connection error during Qdrant request for user {username}: {conn_err}")
             return jsonify({"message": "Could not connect to Qdrant service."}), 503 # 503 Service Unavailable
-        except requests.exceptions.Timeout as timeout_err:
+        except VectorStoreTimeout as timeout_err:
             logging.error(f"Timeout during Qdrant request for user {username}: {timeout_err}")
             return jsonify({"message": "Qdrant service request timed out."}), 504 # 504 Gateway Timeout
+        except VectorStoreError as qdrant_err:
+            logging.error(f"Error during Qdrant request for user {username}: {qdrant_err}")
+            return jsonify({"message": "Error communicating with Qdrant service."}), 502 # 502 Bad Gateway
         except Exception as e:
             logging.error(f"An unexpected error occurred during patient login for {username}: {str(e)}", exc_info=True)
             return jsonify({"message": "An internal error occurred. Please try again later."}), 500
@@ -229,6 +226,14 @@ def api_login():
         logging.warning(f"Invalid userType received: {userType}")
         return jsonify({"message": "Invalid user type specified"}), 400
 
+# Payload keys the dashboard never shows; left out of /api/patient-records reads.
+DASHBOARD_EXCLUDED_FIELDS = ["conversations"]
+# The payload keys /api/chatbot reads for the patient context. medical_history
+# grows without bound, so it is only read for questions, and only the entries
+# patient_context.build_patient_context retrieves within its token budget reach the prompt.
+CHAT_CONTEXT_FIELDS = ["name", "last_visit", "last_condition", "age",
+                       "conditions", "medications", "allergies", "guid"]
+
 @app.route("/api/patient-records", methods=["POST"])
 def api_patient_records():
     data = request.get_json()
@@ -236,9 +241,8 @@ def api_patient_records():
     if not point_id:
         return jsonify({"message": "No patient point ID provided"}), 400
     try:
-        record = get_existing_record(point_id)
-        if record:
-            payload = record.get("payload", {}) # Ensure payload is a dict
+        payload = get_patient_payload(point_id, exclude=DASHBOARD_EXCLUDED_FIELDS)
+        if payload is not None:
 
             # Ensure all expected keys for the dashboard are present
             # This prevents KeyErrors if some records are missing these fields
@@ -275,10 +279,95 @@ def api_patient_records():
                 return jsonify({"message": "Patient record has no payload"}), 404
         else:
             return jsonify({"message": "Patient not found"}), 404
+    except RecordNotFound:
+        return jsonify({"message": "Patient not found"}), 404
     except Exception as e:
         app.logger.error(f"Error in /api/patient-records for point_id {point_id}: {str(e)}", exc_info=True) # Log full error
         return jsonify({"message": str(e)}), 500
 
+# Payload keys returned with each search hit.
+SEARCH_RESULT_FIELDS = ["guid", "name", "age", "gender", "location", "conditions", "last_condition", "last_visit"]
+SEARCH_BATCH_MAX = 16
+
+def _search_spec(spec, defaults):
+    """Validated query text, page and filter for one search; raises ValueError."""
+    merged = {**defaults, **spec}
+    query = str(merged.get("query") or "").strip()
+    if not query:
+        raise ValueError("Each search needs a non-empty 'query'")
+    filters = merged.get("filters") or {}
+    conditions = filters.get("conditions")
+    if isinstance(conditions, str):
+        conditions = [conditions]
+    try:
+        score_threshold = merged.get("score_threshold")
+        return {
+            "query": query,
+            "limit": int(merged.get("limit", 10)),
+            "offset": int(merged.get("offset", 0)),
+            "score_threshold": None if score_threshold is None else float(score_threshold),
+            "filter": patient_filter(
+                age_min=None if filters.get("age_min") is None else int(filters["age_min"]),
+                age_max=None if filters.get("age_max") is None else int(filters["age_max"]),
+                location=filters.get("location"),
+                conditions=conditions,
+            ),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("limit, offset, score_threshold and age filters must be numbers")
+
+def _search_results(spec, hits, next_offset):
+    return {
+        "query": spec["query"],
+        "results": [{"point_id": hit["id"], "score": round(hit["score"], 4), **hit["payload"]} for hit in hits],
+        "next_offset": next_offset,
+        "has_more": next_offset is not None
+    }
+
+@app.route("/api/patients/search", methods=["POST"])
+def api_search_patients():
+    """Semantic search over patient records.
+
+    Body: `query` text plus optional `limit` (max 100), `offset`,
+    `score_threshold` (cosine similarity) and `filters` (`age_min`, `age_max`,
+    `location`, `conditions`). Send `queries`, a list of such objects, to run
+    up to 16 searches in one Qdrant batch; top-level fields are their defaults."""
+    from embedding_service import EmbeddingError
+    data = request.get_json() or {}
+    batch = "queries" in data
+    try:
+        defaults = {key: value for key, value in data.items() if key != "queries"}
+        raw = data["queries"] if batch else [{}]
+        if not isinstance(raw, list) or not 1 <= len(raw) <= SEARCH_BATCH_MAX:
+            raise ValueError(f"'queries' must be a list of 1 to {SEARCH_BATCH_MAX} searches")
+        specs = [_search_spec(spec, defaults) for spec in raw]
+        query_vectors = get_embeddings().embed_documents([spec["query"] for spec in specs])
+        if batch:
+            pages = search_patient_records_batch(
+                [{**spec, "vector": vector} for spec, vector in zip(specs, query_vectors)], include=SEARCH_RESULT_FIELDS)
+        else:
+            spec = specs[0]
+            pages = [search_patient_records(query_vectors[0], limit=spec["limit"], offset=spec["offset"],
+                                            score_threshold=spec["score_threshold"], query_filter=spec["filter"],
+                                            include=SEARCH_RESULT_FIELDS)]
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except EmbeddingError as e:
+        app.logger.error(f"Patient search: embedding failed: {e}")
+        return jsonify({"message": "Search is temporarily unavailable"}), 503
+    except VectorStoreTimeout as e:
+        app.logger.error(f"Patient search: {e}")
+        return jsonify({"message": "Patient search timed out"}), 504
+    except VectorStoreUnavailable as e:
+        app.logger.error(f"Patient search: {e}")
+        return jsonify({"message": "Patient records are temporarily unavailable"}), 503
+    except VectorStoreError as e:
+        app.logger.error(f"Patient search: {e}")
+        return jsonify({"message": "Patient search failed"}), 502
+
+    results = [_search_results(spec, hits, next_offset) for spec, (hits, next_offset) in zip(specs, pages)]
+    return jsonify({"searches": results} if batch else results[0])
+
 def run_agent(coro, result_container):
     result_container.append(asyncio.run(coro))
 
@@ -302,90 +391,68 @@ def chatbot():
         try:
             # Get start time for performance tracking
             start_time = datetime.now()
+            # One budget for the whole request; every stage below sizes its timeout from it
+            deadline = Deadline(CHAT_DEADLINE_S)
+
+            # Under load, deep research is trimmed or downgraded to simple mode
+            plan = get_degradation_controller().plan(deep_research_mode)
+            if not plan.deep_research:
+                deep_research_mode = False
             app.logger.info(f"Processing chatbot request for query: {user_query[:50]}...{' (Deep Research Mode)' if deep_research_mode else ' (Simple Mode)'}")
             
-            # Fetch patient context
-            try:
-                patient_data = get_existing_record(point_id).get("payload", {})
-                patient_context = {
-                    "name": patient_data.get("name", "User"),
-                    "last_visit": patient_data.get("last_visit"),
-                    "last_condition": patient_data.get("last_condition"),
-                    "medical_history": patient_data.get("medical_history", []),
-                    "age": patient_data.get("age"),
-                    "conditions": patient_data.get("conditions", []),
-                    "medications": patient_data.get("medications", []),
-                    "allergies": patient_data.get("allergies", []),
-                    "guid": patient_data.get("guid", "")
-                }
-                app.logger.info(f"Patient context loaded for {patient_context['name']}")
-            except Exception as e:
-                app.logger.error(f"Error fetching patient context: {e}")
-                patient_context = {"name": "User"}
-
-            # Check if Ollama server is running first
-            try:
-                ollama_response = requests.get("http://localhost:11434/api/tags", timeout=5)
-                if ollama_response.status_code != 200:
-                    app.logger.error(f"Ollama server is not responding properly: {ollama_response.status_code}")
-                    return jsonify({
-                        "reply": "The medical AI service is currently experiencing technical difficulties. Please try again in a few minutes.",
-                        "research": "<h3>Service Status</h3><p>The AI service is temporarily unavailable.</p>",
-                        "show_thinking": False
-                    }), 503
-                else:
-                    app.logger.info("Ollama server is running and responding")
-            except requests.exceptions.RequestException as e:
-                app.logger.error(f"Failed to connect to Ollama server: {e}")
-                return jsonify({
-                    "reply": "Unable to connect to the AI service. Please ensure the service is running.",
-                    "research": f"<h3>Connection Error</h3><p>{str(e)}</p>",
-                    "show_thinking": False
-                }), 503
-
             # Initialize Areya agent and process message
+            from agents import AreyaAgent
             agent = AreyaAgent()
-            
-            # Use asyncio.run to call the async method
-            response = asyncio.run(agent.process_message(
+
+            # Deep research runs as a background job: reply with the LLM answer now
+            # and let the client follow research progress on /api/research/<job_id>.
+            # Jobs are only readable by the point_id that started them, so without
+            # one the research runs inline instead.
+            research_in_background = deep_research_mode and bool(point_id) and not agent.is_greeting(user_query)
+
+            patient_context, ollama_error, response = asyncio.run(chat_turn(
+                agent,
                 user_query,
-                patient_context=patient_context,
+                point_id,
+                deadline,
                 deep_research_mode=deep_research_mode,
-                show_thinking=show_thinking
+                show_thinking=show_thinking,
+                run_research=not research_in_background,
+                plan=plan
             ))
-
-            # Split response into parts if it contains the separator
-            parts = response.split('|||')
-            reply = parts[0].strip()
-            research = parts[1].strip() if len(parts) > 1 else ""
+            if ollama_error:
+                return jsonify(ollama_error), 503
+            app.logger.info(f"Chatbot reply ready in {deadline.elapsed():.1f}s ({deadline.remaining():.1f}s of budget left)")
+
+            # research is structured deep research (see AreyaAgent._enhanced_web_search) or an HTML note
+            reply, research = response
+            reply = reply.strip()
+            if isinstance(research, str):
+                research = research.strip()
+
+            if research_in_background:
+                job = start_research_job(user_query, point_id, reply, patient_context.get("name", "User"),
+                                         deadline=Deadline(RESEARCH_DEADLINE_S), plan=plan)
+                app.logger.info(f"Deep research job {job.id} queued for query: {user_query[:50]}")
+                return jsonify({
+                    "reply": reply,
+                    "research": "",
+                    "research_job": {
+                        "id": job.id,
+                        "status_url": f"/api/research/{job.id}",
+                        "stream_url": f"/api/research/{job.id}/stream"
+                    },
+                    "degraded": plan.to_flag(),
+                    "show_thinking": show_thinking
+                })
 
             # Update patient record with conversation
-            try:
-                update_patient_record(
-                    point_id, 
-                    {
-                        "conversations": [{
-                            "timestamp": datetime.now(timezone.utc).isoformat(),
-                            "id": str(datetime.now().timestamp()),
-                            "sender": "User",
-                            "message": user_query
-                        }, {
-                            "timestamp": datetime.now(timezone.utc).isoformat(),
-                            "id": str(datetime.now().timestamp() + 1),
-                            "sender": "Areya",
-                            "message": reply,
-                            "research": research,
-                            "sources": extract_sources_from_research(research)
-                        }]
-                    }
-                )
-                app.logger.info(f"Conversation history updated for user {patient_context['name']}")
-            except Exception as e:
-                app.logger.error(f"Error updating conversation history: {e}")
+            save_conversation(point_id, user_query, reply, research, patient_context.get("name", "User"))
 
             return jsonify({
                 "reply": reply,
                 "research": research,
+                "degraded": plan.to_flag(),
                 "show_thinking": show_thinking
             })
 
@@ -405,134 +472,239 @@ def chatbot():
             "show_thinking": False
         }), 500
 
-def extract_sources_from_research(research_text):
-    """Extract source information from research text to store separately"""
-    sources = []
-    if not research_text:
-        return sources
-        
+async def load_patient_context(point_id, deadline, user_query=None):
+    """The patient fields the agent personalizes with; {"name": "User"} if the record can't be read.
+
+    With `user_query`, "prompt_context" also holds the token-budgeted context
+    (patient_context.build_patient_context) that process_message adds to the prompt."""
+    from patient_context import CONTEXT_FIELDS
+    fields = CHAT_CONTEXT_FIELDS + ["medical_history"] if user_query else CHAT_CONTEXT_FIELDS
     try:
-        # Using regex to find source domains and links
-        import re
-        
-        # Multiple patterns to extract source information
-        # First trying the div-based format
-        domain_matches_div = re.findall(r"<div class=['\"]source-domain['\"]>(.*?)</div>", research_text)
-        link_matches_div = re.findall(r"<a href=['\"]([^'\"]+)['\"][^>]*>.*?</a>", research_text)
-        content_matches_div = re.findall(r"<div class=['\"]source-content['\"]>(.*?)</div>", research_text)
-        
-        #  trying h3/p format that might be used
-        domain_matches_h3 = re.findall(r"<h3>(.*?)</h3>", research_text)
-        content_matches_p = re.findall(r"<p>(.*?)</p>", research_text)
-        
-        # Using the format that found more matches
-        if len(domain_matches_div) > 0:
-            app.logger.info(f"Using div-based format: found {len(domain_matches_div)} domains")
-            domain_matches = domain_matches_div
-            content_matches = content_matches_div
-            link_matches = link_matches_div
-        else:
-            app.logger.info(f"Using h3/p format: found {len(domain_matches_h3)} domains")
-            domain_matches = domain_matches_h3
-            content_matches = content_matches_p
-            # Try to extract links from the research text
-            link_matches = re.findall(r"<a href=['\"]([^'\"]+)['\"][^>]*>", research_text)
-        
-        # Combining the extracted information
-        for i in range(min(len(domain_matches), max(1, len(content_matches)))):
-            source = {
-                "domain": domain_matches[i] if i < len(domain_matches) else "Medical Source",
-                "url": link_matches[i] if i < len(link_matches) else "",
-                "snippet": content_matches[i] if i < len(content_matches) else "Source information not available"
-            }
-            
-            # Cleaning  up HTML tags from content
-            source["snippet"] = re.sub(r"<[^>]+>", "", source["snippet"])
-            
-            # Limit snippet length
-            if len(source["snippet"]) > 300:
-                source["snippet"] = source["snippet"][:297] + "..."
-                
-            sources.append(source)
-            
-        if not sources and "source" in research_text.lower():
-            # Fallback for research text that mentions sources but doesn't match our patterns
-            # Extract for URLs from the text
-            all_urls = re.findall(r"https?://[^\s<>\"']+", research_text)
-            
-            for url in all_urls:
-                # Try to extract domain from URL
-                domain_match = re.search(r"https?://(?:www\.)?([^/]+)", url)
-                domain = domain_match.group(1) if domain_match else "Medical Source"
-                
-                source = {
-                    "domain": domain,
-                    "url": url,
-                    "snippet": "Information from this source was referenced in the research."
-                }
-                sources.append(source)
-                
-        app.logger.info(f"Extracted {len(sources)} sources from research data")
+        patient_data = await aget_patient_payload(
+            point_id, timeout=stage_timeout(deadline, 10, "patient context"), include=fields)
+        patient_context = {
+            "name": patient_data.get("name", "User"),
+            "last_visit": patient_data.get("last_visit"),
+            "last_condition": patient_data.get("last_condition"),
+            "age": patient_data.get("age"),
+            "conditions": patient_data.get("conditions", []),
+            "medications": patient_data.get("medications", []),
+            "allergies": patient_data.get("allergies", []),
+            "guid": patient_data.get("guid", "")
+        }
+        app.logger.info(f"Patient context loaded for {patient_context['name']}")
     except Exception as e:
-        app.logger.error(f"Error extracting sources from research: {e}")
-        
+        app.logger.error(f"Error fetching patient context: {e}")
+        return {"name": "User"}
+    if user_query and any(patient_data.get(field) for field in CONTEXT_FIELDS):
+        patient_context["prompt_context"] = await build_prompt_context(patient_data, user_query, deadline)
+    return patient_context
+
+async def build_prompt_context(patient_data, user_query, deadline):
+    """Budgeted context text for the prompt; "" if retrieval doesn't finish in time."""
+    from patient_context import build_patient_context
+    try:
+        # Embedding the question (and uncached history) blocks, so it runs in a thread
+        built = await asyncio.wait_for(asyncio.to_thread(build_patient_context, patient_data, user_query),
+                                       stage_timeout(deadline, 10, "patient history"))
+    except Exception as e:
+        app.logger.error(f"Error building the patient prompt context: {e}")
+        return ""
+    app.logger.info(f"Patient prompt context: {built.to_dict()}")
+    return built.text
+
+def check_ollama(deadline):
+    """None when the Ollama server answers, else the error body to reply with (503)."""
+    try:
+        ollama_response = requests.get("http://localhost:11434/api/tags",
+                                       timeout=stage_timeout(deadline, 5, "Ollama health check"))
+        if ollama_response.status_code != 200:
+            app.logger.error(f"Ollama server is not responding properly: {ollama_response.status_code}")
+            return {
+                "reply": "The medical AI service is currently experiencing technical difficulties. Please try again in a few minutes.",
+                "research": "<h3>Service Status</h3><p>The AI service is temporarily unavailable.</p>",
+                "show_thinking": False
+            }
+        app.logger.info("Ollama server is running and responding")
+        return None
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"Failed to connect to Ollama server: {e}")
+        return {
+            "reply": "Unable to connect to the AI service. Please ensure the service is running.",
+            "research": f"<h3>Connection Error</h3><p>{str(e)}</p>",
+            "show_thinking": False
+        }
+
+async def chat_turn(agent, user_query, point_id, deadline, **options):
+    """Run one chatbot turn on a single event loop.
+
+    The patient context is read through the async Qdrant client, and for
+    questions the relevant history retrieved, while the Ollama health check
+    runs in a thread. Returns (patient_context, ollama_error, response);
+    response is None when Ollama is down. `options` are passed on to
+    agent.process_message."""
+    try:
+        query = None if agent.is_greeting(user_query) else user_query
+        context_task = asyncio.create_task(load_patient_context(point_id, deadline, query))
+        ollama_error = await asyncio.to_thread(check_ollama, deadline)
+        patient_context = await context_task
+        if ollama_error:
+            return patient_context, ollama_error, None
+        response = await agent.process_message(user_query, patient_context=patient_context, deadline=deadline,
+                                               **options)
+        return patient_context, None, response
+    finally:
+        await close_async_client()
+
+def save_conversation(point_id, user_query, reply, research, patient_name="User"):
+    """Append a user/Areya exchange to the patient's conversation history."""
+    saved = postgres.append_conversation_exchange(
+        point_id,
+        conversation_id=uuid.uuid4().hex,
+        user_message=user_query,
+        response=reply,
+        sources=compact_sources(research),
+        created_at=datetime.now(timezone.utc),
+    )
+    if saved:
+        app.logger.info(f"Conversation history updated for user {patient_name}")
+    else:
+        app.logger.error(f"Error updating conversation history for user {patient_name}")
+
+def start_research_job(user_query, point_id, reply, patient_name="User", deadline=None, plan=None):
+    """Queue the deep-research pipeline; the conversation is saved when it finishes.
+
+    `deadline` starts counting at submission, so time spent queued is part of the budget.
+    `plan` is the load-shedding tier chosen for the request (degradation.py)."""
+    from agents import AreyaAgent
+    from research_jobs import get_job_manager, DONE
+
+    def run(job):
+        agent = AreyaAgent()
+        try:
+            return asyncio.run(agent.deep_research(user_query, progress=job.publish, deadline=deadline,
+                                                   plan=plan or NORMAL_PLAN))
+        finally:
+            agent.close()
+
+    def on_complete(job):
+        research = job.result if job.status == DONE else None
+        save_conversation(point_id, user_query, reply, research, patient_name)
+
+    return get_job_manager().submit(user_query, run, on_complete, owner=point_id)
+
+@app.route("/api/research/<job_id>", methods=["GET"])
+def api_research_status(job_id):
+    """Poll a deep-research job.
+
+    Query args: `point_id` (the patient the job was started for), `since`
+    (first event seq to return) and `wait` (long-poll up to this many seconds,
+    max 30, for new events). Other patients' jobs are reported as not found."""
+    from research_jobs import get_job_manager
+    job = get_job_manager().get(job_id, owner=request.args.get("point_id"))
+    if not job:
+        return jsonify({"message": "Research job not found"}), 404
+    since = max(request.args.get("since", 0, type=int), 0)
+    wait = min(max(request.args.get("wait", 0, type=float), 0), 30)
+    if wait:
+        job.wait_events(since, wait)
+    return jsonify(job.to_dict(since))
+
+@app.route("/api/research/<job_id>/stream", methods=["GET"])
+def api_research_stream(job_id):
+    """Server-Sent Events stream of a deep-research job's progress and result.
+
+    Takes `point_id` and `since` like /api/research/<job_id>."""
+    from flask import Response, stream_with_context
+    from research_jobs import get_job_manager
+    job = get_job_manager().get(job_id, owner=request.args.get("point_id"))
+    if not job:
+        return jsonify({"message": "Research job not found"}), 404
+
+    def generate():
+        since = max(request.args.get("since", 0, type=int), 0)
+        while True:
+            events, finished = job.wait_events(since, 15)
+            for event in events:
+                yield f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+            since += len(events)
+            if finished and since >= len(job.events):
+                yield f"event: result\ndata: {json.dumps(job.to_dict(since))}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def compact_sources(research):
+    """Compact source list persisted with a conversation.
+
+    `research` is the structured result of deep research ({"sources": [...]});
+    simple-mode notes and error strings have no sources. Previews and mirrors
+    are left out to keep the patient payload small."""
+    if not isinstance(research, dict):
+        return []
+    sources = []
+    for source in research.get("sources", []):
+        snippet = source.get("summary") or ""
+        if len(snippet) > 300:
+            snippet = snippet[:297] + "..."
+        sources.append({
+            "domain": source.get("domain", ""),
+            "url": source.get("url", ""),
+            "title": source.get("title", ""),
+            "snippet": snippet
+        })
     return sources
 
 @app.route('/screenshots/<path:filename>')
 def serve_screenshot(filename):
     return send_from_directory('screenshots', filename)
 
+def _parse_time_bound(value, name):
+    """Timezone-aware datetime from an ISO-8601 request field (UTC if no offset), or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' timestamp: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
 @app.route("/api/conversations", methods=["POST"])
 def api_conversations():
-    """Retrieve conversation history for a patient"""
+    """Retrieve one page of a patient's conversation history, newest first.
+
+    Optional fields: `limit` (default 20, max 100), `cursor` (the previous
+    page's `next_cursor`), and `since`/`until` ISO-8601 timestamps. `total`
+    counts every exchange within `since`/`until`, not just this page."""
     data = request.get_json()
     point_id = data.get("point_id")
     
     if not point_id:
         return jsonify({"message": "No patient point ID provided"}), 400
-        
+
     try:
-        record = get_existing_record(point_id)
-        if record:
-            payload = record.get("payload", {})
-            conversations = payload.get("conversations", [])
-            
-            # Group conversations by pairs (user and response)
-            grouped_conversations = []
-            current_group = None
-            
-            for conv in conversations:
-                if conv.get("sender") == "User" and not current_group:
-                    # Start a new group with a user message
-                    current_group = {
-                        "id": conv.get("id", str(datetime.now().timestamp())),
-                        "timestamp": conv.get("timestamp", datetime.now(timezone.utc).isoformat()),
-                        "user_message": conv.get("message", ""),
-                        "response": None,
-                        "research": None,
-                        "sources": []
-                    }
-                elif conv.get("sender") == "Areya" and current_group:
-                    # Complete the group with Areya's response
-                    current_group["response"] = conv.get("message", "")
-                    current_group["research"] = conv.get("research", "")
-                    current_group["sources"] = conv.get("sources", [])
-                    grouped_conversations.append(current_group)
-                    current_group = None
-            
-            # Sort by timestamp, newest first
-            grouped_conversations.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-            
-            return jsonify({
-                "conversations": grouped_conversations,
-                "total": len(grouped_conversations)
-            })
-        else:
-            return jsonify({"message": "Patient not found"}), 404
+        limit = int(data.get("limit", 20))
+        since = _parse_time_bound(data.get("since"), "since")
+        until = _parse_time_bound(data.get("until"), "until")
+        conversations, next_cursor = postgres.get_conversation_exchanges(
+            point_id, limit=limit, cursor=data.get("cursor"), since=since, until=until)
+        total = postgres.count_conversation_exchanges(point_id, since=since, until=until)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error retrieving conversation history: {e}")
         return jsonify({"message": str(e)}), 500
 
+    return jsonify({
+        "conversations": conversations,
+        "total": total,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
+
 @app.route("/api/conversations/delete", methods=["POST"])
 def api_delete_conversation():
     """Delete a specific conversation from patient history"""
@@ -544,57 +716,14 @@ def api_delete_conversation():
         return jsonify({"message": "Missing required parameters"}), 400
         
     try:
-        record = get_existing_record(point_id)
-        if not record:
-            return jsonify({"message": "Patient not found"}), 404
-            
-        payload = record.get("payload", {})
-        conversations = payload.get("conversations", [])
-        
-        # Find all conversation IDs that need to be removed
-        # This includes the target ID and any responses tied to it
-        ids_to_remove = set()
-        ids_to_remove.add(conversation_id)
-        
-        # Find related messages (user/Areya pairs)
-        user_timestamp = None
-        for conv in conversations:
-            if conv.get("id") == conversation_id:
-                # If we found the target conversation, get its timestamp
-                user_timestamp = conv.get("timestamp")
-                break
-                
-        # If we found a timestamp, find Areya's response that is close in time
-        if user_timestamp:
-            # Convert to datetime for comparison if it's a string
-            if isinstance(user_timestamp, str):
-                try:
-                    user_dt = datetime.fromisoformat(user_timestamp.replace('Z', '+00:00'))
-                    # Look for messages within 5 seconds of the user message
-                    for conv in conversations:
-                        if conv.get("sender") == "Areya":
-                            conv_timestamp = conv.get("timestamp")
-                            if conv_timestamp and isinstance(conv_timestamp, str):
-                                try:
-                                    conv_dt = datetime.fromisoformat(conv_timestamp.replace('Z', '+00:00'))
-                                    # If the Areya message is within 5 seconds of the user message, it's likely the response
-                                    if abs((conv_dt - user_dt).total_seconds()) < 5:
-                                        ids_to_remove.add(conv.get("id"))
-                                except (ValueError, TypeError):
-                                    continue
-                except (ValueError, TypeError):
-                    pass
-        
-        # Filter out the conversations with the IDs to remove
-        new_conversations = [conv for conv in conversations if conv.get("id") not in ids_to_remove]
-        
-        # Update the patient record with the filtered conversations
-        update_patient_record(point_id, {"conversations": new_conversations})
-        
+        remaining = postgres.delete_conversation_exchange(point_id, conversation_id)
+        if remaining is None:
+            return jsonify({"message": "Conversation not found"}), 404
+
         return jsonify({
             "success": True,
             "message": "Conversation deleted successfully",
-            "remaining": len(new_conversations) // 2  # Dividing by 2 to get conversation pairs
+            "remaining": remaining
         })
     except Exception as e:
         app.logger.error(f"Error deleting conversation: {e}")
@@ -804,6 +933,31 @@ def api_appointment_page_data():
         app.logger.error(f"Error fetching appointment page data: {str(e)}", exc_info=True)
         return jsonify({"success": False, "message": "An error occurred while fetching appointment page data."}), 500
 
+def metrics_allowed():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    """Operational metrics for this worker process (internal; see METRICS_TOKEN)."""
+    if not metrics_allowed():
+        return jsonify({"message": "Forbidden"}), 403
+    from fetcher import get_fetcher
+    from dedup import dedup_metrics
+    from pubmed import get_pubmed_client
+    from record_cache import get_record_cache
+    from embedding_service import embedding_metrics
+    return jsonify({
+        "research_fetch": get_fetcher().metrics(),
+        "research_dedup": dedup_metrics(),
+        "pubmed": get_pubmed_client().metrics(),
+        "degradation": get_degradation_controller().metrics(),
+        "record_cache": get_record_cache().metrics(),
+        "embeddings": embedding_metrics()
+    })
+
 if __name__ == "__main__":
     # The basicConfig is already set up above, no need to call it again here
     # unless you want a different configuration for when run directly.
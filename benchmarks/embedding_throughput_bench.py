@@ -0,0 +1,139 @@
+"""
+Embedding throughput: one request per caller vs the micro-batching EmbeddingService.
+
+Several threads each embed short texts one at a time, as concurrent search
+queries or record updates do. Texts per second and per-call latency are
+reported for:
+
+    direct    one backend request per text (OllamaEmbeddings as vectors.py used it)
+    batched   EmbeddingService, cache disabled: concurrent texts share requests
+    cached    EmbeddingService on a warm SQLite cache (the same texts again)
+
+By default a stub backend stands in for Ollama: each request costs
+--request-ms plus --text-ms per text and at most --server-parallel requests
+run at once, roughly how Ollama serves an embedding model. --live sends the
+requests to Ollama at OLLAMA_BASE_URL with --model instead.
+
+Usage (from the repository root):
+    python benchmarks/embedding_throughput_bench.py
+    python benchmarks/embedding_throughput_bench.py --callers 32 --texts 50 --batch-max 64
+    python benchmarks/embedding_throughput_bench.py --live --model nomic-embed-text --texts 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedding_service  # noqa: E402
+
+
+class StubBackend:
+    """Fixed cost per request plus a cost per text, with limited server parallelism."""
+
+    def __init__(self, request_ms, text_ms, parallel, dim):
+        self.request_s = request_ms / 1000
+        self.text_s = text_ms / 1000
+        self.dim = dim
+        self._slots = threading.Semaphore(parallel)
+        self.requests = 0
+
+    def __call__(self, texts):
+        with self._slots:
+            self.requests += 1
+            time.sleep(self.request_s + self.text_s * len(texts))
+        return [[float(len(text) % 7)] * self.dim for text in texts]
+
+
+def make_texts(callers, per_caller, tag):
+    return [[f"{tag} patient {c} note {i}: asthma, metformin, follow-up visit" for i in range(per_caller)]
+            for c in range(callers)]
+
+
+def run(embed_one, texts_by_caller):
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(texts):
+        for text in texts:
+            start = time.perf_counter()
+            embed_one(text)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(texts_by_caller)) as pool:
+        list(pool.map(caller, texts_by_caller))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "texts_per_s": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=16, help="concurrent threads")
+    parser.add_argument("--texts", type=int, default=25, help="texts embedded by each thread")
+    parser.add_argument("--batch-max", type=int, default=embedding_service.EMBED_BATCH_MAX)
+    parser.add_argument("--batch-wait-ms", type=float, default=embedding_service.EMBED_BATCH_WAIT_MS)
+    parser.add_argument("--concurrency", type=int, default=embedding_service.EMBED_CONCURRENCY,
+                        help="batches in flight")
+    parser.add_argument("--request-ms", type=float, default=25.0, help="stub: fixed cost per request")
+    parser.add_argument("--text-ms", type=float, default=1.5, help="stub: cost per text")
+    parser.add_argument("--server-parallel", type=int, default=2, help="stub: requests served at once")
+    parser.add_argument("--dim", type=int, default=768, help="stub: vector size")
+    parser.add_argument("--live", action="store_true", help="embed with Ollama at OLLAMA_BASE_URL")
+    parser.add_argument("--model", default=embedding_service.EMBED_MODEL, help="--live: Ollama model")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.live:
+        from langchain_ollama import OllamaEmbeddings
+        backend = OllamaEmbeddings(model=args.model, base_url=embedding_service.OLLAMA_BASE_URL).embed_documents
+        backend(["warm up"])
+    else:
+        backend = StubBackend(args.request_ms, args.text_ms, args.server_parallel, args.dim)
+
+    rows = []
+    texts = make_texts(args.callers, args.texts, "direct")
+    rows.append(("direct", run(lambda text: backend([text]), texts), args.callers * args.texts))
+
+    batched = embedding_service.EmbeddingService(model=args.model, backend=backend, cache_path="",
+                                                 batch_max=args.batch_max, batch_wait_ms=args.batch_wait_ms,
+                                                 concurrency=args.concurrency)
+    rows.append(("batched", run(batched.embed_query, make_texts(args.callers, args.texts, "batched")),
+                 batched.metrics()["backend_calls"]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cached = embedding_service.EmbeddingService(model=args.model, backend=backend,
+                                                    cache_path=os.path.join(tmp, "cache.sqlite3"),
+                                                    batch_max=args.batch_max, batch_wait_ms=args.batch_wait_ms,
+                                                    concurrency=args.concurrency)
+        warm = make_texts(args.callers, args.texts, "cached")
+        cached.embed([text for texts in warm for text in texts])
+        calls_before = cached.metrics()["backend_calls"]
+        rows.append(("cached", run(cached.embed_query, warm), cached.metrics()["backend_calls"] - calls_before))
+
+    source = f"ollama {args.model}" if args.live else (
+        f"stub {args.request_ms:g} ms/request + {args.text_ms:g} ms/text, {args.server_parallel} parallel")
+    print(f"{args.callers} callers x {args.texts} texts, {source}\n")
+    print(f"{'mode':<8} {'texts/s':>9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9}")
+    for name, stats, requests in rows:
+        print(f"{name:<8} {stats['texts_per_s']:>9.1f} {stats['mean_ms']:>8.2f} {stats['p50_ms']:>8.2f} "
+              f"{stats['p95_ms']:>8.2f} {requests:>9}")
+    print(f"\nbatched: {batched.metrics()['avg_batch']} texts per request on average, "
+          f"{rows[1][1]['texts_per_s'] / rows[0][1]['texts_per_s']:.1f}x direct throughput")
+
+
+if __name__ == "__main__":
+    main()
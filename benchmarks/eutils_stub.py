@@ -0,0 +1,124 @@
+"""
+Local stand-in for NCBI E-utilities, serving the sample responses in
+benchmarks/fixtures/eutils.
+
+`esearch.fcgi` returns esearch.json. `efetch.fcgi` returns the articles of
+efetch.xml selected by `id=` or by `retstart`/`retmax` (history paging), so
+the PubMedClient batching paths can be exercised offline.
+
+Usage (from the repository root):
+    python benchmarks/eutils_stub.py --port 8099
+    PUBMED_EUTILS_URL=http://127.0.0.1:8099/entrez/eutils python app.py
+
+    python benchmarks/eutils_stub.py --check   # run PubMedClient against the stub and exit
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "eutils")
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES, "esearch.json"), "rb") as handle:
+        esearch = handle.read()
+    tree = ET.parse(os.path.join(FIXTURES, "efetch.xml"))
+    articles = tree.getroot().findall("PubmedArticle")
+    return esearch, articles
+
+
+class EUtilsHandler(BaseHTTPRequestHandler):
+    esearch = b""
+    articles = []
+    requests_seen = []
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        utility = parsed.path.rsplit("/", 1)[-1]
+        type(self).requests_seen.append((utility, params))
+
+        if utility == "esearch.fcgi":
+            self._send(200, "application/json", self.esearch)
+        elif utility == "efetch.fcgi":
+            self._send(200, "text/xml", self._efetch(params))
+        else:
+            self._send(404, "text/plain", b"unknown utility")
+
+    def _efetch(self, params) -> bytes:
+        if "id" in params:
+            wanted = set(params["id"].split(","))
+            selected = [a for a in self.articles if a.findtext("MedlineCitation/PMID") in wanted]
+        else:
+            start = int(params.get("retstart", 0))
+            selected = self.articles[start:start + int(params.get("retmax", 20))]
+        root = ET.Element("PubmedArticleSet")
+        root.extend(selected)
+        return b'<?xml version="1.0" ?>\n' + ET.tostring(root)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(port):
+    EUtilsHandler.esearch, EUtilsHandler.articles = load_fixtures()
+    server = ThreadingHTTPServer(("127.0.0.1", port), EUtilsHandler)
+    return server
+
+
+def check(port):
+    """Run the PubMed client against the stub: history paging, then a cached repeat."""
+    os.environ["PUBMED_EUTILS_URL"] = f"http://127.0.0.1:{port}/entrez/eutils"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import fetcher
+    fetcher.DOMAIN_LIMITS["127.0.0.1"] = (50.0, 50)  # the stub doesn't need NCBI's pacing
+    from pubmed import PubMedClient, articles_to_text
+
+    client = PubMedClient(base_url=os.environ["PUBMED_EUTILS_URL"])
+    articles = asyncio.run(client.research("type 2 diabetes", max_articles=5))
+    first_requests = len(EUtilsHandler.requests_seen)
+    repeat = asyncio.run(client.research("type 2 diabetes", max_articles=5))
+
+    print(f"{len(articles)} articles with abstracts ({first_requests} E-utilities requests)")
+    for article in articles:
+        print(f"  {article['pmid']}  {article['year']}  {article['title']}")
+    print(f"repeat query: {len(repeat)} articles, {len(EUtilsHandler.requests_seen) - first_requests} new requests")
+    print(f"summarizer input: {len(articles_to_text(articles))} chars")
+    print(f"cache: {client.metrics()}")
+
+    ok = (len(articles) == 4 and len(repeat) == 4 and first_requests == 2
+          and len(EUtilsHandler.requests_seen) == first_requests)
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--check", action="store_true", help="exercise PubMedClient against the stub and exit")
+    args = parser.parse_args()
+
+    server = serve(args.port)
+    if args.check:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        status = check(args.port)
+        server.shutdown()
+        sys.exit(status)
+    print(f"E-utilities stub on http://127.0.0.1:{args.port}/entrez/eutils")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Golden-file check and throughput benchmark for extractors.py.
+
+Each fixture in benchmarks/fixtures/extractors is a page in the markup of one
+trusted site (<domain>.html), plus generic.html for the heuristic path. The
+extracted text must match <name>.expected.txt exactly. Throughput is measured
+per domain for the registry rule and for the generic heuristic on the same page.
+
+Usage (from the repository root):
+    python benchmarks/extractor_bench.py              # golden check + throughput
+    python benchmarks/extractor_bench.py --check      # golden check only
+    python benchmarks/extractor_bench.py --update     # rewrite the expected files
+    python benchmarks/extractor_bench.py --input saved_pages/   # also time real pages named <domain>.html
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extractors import NOISE_TAGS, extract_text, generic_extract  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "extractors")
+
+
+def fixture_url(name):
+    domain = "example-health.org" if name == "generic" else name
+    return f"https://{domain}/sample-page"
+
+
+def load_pages(directory):
+    pages = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as handle:
+                pages.append((filename[:-len(".html")], handle.read()))
+    return pages
+
+
+def check_goldens(update=False):
+    failures = 0
+    for name, html in load_pages(FIXTURES):
+        text = extract_text(html, fixture_url(name)) or ""
+        expected_path = os.path.join(FIXTURES, f"{name}.expected.txt")
+        if update:
+            with open(expected_path, "w", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+            print(f"updated  {name}")
+            continue
+        with open(expected_path, encoding="utf-8") as handle:
+            expected = handle.read().rstrip("\n")
+        if text == expected:
+            print(f"ok       {name} ({len(text)} chars)")
+        else:
+            failures += 1
+            print(f"MISMATCH {name}\n  expected: {expected[:160]}\n  got:      {text[:160]}")
+    return failures
+
+
+def generic_only(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(NOISE_TAGS):
+        element.decompose()
+    return generic_extract(soup)
+
+
+def throughput(fn, html, min_seconds):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn(html)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs / elapsed, len(html.encode("utf-8")) * runs / elapsed / 1e6
+
+
+def benchmark(pages, min_seconds):
+    print(f"\n{'page':<28} {'KB':>7} {'rule pages/s':>13} {'rule MB/s':>10} {'generic pages/s':>16} {'speedup':>8}")
+    for name, html in pages:
+        url = fixture_url(name)
+        rule_rate, rule_mbps = throughput(lambda h: extract_text(h, url), html, min_seconds)
+        generic_rate, _ = throughput(generic_only, html, min_seconds)
+        print(f"{name:<28} {len(html) / 1024:>7.1f} {rule_rate:>13.0f} {rule_mbps:>10.2f} "
+              f"{generic_rate:>16.0f} {rule_rate / generic_rate:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only run the golden-file check")
+    parser.add_argument("--update", action="store_true", help="rewrite the expected files from current output")
+    parser.add_argument("--input", help="directory of additional real pages named <domain>.html")
+    parser.add_argument("--seconds", type=float, default=0.5, help="minimum timing window per measurement")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    failures = check_goldens(update=args.update)
+    if args.check or args.update:
+        sys.exit(1 if failures else 0)
+
+    pages = load_pages(FIXTURES)
+    if args.input:
+        pages += load_pages(args.input)
+    benchmark(pages, args.seconds)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Cold-start import profile for the Flask app.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, prints the
+slowest modules by cumulative import time and checks two targets:
+
+  * `import app` finishes within --budget-ms (default 1500 ms)
+  * none of the heavy research/vector dependencies are loaded at import
+
+Usage (from the repository root):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module agents --top 30 --budget-ms 0
+
+Exits non-zero when a target is missed so it can gate CI or a deploy script.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold-start target for `import app` on a worker. Measured against the
+# self-reported cumulative time of the top-level import.
+DEFAULT_BUDGET_MS = 1500
+
+# Packages that must only be imported on first use (deep research, vector ops).
+FORBIDDEN_AT_IMPORT = [
+    "torch",
+    "transformers",
+    "selenium",
+    "webdriver_manager",
+    "Bio",
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_ollama",
+    "qdrant_client",
+]
+
+
+def run_importtime(module):
+    """Import `module` in a fresh interpreter and return (stderr lines, loaded modules)."""
+    code = (
+        f"import {module}, sys; "
+        "print('\\n'.join(sorted(sys.modules)))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"import {module} failed with exit code {proc.returncode}")
+    return proc.stderr.splitlines(), set(proc.stdout.split())
+
+
+def parse_importtime(lines):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us) rows."""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cumulative_us, name = [part.strip() for part in rest.split("|", 2)]
+            rows.append((name, int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="module to import (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="number of slowest modules to show")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail if the cumulative import time exceeds this (0 disables)")
+    args = parser.parse_args()
+
+    lines, loaded = run_importtime(args.module)
+    rows = parse_importtime(lines)
+    if not rows:
+        raise SystemExit("no -X importtime output captured")
+
+    top_level = [row for row in rows if row[0] == args.module]
+    total_ms = (top_level[-1][2] if top_level else max(row[2] for row in rows)) / 1000.0
+
+    print(f"Slowest imports for `import {args.module}` (cumulative):")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000.0:>14.1f} {self_us / 1000.0:>10.1f}  {name}")
+
+    print()
+    print(f"Total import time: {total_ms:.1f} ms (budget: {args.budget_ms:.0f} ms)")
+
+    failures = []
+    if args.budget_ms and total_ms > args.budget_ms:
+        failures.append(f"import {args.module} took {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+
+    eager = sorted(pkg for pkg in FORBIDDEN_AT_IMPORT if pkg in loaded)
+    if eager:
+        failures.append("heavy dependencies loaded at import: " + ", ".join(eager))
+    else:
+        print("No heavy dependencies loaded at import.")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
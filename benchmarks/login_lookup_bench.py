@@ -0,0 +1,103 @@
+"""
+Login lookup latency with and without payload indexes.
+
+api_login finds a patient with find_patient_point_id: a scroll whose `should`
+filter matches `guid` or `name`. For each --sizes entry this seeds a scratch
+collection on the Qdrant at QDRANT_URL, times that lookup for existing and
+unknown patients, then creates the qdrant_schema.PAYLOAD_INDEXES and times it
+again. Unknown patients are the worst case without an index: every payload is
+scanned before the empty answer comes back.
+
+The lookup never touches vectors, so the points get small ones (--dim) to
+keep seeding fast. Payload indexes are ignored by the in-process Qdrant, so a
+server is required.
+
+Usage (from the repository root, with a local Qdrant running):
+    docker run -p 6333:6333 qdrant/qdrant
+    QDRANT_URL=http://localhost:6333 python benchmarks/login_lookup_bench.py
+    python benchmarks/login_lookup_bench.py --sizes 10000,100000,500000 --iterations 300
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qdrant_schema  # noqa: E402
+import vectors  # noqa: E402
+
+UPLOAD_BATCH = 2000
+
+
+def seed(client, collection, size, dim):
+    from qdrant_client.http.models import Distance, PointStruct, VectorParams
+    client.create_collection(collection, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    for start in range(0, size, UPLOAD_BATCH):
+        client.upsert(collection, wait=start + UPLOAD_BATCH >= size, points=[
+            PointStruct(id=str(uuid.uuid4()), vector=[random.random() for _ in range(dim)],
+                        payload={"guid": f"guid-{i}", "name": f"Patient {i}", "age": 18 + i % 70,
+                                 "location": "Boston", "conditions": ["asthma"]})
+            for i in range(start, min(start + UPLOAD_BATCH, size))
+        ])
+
+
+def wait_for_green(client, collection, timeout_s=1800):
+    from qdrant_client.http.models import CollectionStatus
+    deadline = time.monotonic() + timeout_s
+    while client.get_collection(collection).status != CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise SystemExit(f"{collection} still indexing after {timeout_s}s")
+        time.sleep(0.5)
+
+
+def time_lookups(size, iterations, known):
+    samples = []
+    for _ in range(iterations):
+        i = random.randrange(size) if known else size + random.randrange(size)
+        start = time.perf_counter()
+        point_id = vectors.find_patient_point_id(f"guid-{i}", f"Patient {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+        assert (point_id is not None) == known
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated point counts")
+    parser.add_argument("--iterations", type=int, default=200, help="timed lookups per case")
+    parser.add_argument("--dim", type=int, default=4, help="vector size of the seeded points")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if not vectors.QDRANT_URL:
+        sys.exit("Set QDRANT_URL to a Qdrant server, e.g. http://localhost:6333")
+    client = vectors.make_client()
+    vectors._client = client
+
+    print(f"find_patient_point_id, {args.iterations} lookups per case, {vectors.QDRANT_URL}\n")
+    print(f"{'points':>8} {'indexes':<8} {'lookup':<8} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        collection = f"bench_login_{os.getpid()}_{size}"
+        vectors.COLLECTION_NAME = collection
+        try:
+            seed(client, collection, size, args.dim)
+            for indexed in (False, True):
+                if indexed:
+                    qdrant_schema.ensure_payload_indexes(client, collection)
+                    wait_for_green(client, collection)
+                for known in (True, False):
+                    p50, p95 = time_lookups(size, args.iterations, known)
+                    print(f"{size:>8} {'yes' if indexed else 'no':<8} {'known' if known else 'unknown':<8} "
+                          f"{p50:>8.2f} {p95:>8.2f}")
+        finally:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
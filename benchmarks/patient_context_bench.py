@@ -0,0 +1,157 @@
+"""
+Prompt tokens of the patient context: full history dump vs retrieval.
+
+For each --sizes entry, builds a synthetic patient with that many
+medical_history entries (visit notes, labs, procedures) plus conditions,
+medications and allergies. One entry per question is planted with the
+answer. For each question it compares:
+
+    full       the fields dumped whole, as ask_medical_chatbot and the chat
+               context used to send them
+    retrieved  patient_context.build_patient_context at --budget tokens
+
+It reports context tokens (CHARS_PER_TOKEN estimate), the reduction, how
+often the planted entry was retrieved, and the build time. Chunk vectors sit
+in a scratch embedding cache. "cold ms" is the first question on an empty
+cache, which embeds at most COLD_EMBED_MAX chunks and prefetches the rest;
+the other numbers are for a warm cache, where a build is one query embedding
+plus ranking.
+
+By default chunks are embedded with knowledge_index.hashed_vector, so the
+run needs no model. --live uses the shared EmbeddingService (EMBED_MODEL on
+OLLAMA_BASE_URL). --prompt-eval also sends both prompts to Ollama with
+--llm and reports its prompt_eval_count and prompt_eval_duration.
+
+Usage (from the repository root):
+    python benchmarks/patient_context_bench.py
+    python benchmarks/patient_context_bench.py --sizes 20,200,2000 --budget 300
+    python benchmarks/patient_context_bench.py --live --prompt-eval --llm deepseek-r1:7b
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import patient_context  # noqa: E402
+from embedding_service import OLLAMA_BASE_URL, EmbeddingService  # noqa: E402
+from knowledge_index import hashed_vector  # noqa: E402
+
+FILLER = [
+    "Routine follow-up visit; vitals within normal limits, no new complaints.",
+    "Annual physical. Blood pressure 124/80, BMI 26.1. Counselled on diet and exercise.",
+    "Lipid panel: LDL 131 mg/dL, HDL 48 mg/dL, triglycerides 150 mg/dL. Repeat in 12 months.",
+    "Seasonal influenza vaccine administered, left deltoid. No immediate reaction.",
+    "Presented with sore throat and low-grade fever for two days; rapid strep negative, supportive care.",
+    "Lower back pain after lifting; no red flags. Physiotherapy referral and ibuprofen as needed.",
+    "Dermatology review of benign seborrheic keratosis on the upper back; no treatment required.",
+    "Dental abscess treated by dentist with amoxicillin course, resolved.",
+    "Sprained right ankle playing tennis; RICE and ankle brace for two weeks.",
+    "Comprehensive metabolic panel unremarkable; TSH 2.1 mIU/L.",
+]
+# (question, planted history entry that answers it)
+PLANTED = [
+    ("Is my asthma inhaler dose still right?",
+     "Asthma review: moderate persistent asthma, budesonide-formoterol inhaler twice daily, peak flow 380 L/min."),
+    ("What did my last colonoscopy show?",
+     "Colonoscopy at age 50: two small tubular adenomas removed, repeat colonoscopy advised in 5 years."),
+    ("Can I take ibuprofen with my kidney function?",
+     "Nephrology: chronic kidney disease stage 3a, eGFR 52; avoid NSAIDs such as ibuprofen."),
+    ("How is my diabetes control?",
+     "Type 2 diabetes follow-up: HbA1c 7.4 %, metformin 1000 mg twice daily, foot exam normal."),
+    ("Do I need another tetanus shot?",
+     "Tetanus-diphtheria booster given after a garden injury; next booster due in 10 years."),
+]
+
+
+def synthetic_patient(entries, seed=3):
+    rng = random.Random(seed)
+    history = [f"{2000 + i * 20 // max(entries, 1)}-{rng.randint(1, 12):02d}: {rng.choice(FILLER)}"
+               for i in range(entries)]
+    for _, planted in PLANTED:
+        history.insert(rng.randrange(len(history) + 1) if history else 0, planted)
+    return {
+        "medical_history": history,
+        "conditions": ["asthma", "type 2 diabetes", "chronic kidney disease"],
+        "medications": ["budesonide-formoterol", "metformin"],
+        "allergies": ["penicillin"],
+    }
+
+
+def full_dump(payload):
+    return "\n".join(f"{field}: {payload[field]}" for field in patient_context.CONTEXT_FIELDS if payload.get(field))
+
+
+def prompt_eval(llm, context, question):
+    response = requests.post(f"{OLLAMA_BASE_URL}/api/generate", json={
+        "model": llm, "prompt": f"Patient context:\n{context}\n\nQuery: {question}", "stream": False,
+        "options": {"num_predict": 1},
+    }, timeout=600)
+    response.raise_for_status()
+    data = response.json()
+    return data.get("prompt_eval_count", 0), data.get("prompt_eval_duration", 0) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5,50,200,1000", help="comma-separated history lengths")
+    parser.add_argument("--budget", type=int, default=patient_context.CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--top-k", type=int, default=patient_context.CONTEXT_TOP_K)
+    parser.add_argument("--live", action="store_true", help="embed with EMBED_MODEL through Ollama")
+    parser.add_argument("--prompt-eval", action="store_true", help="measure prompt evaluation in Ollama")
+    parser.add_argument("--llm", default="deepseek-r1:7b", help="model for --prompt-eval")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="patient_context_bench_"), "embeddings.sqlite3")
+    if args.live:
+        service = EmbeddingService(cache_path=cache_path)
+    else:
+        service = EmbeddingService(model="hashed", cache_path=cache_path,
+                                   backend=lambda texts: [hashed_vector(t).tolist() for t in texts])
+
+    print(f"budget {args.budget} tokens, top-k {args.top_k}, "
+          f"{'EmbeddingService ' + service.model if args.live else 'hashed vectors'}\n")
+    header = (f"{'entries':>7} {'full tok':>9} {'ctx tok':>8} {'saved':>7} {'mode':<9} {'hit':>5} "
+              f"{'cold ms':>8} {'ms':>7}")
+    if args.prompt_eval:
+        header += f" {'eval full':>10} {'eval ctx':>9} {'ms full':>8} {'ms ctx':>7}"
+    print(header)
+    for size in (int(s) for s in args.sizes.split(",")):
+        payload = synthetic_patient(size)
+        start = time.perf_counter()
+        patient_context.build_patient_context(payload, PLANTED[0][0], budget=args.budget, top_k=args.top_k,
+                                              service=service)
+        cold_ms = (time.perf_counter() - start) * 1000
+        service.embed(patient_context.history_chunks(payload["medical_history"]))
+
+        contexts, hits, samples, evals = [], 0, [], []
+        for question, planted in PLANTED:
+            start = time.perf_counter()
+            context = patient_context.build_patient_context(payload, question, budget=args.budget,
+                                                            top_k=args.top_k, service=service)
+            samples.append((time.perf_counter() - start) * 1000)
+            contexts.append(context)
+            hits += planted in context.text
+            if args.prompt_eval:
+                evals.append(prompt_eval(args.llm, full_dump(payload), question)
+                             + prompt_eval(args.llm, context.text, question))
+        tokens = statistics.fmean(c.tokens for c in contexts)
+        full = patient_context.estimate_tokens(full_dump(payload))
+        line = (f"{size:>7} {full:>9} {tokens:>8.0f} {1 - tokens / full:>7.1%} {contexts[0].mode:<9} "
+                f"{hits:>2}/{len(PLANTED):<2} {cold_ms:>8.2f} {statistics.median(samples):>7.2f}")
+        if evals:
+            line += (f" {statistics.fmean(e[0] for e in evals):>10.0f} {statistics.fmean(e[2] for e in evals):>9.0f}"
+                     f" {statistics.fmean(e[1] for e in evals):>8.0f} {statistics.fmean(e[3] for e in evals):>7.0f}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
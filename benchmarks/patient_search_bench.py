@@ -0,0 +1,159 @@
+"""
+Patient search latency at 10k and 100k synthetic points.
+
+For each --sizes entry, seeds a scratch collection with random unit vectors
+and patient-shaped payloads (age, location, conditions), waits for indexing
+to finish, and times the calls behind /api/patients/search:
+
+    top10       search_patient_records, no filter
+    filtered    age range + location + condition filter
+    page5       fifth page of 10 (offset 40)
+    threshold   top 10 above a cosine score threshold
+    batch8      8 queries through search_patient_records_batch (one request)
+    serial8     the same 8 queries as 8 search_patient_records calls
+
+Query embedding is not included; see embedding_throughput_bench.py.
+--payload-index also creates payload indexes on the filter fields first.
+Without QDRANT_URL (or with --local) an in-process Qdrant is used, which
+searches by brute force and only suits a quick smoke run.
+
+Usage (from the repository root, with a local Qdrant running):
+    QDRANT_URL=http://localhost:6333 python benchmarks/patient_search_bench.py
+    python benchmarks/patient_search_bench.py --sizes 10000,100000 --dim 768 --payload-index
+    python benchmarks/patient_search_bench.py --local --sizes 2000 --dim 64
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import vectors  # noqa: E402
+
+LOCATIONS = ["Austin", "Boston", "Chicago", "Denver", "Seattle", "Miami", "Phoenix", "Portland"]
+CONDITIONS = ["asthma", "diabetes", "hypertension", "migraine", "arthritis", "copd", "anemia", "eczema",
+              "depression", "obesity", "insomnia", "gout"]
+UPLOAD_BATCH = 1000
+
+
+def unit_vectors(rng, n, dim):
+    matrix = rng.standard_normal((n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def seed(client, collection, size, dim, payload_index):
+    from qdrant_client.http.models import Distance, PayloadSchemaType, PointStruct, VectorParams
+    client.create_collection(collection, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    if payload_index:
+        for field, schema in (("age", PayloadSchemaType.INTEGER), ("location", PayloadSchemaType.KEYWORD),
+                              ("conditions", PayloadSchemaType.KEYWORD)):
+            client.create_payload_index(collection, field_name=field, field_schema=schema)
+    rng = np.random.default_rng(7)
+    started = time.perf_counter()
+    for start in range(0, size, UPLOAD_BATCH):
+        count = min(UPLOAD_BATCH, size - start)
+        matrix = unit_vectors(rng, count, dim)
+        client.upsert(collection, wait=False, points=[
+            PointStruct(id=str(uuid.uuid4()), vector=matrix[j].tolist(), payload={
+                "guid": f"bench-{start + j}",
+                "name": f"Patient {start + j}",
+                "age": int(rng.integers(18, 90)),
+                "location": LOCATIONS[int(rng.integers(len(LOCATIONS)))],
+                "conditions": random.sample(CONDITIONS, int(rng.integers(1, 4))),
+            }) for j in range(count)
+        ])
+    wait_for_green(client, collection)
+    return time.perf_counter() - started
+
+
+def wait_for_green(client, collection, timeout_s=1800):
+    from qdrant_client.http.models import CollectionStatus
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        info = client.get_collection(collection)
+        if info.status == CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+    raise SystemExit(f"{collection} still indexing after {timeout_s}s")
+
+
+def time_op(fn, queries, iterations, per_call=1):
+    for query in queries[:5]:
+        fn(query)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(queries[i % len(queries)])
+        samples.append((time.perf_counter() - start) * 1000 / per_call)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def operations(queries):
+    age_filter = vectors.patient_filter(age_min=40, age_max=65, location="Boston", conditions=["asthma", "copd"])
+
+    def batch(query):
+        start = queries.index(query)
+        group = [queries[(start + k) % len(queries)] for k in range(8)]
+        vectors.search_patient_records_batch([{"vector": vector, "limit": 10} for vector in group],
+                                             include=["guid", "name"])
+
+    def serial(query):
+        start = queries.index(query)
+        for k in range(8):
+            vectors.search_patient_records(queries[(start + k) % len(queries)], limit=10, include=["guid", "name"])
+
+    return [
+        ("top10", lambda q: vectors.search_patient_records(q, limit=10, include=["guid", "name"]), 1),
+        ("filtered", lambda q: vectors.search_patient_records(q, limit=10, query_filter=age_filter,
+                                                              include=["guid", "name"]), 1),
+        ("page5", lambda q: vectors.search_patient_records(q, limit=10, offset=40, include=["guid", "name"]), 1),
+        ("threshold", lambda q: vectors.search_patient_records(q, limit=10, score_threshold=0.05,
+                                                               include=["guid", "name"]), 1),
+        ("batch8", batch, 8),
+        ("serial8", serial, 8),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated point counts")
+    parser.add_argument("--dim", type=int, default=vectors.VECTOR_SIZE, help="vector size")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--payload-index", action="store_true", help="index age/location/conditions first")
+    parser.add_argument("--local", action="store_true", help="use an in-process Qdrant")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from qdrant_client import QdrantClient
+    local = args.local or not vectors.QDRANT_URL
+    client = QdrantClient(":memory:") if local else vectors.make_client()
+    vectors._client = client
+    queries = [vector.tolist() for vector in unit_vectors(np.random.default_rng(11), 64, args.dim)]
+
+    print(f"dim {args.dim}, {args.iterations} calls per operation, "
+          f"{'in-process Qdrant' if local else vectors.QDRANT_URL}"
+          f"{', payload indexes' if args.payload_index else ''}\n")
+    print(f"{'points':>8} {'operation':<10} {'p50 ms':>8} {'p95 ms':>8}   (batch8/serial8: per query)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        collection = f"bench_search_{os.getpid()}_{size}"
+        vectors.COLLECTION_NAME = collection
+        try:
+            seconds = seed(client, collection, size, args.dim, args.payload_index)
+            print(f"{size:>8} {'(seeded and indexed in ' + format(seconds, '.1f') + 's)'}")
+            for name, fn, per_call in operations(queries):
+                p50, p95 = time_op(fn, queries, args.iterations, per_call)
+                print(f"{size:>8} {name:<10} {p50:>8.2f} {p95:>8.2f}")
+        finally:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
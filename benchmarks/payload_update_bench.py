@@ -0,0 +1,187 @@
+"""
+Bytes moved per chat turn by update_patient_record.
+
+Until conversation history moved to Postgres (migrate_conversations.py), every
+chatbot reply appended a user/Areya exchange to the patient's `conversations`
+payload list, and list payload fields are still appended the same way. This
+script replays N turns against one 3072-dim record and counts REST request and
+response body bytes for:
+
+    legacy   read the whole point (payload + vector), merge, upsert it back
+    partial  vectors.update_patient_record: read only `conversations`,
+             set_payload that key; the vector is never sent
+
+Bytes are counted by an httpx transport handed to QdrantClient, so they are
+the JSON bodies the client actually sends and receives (headers excluded).
+By default an in-process stub answers the REST calls; --live uses the Qdrant
+at QDRANT_URL with a scratch collection.
+
+Usage (from the repository root):
+    python benchmarks/payload_update_bench.py
+    python benchmarks/payload_update_bench.py --turns 200 --report 1,10,50,100,200
+    QDRANT_URL=http://localhost:6333 python benchmarks/payload_update_bench.py --live
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import vectors  # noqa: E402
+
+UPDATE_OK = {"result": {"operation_id": 0, "status": "completed"}, "status": "ok", "time": 0.0001}
+
+
+class CountingTransport(httpx.BaseTransport):
+    """Counts request and response body bytes passing through `inner`."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.sent = 0
+        self.received = 0
+
+    def handle_request(self, request):
+        self.sent += len(request.read())
+        response = self.inner.handle_request(request)
+        response.read()
+        self.received += len(response.content)
+        return response
+
+    def reset(self):
+        self.sent = self.received = 0
+
+
+class RestStub:
+    """Just enough of Qdrant's points REST API for the two update paths."""
+
+    def __init__(self):
+        self.points = {}
+
+    def __call__(self, request):
+        path, body = request.url.path, json.loads(request.content or b"{}")
+        if request.method == "PUT" and re.fullmatch(r"/collections/[^/]+/points", path):
+            for point in body["points"]:
+                self.points[str(point["id"])] = {"id": point["id"], "vector": point["vector"],
+                                                 "payload": point.get("payload") or {}}
+            return httpx.Response(200, json=UPDATE_OK)
+        if request.method == "POST" and re.fullmatch(r"/collections/[^/]+/points", path):
+            return httpx.Response(200, json={"result": [self._project(self.points[str(i)], body)
+                                                        for i in body["ids"] if str(i) in self.points],
+                                             "status": "ok", "time": 0.0001})
+        if request.method == "POST" and path.endswith("/points/payload"):
+            for i in body["points"]:
+                self.points[str(i)]["payload"].update(body["payload"])
+            return httpx.Response(200, json=UPDATE_OK)
+        if request.method == "PUT" and path.endswith("/points/vectors"):
+            for point in body["points"]:
+                self.points[str(point["id"])]["vector"] = point["vector"]
+            return httpx.Response(200, json=UPDATE_OK)
+        if request.method == "POST" and path.endswith("/points/delete"):
+            for i in body["points"]:
+                self.points.pop(str(i), None)
+            return httpx.Response(200, json=UPDATE_OK)
+        return httpx.Response(404, json={"status": {"error": f"stub: {request.method} {path}"}})
+
+    @staticmethod
+    def _project(point, body):
+        selector = body.get("with_payload", True)
+        if isinstance(selector, dict) and "exclude" in selector:
+            payload = {key: value for key, value in point["payload"].items() if key not in selector["exclude"]}
+        elif selector is True:
+            payload = point["payload"]
+        else:
+            keys = selector.get("include", []) if isinstance(selector, dict) else (selector or [])
+            payload = {key: point["payload"][key] for key in keys if key in point["payload"]}
+        return {"id": point["id"], "payload": payload, "vector": point["vector"] if body.get("with_vector") else None}
+
+
+def exchange(turn):
+    """One user/Areya exchange shaped like app.save_conversation writes it."""
+    now = datetime.now(timezone.utc).isoformat()
+    sources = [{"domain": "medlineplus.gov", "url": f"https://medlineplus.gov/topic{turn}-{i}.html",
+                "title": f"Topic {turn} source {i}", "snippet": "lorem ipsum " * 25} for i in range(4)]
+    return [
+        {"timestamp": now, "id": f"{turn}.1", "sender": "User", "message": "What does my latest result mean? " * 3},
+        {"timestamp": now, "id": f"{turn}.2", "sender": "Areya", "message": "## Current Understanding\n" + "text " * 300,
+         "sources": sources},
+    ]
+
+
+def legacy_update(point_id, updated_payload):
+    """update_patient_record before partial updates: whole point in, whole point out."""
+    existing = vectors.get_existing_record(point_id)
+    merged = {**existing["payload"], **updated_payload}
+    for key, value in updated_payload.items():
+        if isinstance(existing["payload"].get(key), list) and isinstance(value, list):
+            merged[key] = existing["payload"][key] + value
+    vectors.put_patient_record(point_id, existing["vector"], merged)
+
+
+def run(client, counter, turns, report, dim):
+    vectors._client = client
+    rows = []
+    for name, update in (("legacy", legacy_update), ("partial", vectors.update_patient_record)):
+        point_id = str(uuid.uuid4())
+        vectors.create_patient_record(point_id, [random.random() for _ in range(dim)],
+                                      {"guid": "bench", "name": "Bench Patient", "conversations": []})
+        for turn in range(1, turns + 1):
+            counter.reset()
+            update(point_id, {"conversations": exchange(turn)})
+            if turn in report:
+                rows.append((name, turn, counter.sent, counter.received))
+        vectors.delete_patient_record(point_id)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--report", default="1,10,50,100", help="turns to print")
+    parser.add_argument("--dim", type=int, default=vectors.VECTOR_SIZE)
+    parser.add_argument("--live", action="store_true", help="use the Qdrant at QDRANT_URL")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    report = {int(t) for t in args.report.split(",")}
+
+    if args.live:
+        if not vectors.QDRANT_URL:
+            sys.exit("Set QDRANT_URL for --live")
+        from qdrant_client import QdrantClient
+        from qdrant_client.http.models import Distance, VectorParams
+        counter = CountingTransport(httpx.HTTPTransport())
+        client = QdrantClient(url=vectors.QDRANT_URL, api_key=vectors.QDRANT_API_KEY, transport=counter)
+        vectors.COLLECTION_NAME = f"bench_payload_{os.getpid()}"
+        client.create_collection(vectors.COLLECTION_NAME, vectors_config=VectorParams(size=args.dim,
+                                                                                       distance=Distance.COSINE))
+    else:
+        from qdrant_client import QdrantClient
+        counter = CountingTransport(httpx.MockTransport(RestStub()))
+        client = QdrantClient(url="http://qdrant-stub:6333", transport=counter, check_compatibility=False)
+
+    try:
+        rows = run(client, counter, args.turns, report, args.dim)
+    finally:
+        if args.live:
+            client.delete_collection(vectors.COLLECTION_NAME)
+
+    print(f"REST body bytes per chat turn ({'live' if args.live else 'stub'}, dim {args.dim})\n")
+    print(f"{'turn':>5} {'path':<8} {'sent KB':>9} {'received KB':>12} {'total KB':>9}")
+    by_turn = {}
+    for name, turn, sent, received in rows:
+        by_turn.setdefault(turn, {})[name] = sent + received
+        print(f"{turn:>5} {name:<8} {sent / 1024:>9.1f} {received / 1024:>12.1f} {(sent + received) / 1024:>9.1f}")
+    print()
+    for turn, totals in sorted(by_turn.items()):
+        print(f"turn {turn}: partial moves {totals['partial'] / totals['legacy']:.0%} of legacy bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Per-operation Qdrant latency over REST vs gRPC.
+
+Creates a scratch collection on the Qdrant at QDRANT_URL (REST port 6333,
+gRPC port QDRANT_GRPC_PORT), seeds it with patient-shaped points and times the
+operations the app performs on each request:
+
+    retrieve   get_existing_record (payload + vector)
+    scroll     find_patient_point_id (login lookup by guid/name)
+    upsert     put_patient_record (full point rewrite)
+    delete     delete_patient_record
+
+Each operation is timed through the shared-client transports (REST with pooled
+connections, gRPC) and, for reference, through one-off `requests` calls
+without a session, which is how vectors.py talked to Qdrant before.
+
+Usage (from the repository root, with a local Qdrant running):
+    docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant
+    QDRANT_URL=http://localhost:6333 python benchmarks/qdrant_transport_bench.py
+    python benchmarks/qdrant_transport_bench.py --points 500 --iterations 200 --dim 3072
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import vectors  # noqa: E402
+
+COLLECTION = f"bench_transport_{os.getpid()}"
+
+
+def make_payload(i):
+    return {"guid": f"guid-{i}", "name": f"Patient {i}", "age": 30 + i % 50,
+            "conversations": [{"sender": "User", "message": "hello " * 20}] * 4}
+
+
+def seed(client, ids, dim):
+    from qdrant_client.http.models import Distance, PointStruct, VectorParams
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    for start in range(0, len(ids), 100):
+        client.upsert(COLLECTION, points=[
+            PointStruct(id=point_id, vector=[random.random() for _ in range(dim)], payload=make_payload(start + j))
+            for j, point_id in enumerate(ids[start:start + 100])
+        ])
+
+
+def client_ops(client, ids, dim):
+    from qdrant_client.http.models import FieldCondition, Filter, MatchValue, PointIdsList, PointStruct
+
+    def retrieve():
+        client.retrieve(COLLECTION, ids=[random.choice(ids)], with_payload=True, with_vectors=True)
+
+    def scroll():
+        i = random.randrange(len(ids))
+        client.scroll(COLLECTION, limit=1, with_payload=False, with_vectors=False, scroll_filter=Filter(should=[
+            FieldCondition(key="guid", match=MatchValue(value=f"guid-{i}")),
+            FieldCondition(key="name", match=MatchValue(value=f"Patient {i}")),
+        ]))
+
+    def upsert():
+        i = random.randrange(len(ids))
+        client.upsert(COLLECTION, points=[PointStruct(id=ids[i], vector=[random.random() for _ in range(dim)],
+                                                      payload=make_payload(i))])
+
+    def delete():
+        client.delete(COLLECTION, points_selector=PointIdsList(points=[str(uuid.uuid4())]))
+
+    return {"retrieve": retrieve, "scroll": scroll, "upsert": upsert, "delete": delete}
+
+
+def raw_ops(ids, dim):
+    base = f"{vectors.QDRANT_URL}/collections/{COLLECTION}/points"
+    headers = {"api-key": vectors.QDRANT_API_KEY or "", "Content-Type": "application/json"}
+
+    def retrieve():
+        requests.get(f"{base}/{random.choice(ids)}", headers=headers, timeout=10).raise_for_status()
+
+    def scroll():
+        i = random.randrange(len(ids))
+        requests.post(f"{base}/scroll", headers=headers, timeout=10, json={"limit": 1, "filter": {"should": [
+            {"key": "guid", "match": {"value": f"guid-{i}"}},
+            {"key": "name", "match": {"value": f"Patient {i}"}},
+        ]}}).raise_for_status()
+
+    def upsert():
+        i = random.randrange(len(ids))
+        requests.put(base, headers=headers, timeout=10, json={"points": [
+            {"id": ids[i], "vector": [random.random() for _ in range(dim)], "payload": make_payload(i)}
+        ]}).raise_for_status()
+
+    def delete():
+        requests.post(f"{base}/delete", headers=headers, timeout=10,
+                      json={"points": [str(uuid.uuid4())]}).raise_for_status()
+
+    return {"retrieve": retrieve, "scroll": scroll, "upsert": upsert, "delete": delete}
+
+
+def time_op(fn, iterations, warmup=5):
+    first = time.perf_counter()
+    fn()
+    first_ms = (time.perf_counter() - first) * 1000
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "first": first_ms,
+        "p50": statistics.median(samples),
+        "p95": samples[int(len(samples) * 0.95) - 1],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=200, help="points to seed")
+    parser.add_argument("--iterations", type=int, default=100, help="timed calls per operation and transport")
+    parser.add_argument("--dim", type=int, default=vectors.VECTOR_SIZE, help="vector size")
+    parser.add_argument("--skip-raw", action="store_true", help="don't time the session-less requests baseline")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if not vectors.QDRANT_URL:
+        sys.exit("Set QDRANT_URL to a local Qdrant, e.g. http://localhost:6333")
+
+    rest = vectors.make_client(prefer_grpc=False)
+    grpc = vectors.make_client(prefer_grpc=True)
+    ids = [str(uuid.uuid4()) for _ in range(args.points)]
+    seed(rest, ids, args.dim)
+    try:
+        transports = [("rest", client_ops(rest, ids, args.dim)), ("grpc", client_ops(grpc, ids, args.dim))]
+        if not args.skip_raw:
+            transports.append(("requests", raw_ops(ids, args.dim)))
+
+        print(f"{args.points} points, dim {args.dim}, {args.iterations} calls per operation\n")
+        print(f"{'operation':<10} {'transport':<10} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+        for op in ("retrieve", "scroll", "upsert", "delete"):
+            for name, ops in transports:
+                stats = time_op(ops[op], args.iterations)
+                print(f"{op:<10} {name:<10} {stats['first']:>9.2f} {stats['p50']:>8.2f} "
+                      f"{stats['p95']:>8.2f} {stats['mean']:>8.2f}")
+    finally:
+        rest.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Response size of patient record reads with and without field projection.
+
+Seeds one patient record per history length (a `conversations` payload array
+like the ones written before history moved to Postgres, plus a 3072-dim
+vector) and counts the REST response bytes of:
+
+    full       get_existing_record(): whole payload + vector
+    dashboard  /api/patient-records read: exclude `conversations`, no vector
+    chatbot    /api/chatbot read: the CHAT_CONTEXT_FIELDS keys, no vector
+
+Uses the in-process REST stub from payload_update_bench.py by default, or the
+Qdrant at QDRANT_URL with --live.
+
+Usage (from the repository root):
+    python benchmarks/record_projection_bench.py
+    python benchmarks/record_projection_bench.py --turns 0,50,200,1000
+    QDRANT_URL=http://localhost:6333 python benchmarks/record_projection_bench.py --live
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import vectors  # noqa: E402
+from payload_update_bench import CountingTransport, RestStub, exchange  # noqa: E402
+
+# Mirrors app.DASHBOARD_EXCLUDED_FIELDS / app.CHAT_CONTEXT_FIELDS (importing app needs the database driver)
+DASHBOARD_EXCLUDED_FIELDS = ["conversations"]
+CHAT_CONTEXT_FIELDS = ["name", "last_visit", "last_condition", "age",
+                       "conditions", "medications", "allergies", "guid"]
+
+
+def patient_payload(turns):
+    conversations = [message for turn in range(1, turns + 1) for message in exchange(turn)]
+    return {
+        "guid": "bench", "name": "Bench Patient", "age": 54, "gender": "F", "location": "Springfield",
+        "last_visit": "2026-09-30", "last_condition": "hypertension",
+        "conditions": ["hypertension", "type 2 diabetes"], "medications": ["metformin", "lisinopril"],
+        "allergies": ["penicillin"], "medical_history": ["appendectomy 2004", "gestational diabetes 2011"],
+        "medical_conditions": [{"name": "hypertension", "since": "2019"}],
+        "health_metrics": {"bp": "132/84", "a1c": 6.9}, "activity_log": [], "alerts": [], "assessment": [],
+        "conversations": conversations,
+    }
+
+
+def measure(counter, point_id):
+    reads = {
+        "full": lambda: vectors.get_existing_record(point_id),
+        "dashboard": lambda: vectors.get_existing_record(point_id, exclude=DASHBOARD_EXCLUDED_FIELDS,
+                                                         with_vector=False),
+        "chatbot": lambda: vectors.get_existing_record(point_id, include=CHAT_CONTEXT_FIELDS, with_vector=False),
+    }
+    sizes = {}
+    for name, read in reads.items():
+        counter.reset()
+        read()
+        sizes[name] = counter.received
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="0,10,50,200,1000", help="conversation lengths to seed")
+    parser.add_argument("--dim", type=int, default=vectors.VECTOR_SIZE)
+    parser.add_argument("--live", action="store_true", help="use the Qdrant at QDRANT_URL")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from qdrant_client import QdrantClient
+    if args.live:
+        if not vectors.QDRANT_URL:
+            sys.exit("Set QDRANT_URL for --live")
+        from qdrant_client.http.models import Distance, VectorParams
+        counter = CountingTransport(httpx.HTTPTransport())
+        client = QdrantClient(url=vectors.QDRANT_URL, api_key=vectors.QDRANT_API_KEY, transport=counter)
+        vectors.COLLECTION_NAME = f"bench_projection_{os.getpid()}"
+        client.create_collection(vectors.COLLECTION_NAME,
+                                 vectors_config=VectorParams(size=args.dim, distance=Distance.COSINE))
+    else:
+        counter = CountingTransport(httpx.MockTransport(RestStub()))
+        client = QdrantClient(url="http://qdrant-stub:6333", transport=counter, check_compatibility=False)
+    vectors._client = client
+
+    print(f"REST response bytes per record read ({'live' if args.live else 'stub'}, dim {args.dim})\n")
+    print(f"{'turns':>6} {'full KB':>9} {'dashboard KB':>13} {'chatbot KB':>11} {'dashboard':>10} {'chatbot':>8}")
+    try:
+        for turns in (int(t) for t in args.turns.split(",")):
+            point_id = str(uuid.uuid4())
+            vectors.create_patient_record(point_id, [random.random() for _ in range(args.dim)],
+                                          patient_payload(turns))
+            sizes = measure(counter, point_id)
+            vectors.delete_patient_record(point_id)
+            print(f"{turns:>6} {sizes['full'] / 1024:>9.1f} {sizes['dashboard'] / 1024:>13.1f} "
+                  f"{sizes['chatbot'] / 1024:>11.1f} {sizes['dashboard'] / sizes['full']:>10.1%} "
+                  f"{sizes['chatbot'] / sizes['full']:>8.1%}")
+    finally:
+        if args.live:
+            client.delete_collection(vectors.COLLECTION_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Recall, latency and memory of the Qdrant storage profiles.
+
+Builds one scratch collection per qdrant_schema.STORAGE_PROFILES entry on the
+Qdrant at QDRANT_URL, loads the same synthetic patient set into each, and
+runs the same queries through vectors.search_patient_records with that
+profile's search parameters. Reported per profile:
+
+    recall@k   overlap with exact cosine top-k computed in numpy
+    p50/p95    search latency (embedding excluded)
+    RAM/disk   StorageProfile.estimate_bytes for the set, vectors + HNSW only
+
+Synthetic vectors are clustered (patients with similar histories embed close
+together), which is harder for quantization than uniform noise. Quantization
+and on-disk storage are not modelled by the in-process Qdrant, so a server
+is required.
+
+Usage (from the repository root, with a local Qdrant running):
+    QDRANT_URL=http://localhost:6333 python benchmarks/storage_profile_eval.py
+    python benchmarks/storage_profile_eval.py --points 50000 --dim 3072 --profiles memory,int8-disk
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import qdrant_schema  # noqa: E402
+import vectors  # noqa: E402
+
+UPLOAD_BATCH = 500
+
+
+def synthetic_set(points, dim, clusters, queries, seed=5):
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(clusters, size=points)
+    data = centroids[labels] + 0.6 * rng.standard_normal((points, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    picks = rng.integers(points, size=queries)
+    # Queries sit near existing patients, at about half a unit vector's distance
+    query = data[picks] + rng.standard_normal((queries, dim)).astype(np.float32) * (0.5 / np.sqrt(dim))
+    query /= np.linalg.norm(query, axis=1, keepdims=True)
+    return data, query
+
+
+def exact_top_k(data, query, k):
+    scores = query @ data.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def load(client, collection, profile, data):
+    from qdrant_client.http.models import CollectionStatus, PointStruct
+    ids = [str(uuid.uuid4()) for _ in range(len(data))]
+    qdrant_schema.ensure_collection(client, collection, data.shape[1], profile)
+    for start in range(0, len(data), UPLOAD_BATCH):
+        client.upsert(collection, wait=False, points=[
+            PointStruct(id=ids[i], vector=data[i].tolist(), payload={"row": i})
+            for i in range(start, min(start + UPLOAD_BATCH, len(data)))
+        ])
+    while client.get_collection(collection).status != CollectionStatus.GREEN:
+        time.sleep(1)
+    return ids
+
+
+def evaluate(query, truth, k):
+    recalls, samples = [], []
+    for q, expected in zip(query, truth):
+        start = time.perf_counter()
+        hits, _ = vectors.search_patient_records(q.tolist(), limit=k, include=["row"])
+        samples.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({hit["payload"]["row"] for hit in hits} & set(expected.tolist())) / k)
+    samples.sort()
+    return statistics.fmean(recalls), statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=vectors.VECTOR_SIZE)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--profiles", default=",".join(qdrant_schema.STORAGE_PROFILES))
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if not vectors.QDRANT_URL:
+        sys.exit("Set QDRANT_URL to a Qdrant server, e.g. http://localhost:6333")
+    client = vectors.make_client()
+    vectors._client = client
+
+    data, query = synthetic_set(args.points, args.dim, args.clusters, args.queries)
+    truth = exact_top_k(data, query, args.k)
+
+    print(f"{args.points} points, dim {args.dim}, {args.queries} queries, recall@{args.k}\n")
+    print(f"{'profile':<16} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'RAM MiB':>9} {'disk MiB':>9}")
+    for name in args.profiles.split(","):
+        profile = qdrant_schema.get_storage_profile(name)
+        collection = f"bench_profile_{os.getpid()}_{name.replace('-', '_')}"
+        vectors.COLLECTION_NAME = collection
+        # vectors.search_patient_records reads the profile for its search params
+        qdrant_schema.QDRANT_STORAGE_PROFILE = name
+        try:
+            load(client, collection, profile, data)
+            evaluate(query[:10], truth[:10], args.k)  # warm up
+            recall, p50, p95 = evaluate(query, truth, args.k)
+            size = profile.estimate_bytes(args.points, args.dim)
+            print(f"{name:<16} {recall:>7.3f} {p50:>8.2f} {p95:>8.2f} "
+                  f"{size['ram'] / 2**20:>9.1f} {size['disk'] / 2**20:>9.1f}")
+        finally:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
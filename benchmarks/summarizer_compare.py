@@ -0,0 +1,189 @@
+"""
+Quality and latency comparison: extractive (summarizers.py) vs abstractive
+(distilbart pipeline used by AreyaAgent).
+
+Quality is ROUGE-1/ROUGE-L F1 against a reference summary; latency is wall
+time per document. The built-in samples are short medical pages; pass
+--input with NDJSON lines of {"text": ..., "reference": ...} to evaluate on
+scraped pages instead.
+
+Usage (from the repository root):
+    python benchmarks/summarizer_compare.py
+    python benchmarks/summarizer_compare.py --input pages.ndjson --repeat 5
+    python benchmarks/summarizer_compare.py --skip-abstractive
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from summarizers import extractive_summarize  # noqa: E402
+
+SAMPLES = [
+    {
+        "text": (
+            "Type 2 diabetes is a chronic condition that affects the way the body processes blood sugar. "
+            "With type 2 diabetes, the body either doesn't produce enough insulin or it resists insulin. "
+            "Symptoms often develop slowly and may include increased thirst, frequent urination, increased hunger, "
+            "unintended weight loss, fatigue and blurred vision. Many people have the condition for years before "
+            "they are diagnosed. Risk factors include being overweight, inactivity, family history and age over 35. "
+            "We use cookies to give you the best experience on our website. The condition is diagnosed with the "
+            "glycated hemoglobin (A1C) test, which indicates average blood sugar level for the past two to three months. "
+            "Treatment includes healthy eating, regular exercise and weight loss. Some people also need diabetes "
+            "medication or insulin therapy. Metformin is generally the first medication prescribed for type 2 diabetes. "
+            "Long-term complications include heart and blood vessel disease, nerve damage, kidney disease and eye damage. "
+            "Careful management of blood sugar can reduce the risk of these complications."
+        ),
+        "reference": (
+            "Type 2 diabetes is a chronic condition in which the body resists insulin or doesn't make enough. "
+            "Treatment includes healthy eating, exercise, weight loss and medication such as metformin or insulin. "
+            "Managing blood sugar reduces the risk of heart, nerve, kidney and eye complications."
+        ),
+    },
+    {
+        "text": (
+            "Hypertension, or high blood pressure, is a common condition in which the long-term force of the blood "
+            "against the artery walls is high enough that it may eventually cause health problems. "
+            "Blood pressure is determined by the amount of blood the heart pumps and the resistance to blood flow in "
+            "the arteries. Most people with high blood pressure have no signs or symptoms, even if readings reach "
+            "dangerously high levels. Subscribe to our newsletter for the latest health news. "
+            "Primary hypertension develops gradually over many years, while secondary hypertension is caused by an "
+            "underlying condition such as kidney disease, thyroid problems or certain medications. "
+            "Uncontrolled high blood pressure increases the risk of heart attack, stroke, heart failure and kidney "
+            "problems. Lifestyle changes such as reducing salt, exercising, limiting alcohol and quitting smoking "
+            "can lower blood pressure. Medications include thiazide diuretics, ACE inhibitors, angiotensin II "
+            "receptor blockers and calcium channel blockers."
+        ),
+        "reference": (
+            "Hypertension is a condition in which the force of blood against artery walls is high enough to cause "
+            "health problems, often without symptoms. It raises the risk of heart attack, stroke and kidney problems. "
+            "Lifestyle changes and medications such as diuretics and ACE inhibitors lower blood pressure."
+        ),
+    },
+    {
+        "text": (
+            "Migraine is a neurological condition that can cause multiple symptoms. It is frequently characterized "
+            "by intense, debilitating headaches. Symptoms may include nausea, vomiting, difficulty speaking, numbness "
+            "or tingling, and sensitivity to light and sound. Migraines often run in families and affect all ages. "
+            "Some people experience an aura, a visual disturbance that occurs before the headache begins. "
+            "Common triggers include hormonal changes, stress, certain foods, alcohol, changes in sleep and "
+            "sensory stimuli. This page contains advertisement content from our partners. "
+            "Acute treatment aims to stop symptoms and includes pain relievers, triptans and anti-nausea drugs. "
+            "Preventive treatment aims to reduce how often migraines occur and how severe they are, and includes "
+            "blood pressure medications, antidepressants, anti-seizure drugs and CGRP monoclonal antibodies. "
+            "Keeping a headache diary can help identify triggers and evaluate the effect of treatment."
+        ),
+        "reference": (
+            "Migraine is a neurological condition with intense headaches, nausea and sensitivity to light and sound, "
+            "sometimes preceded by an aura. Acute treatment includes pain relievers and triptans, and preventive "
+            "treatment includes blood pressure medications, anti-seizure drugs and CGRP antibodies."
+        ),
+    },
+]
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def _f1(overlap, candidate_len, reference_len):
+    if not overlap or not candidate_len or not reference_len:
+        return 0.0
+    precision = overlap / candidate_len
+    recall = overlap / reference_len
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_1(candidate, reference):
+    cand, ref = _tokens(candidate), _tokens(reference)
+    ref_counts = {}
+    for token in ref:
+        ref_counts[token] = ref_counts.get(token, 0) + 1
+    overlap = 0
+    for token in cand:
+        if ref_counts.get(token, 0) > 0:
+            ref_counts[token] -= 1
+            overlap += 1
+    return _f1(overlap, len(cand), len(ref))
+
+
+def rouge_l(candidate, reference):
+    cand, ref = _tokens(candidate), _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+    previous = [0] * (len(ref) + 1)
+    for token in cand:
+        current = [0]
+        for j, ref_token in enumerate(ref, 1):
+            current.append(previous[j - 1] + 1 if token == ref_token else max(previous[j], current[j - 1]))
+        previous = current
+    return _f1(previous[-1], len(cand), len(ref))
+
+
+def evaluate(name, summarize, samples, repeat):
+    latencies, r1, rl = [], [], []
+    for sample in samples:
+        summary = ""
+        for _ in range(repeat):
+            start = time.perf_counter()
+            summary = summarize(sample["text"])
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        r1.append(rouge_1(summary, sample["reference"]))
+        rl.append(rouge_l(summary, sample["reference"]))
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<22} {statistics.mean(r1):>8.3f} {statistics.mean(rl):>8.3f} "
+          f"{statistics.median(latencies):>12.1f} {p95:>10.1f}")
+
+
+def load_samples(path):
+    samples = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                samples.append({"text": record["text"], "reference": record["reference"]})
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="NDJSON file with text/reference pairs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per document for latency")
+    parser.add_argument("--skip-abstractive", action="store_true", help="only run the extractive path")
+    args = parser.parse_args()
+
+    samples = load_samples(args.input) if args.input else SAMPLES
+    print(f"{len(samples)} documents, {args.repeat} runs each")
+    print(f"{'method':<22} {'ROUGE-1':>8} {'ROUGE-L':>8} {'median ms':>12} {'p95 ms':>10}")
+
+    evaluate("extractive/textrank", lambda t: extractive_summarize(t, max_sentences=3), samples, args.repeat)
+    evaluate("extractive/tfidf", lambda t: extractive_summarize(t, max_sentences=3, method="tfidf"),
+             samples, args.repeat)
+
+    if args.skip_abstractive:
+        return
+    try:
+        import transformers  # noqa: F401
+    except ImportError:
+        print("abstractive            skipped (transformers not installed)")
+        return
+    from agents import get_summarizer
+    summarizer = get_summarizer()
+    # Warm up once so model loading isn't counted as per-document latency.
+    summarizer(samples[0]["text"], max_length=150, min_length=30, do_sample=False)
+    evaluate("abstractive/distilbart",
+             lambda t: summarizer(t, max_length=150, min_length=30, do_sample=False)[0]["summary_text"],
+             samples, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-request deadlines.
+
+`app.chatbot()` creates one Deadline per request and hands it to every stage
+(patient-context lookup, the Ollama call, search, scraping, summarization).
+Each stage sizes its own timeout from what is left instead of using a fixed
+value, so a request can't run minutes past its budget by adding up stage
+timeouts.
+"""
+import os
+import time
+
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", "100"))
+# Background deep research gets its own budget, started when the job is queued.
+RESEARCH_DEADLINE_S = float(os.getenv("RESEARCH_DEADLINE_S", "120"))
+# Don't start a network stage with less than this much time left.
+MIN_STAGE_TIMEOUT_S = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage is started with no usable time left."""
+
+
+class Deadline:
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: float, stage: str = "stage") -> float:
+        """Timeout for the next stage: the remaining budget, at most `cap`.
+
+        Raises DeadlineExceeded when less than MIN_STAGE_TIMEOUT_S is left."""
+        remaining = self.remaining()
+        if remaining < MIN_STAGE_TIMEOUT_S:
+            raise DeadlineExceeded(f"No time left for {stage} ({self.elapsed():.1f}s of {self.budget_s:.0f}s used)")
+        return min(cap, remaining)
+
+    def __repr__(self):
+        return f"Deadline(budget_s={self.budget_s}, remaining={self.remaining():.1f})"
+
+
+def stage_timeout(deadline, cap: float, stage: str = "stage") -> float:
+    """`deadline.timeout(cap)`, or just `cap` when no deadline is in force."""
+    return deadline.timeout(cap, stage) if deadline is not None else cap
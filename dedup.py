@@ -0,0 +1,133 @@
+"""
+Near-duplicate detection for research sources.
+
+Search results often contain mirrored or syndicated copies of one article
+(NIH vs MedlinePlus, or the same press release on several hosts). Each copy
+used to be summarized and rendered separately. MinHash signatures over word
+shingles estimate the Jaccard similarity of two extracted pages cheaply, so
+`_enhanced_web_search` can fold copies into one source before the summarizer
+runs.
+"""
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Estimated Jaccard similarity above which two pages count as the same content.
+DEDUP_THRESHOLD = float(os.getenv("RESEARCH_DEDUP_THRESHOLD", "0.8"))
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 5
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+# Largest prime below 2**32: hashes are 32-bit, so (a * x + b) stays inside uint64.
+_PRIME = np.uint64(4294967291)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the distinct word `size`-grams of `text`."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64)
+
+
+class MinHasher:
+    """Fixed family of hash permutations; signatures from one instance are comparable."""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(_PRIME), size=num_permutations, dtype=np.uint64)
+        self.b = rng.randint(0, int(_PRIME), size=num_permutations, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)
+        if hashes.size == 0:
+            return np.full(self.a.shape, _MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(hashes, self.a) + self.b) % _PRIME
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class DedupStats:
+    """Counters for /api/metrics: how much summarizer work duplicate removal avoided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pages_checked = 0
+        self.duplicates = 0
+        self.summaries_saved = 0
+        self.chars_not_summarized = 0
+
+    def record(self, pages_checked: int, duplicates: int, summaries_saved: int, chars_not_summarized: int):
+        with self._lock:
+            self.pages_checked += pages_checked
+            self.duplicates += duplicates
+            self.summaries_saved += summaries_saved
+            self.chars_not_summarized += chars_not_summarized
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pages_checked": self.pages_checked,
+                "duplicates": self.duplicates,
+                "duplicate_ratio": round(self.duplicates / self.pages_checked, 3) if self.pages_checked else 0.0,
+                "summaries_saved": self.summaries_saved,
+                "chars_not_summarized": self.chars_not_summarized,
+            }
+
+
+_hasher: Optional[MinHasher] = None
+stats = DedupStats()
+
+
+def get_hasher() -> MinHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = MinHasher()
+    return _hasher
+
+
+def merge_near_duplicates(pages: List[Dict[str, Any]], threshold: float = DEDUP_THRESHOLD,
+                          summarize_min_chars: int = 0) -> List[Dict[str, Any]]:
+    """Fold near-duplicate pages into the first copy seen.
+
+    `pages` are dicts with at least "url" and "content", in priority order. The
+    survivors are returned in the same order, each with a "mirrors" list of the
+    URLs folded into it. Dropped pages longer than `summarize_min_chars` are
+    counted as summarizer calls saved.
+    """
+    hasher = get_hasher()
+    kept: List[Dict[str, Any]] = []
+    signatures: List[np.ndarray] = []
+    duplicates = summaries_saved = chars_saved = 0
+
+    for page in pages:
+        signature = hasher.signature(page["content"])
+        match = next((i for i, other in enumerate(signatures)
+                      if hasher.similarity(signature, other) >= threshold), None)
+        if match is None:
+            kept.append({**page, "mirrors": []})
+            signatures.append(signature)
+            continue
+        kept[match]["mirrors"].append(page["url"])
+        duplicates += 1
+        if len(page["content"]) > summarize_min_chars:
+            summaries_saved += 1
+            chars_saved += len(page["content"])
+
+    stats.record(len(pages), duplicates, summaries_saved, chars_saved)
+    return kept
+
+
+def dedup_metrics() -> Dict[str, Any]:
+    return stats.snapshot()
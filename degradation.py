@@ -0,0 +1,150 @@
+"""
+Load shedding for deep research.
+
+Deep research is the most expensive thing `/api/chatbot` does, so when the
+worker is under pressure it is degraded step by step instead of slowing
+everyone down. Load signals, all measured in this worker process:
+
+- in-flight Ollama generations (Ollama queues requests it can't run, so this
+  is our view of its queue depth),
+- queued/running background research jobs,
+- CPU load average per core.
+
+Each signal is divided by its capacity. The worst ratio picks the tier:
+
+    normal           full pipeline
+    reduced_sources  at most 2 sources, extractive summaries only
+    local_research   knowledge index only (no web search/scraping), extractive
+    simple_mode      deep research downgraded to a simple-mode answer
+
+The chosen tier is returned to the client as `degraded` and counted for
+/api/metrics.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+OLLAMA_MAX_INFLIGHT = int(os.getenv("DEGRADE_OLLAMA_MAX_INFLIGHT", "4"))
+RESEARCH_MAX_BACKLOG = int(os.getenv("DEGRADE_RESEARCH_MAX_BACKLOG", "4"))
+# Pressure (worst signal / capacity) at which each tier starts.
+REDUCED_SOURCES_AT = float(os.getenv("DEGRADE_REDUCED_SOURCES_AT", "0.7"))
+LOCAL_RESEARCH_AT = float(os.getenv("DEGRADE_LOCAL_RESEARCH_AT", "1.0"))
+SIMPLE_MODE_AT = float(os.getenv("DEGRADE_SIMPLE_MODE_AT", "1.5"))
+
+NORMAL, REDUCED_SOURCES, LOCAL_RESEARCH, SIMPLE_MODE = "normal", "reduced_sources", "local_research", "simple_mode"
+TIERS = (NORMAL, REDUCED_SOURCES, LOCAL_RESEARCH, SIMPLE_MODE)
+
+TIER_MESSAGES = {
+    REDUCED_SOURCES: "Research is limited to fewer sources while the service is busy.",
+    LOCAL_RESEARCH: "Research uses previously collected sources only while the service is busy.",
+    SIMPLE_MODE: "Deep research is paused while the service is busy; this is a standard answer.",
+}
+
+
+@dataclass(frozen=True)
+class DegradationPlan:
+    tier: str = NORMAL
+    max_sources: int = 4
+    allow_abstractive: bool = True
+    web_research: bool = True
+    deep_research: bool = True
+    reason: str = ""
+
+    @property
+    def degraded(self) -> bool:
+        return self.tier != NORMAL
+
+    def to_flag(self) -> Optional[Dict[str, Any]]:
+        """Value of the response's `degraded` field (None when not degraded)."""
+        if not self.degraded:
+            return None
+        return {"tier": self.tier, "reason": self.reason, "message": TIER_MESSAGES[self.tier]}
+
+
+NORMAL_PLAN = DegradationPlan()
+
+PLANS = {
+    NORMAL: NORMAL_PLAN,
+    REDUCED_SOURCES: DegradationPlan(REDUCED_SOURCES, max_sources=2, allow_abstractive=False),
+    LOCAL_RESEARCH: DegradationPlan(LOCAL_RESEARCH, max_sources=2, allow_abstractive=False, web_research=False),
+    SIMPLE_MODE: DegradationPlan(SIMPLE_MODE, max_sources=0, allow_abstractive=False, web_research=False,
+                                 deep_research=False),
+}
+
+
+class DegradationController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._llm_inflight = 0
+        self._tier_counts = {tier: 0 for tier in TIERS}
+
+    @contextmanager
+    def track_llm(self):
+        """Count an Ollama generation as in flight for the duration of the block."""
+        with self._lock:
+            self._llm_inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._llm_inflight -= 1
+
+    def signals(self) -> Dict[str, float]:
+        """Current load signals as fractions of capacity."""
+        from research_jobs import get_job_manager
+        try:
+            cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):  # getloadavg is Unix-only
+            cpu = 0.0
+        with self._lock:
+            llm = self._llm_inflight / max(OLLAMA_MAX_INFLIGHT, 1)
+        research = get_job_manager().active_count() / max(RESEARCH_MAX_BACKLOG, 1)
+        return {"ollama_inflight": round(llm, 3), "research_backlog": round(research, 3), "cpu_load": round(cpu, 3)}
+
+    def plan(self, deep_research_mode: bool) -> DegradationPlan:
+        """Pick the degradation tier for a new chatbot request."""
+        if not deep_research_mode:
+            return NORMAL_PLAN  # simple mode is already the cheapest path
+        signals = self.signals()
+        signal, pressure = max(signals.items(), key=lambda item: item[1])
+        if pressure >= SIMPLE_MODE_AT:
+            tier = SIMPLE_MODE
+        elif pressure >= LOCAL_RESEARCH_AT:
+            tier = LOCAL_RESEARCH
+        elif pressure >= REDUCED_SOURCES_AT:
+            tier = REDUCED_SOURCES
+        else:
+            tier = NORMAL
+        with self._lock:
+            self._tier_counts[tier] += 1
+        if tier == NORMAL:
+            return NORMAL_PLAN
+        reason = f"{signal} at {pressure:.0%} of capacity"
+        logging.warning(f"Degrading deep research to '{tier}': {reason}")
+        return DegradationPlan(**{**asdict(PLANS[tier]), "reason": reason})
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._tier_counts)
+        total = sum(counts.values())
+        return {
+            "deep_requests": total,
+            "tiers": counts,
+            "degraded_ratio": round((total - counts[NORMAL]) / total, 3) if total else 0.0,
+            "signals": self.signals(),
+        }
+
+
+_controller: Optional[DegradationController] = None
+_controller_lock = threading.Lock()
+
+
+def get_degradation_controller() -> DegradationController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = DegradationController()
+        return _controller
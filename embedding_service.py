@@ -0,0 +1,379 @@
+"""
+Shared embedding service for patient records and search queries.
+
+vectors.py used to embed with OllamaEmbeddings(model="deepseek-r1:7b"): a chat
+model, one HTTP request per caller, nothing cached, and nothing checking that
+its output size matched the patient_records collection. EmbeddingService
+replaces it behind the same embed_documents/embed_query interface:
+
+  * Micro-batching: texts from concurrent callers are queued and sent to
+    Ollama together, up to EMBED_BATCH_MAX texts per request, waiting at most
+    EMBED_BATCH_WAIT_MS for a batch to fill.
+  * Cache: vectors are stored in a SQLite file (EMBED_CACHE_PATH) keyed by
+    sha256(model, text), so re-ingesting unchanged records or repeating a
+    query never reaches the model. Keys include the model, so swapping models
+    never serves stale vectors. Set EMBED_CACHE_PATH="" to disable.
+  * Dimension check: validate_dimensions() compares the model's output size
+    with the collection's vector size (or VECTOR_SIZE before the collection
+    exists). It runs when the shared service is first created; on a mismatch
+    the service refuses to embed rather than produce vectors Qdrant rejects.
+  * Model: EMBED_MODEL selects the Ollama model. A dedicated embedding model
+    such as nomic-embed-text (768 dims) is far faster than deepseek-r1:7b;
+    switching needs a collection created with VECTOR_SIZE set to the new size
+    and a re-run of ingest_patients.py.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "deepseek-r1:7b")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# Batches sent to Ollama at once; match OLLAMA_NUM_PARALLEL on the server.
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))
+EMBED_TIMEOUT_S = float(os.getenv("EMBED_TIMEOUT_S", "120"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embedding_cache.sqlite3"))
+EMBED_VALIDATE_ON_STARTUP = os.getenv("EMBED_VALIDATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# SQLite's default limit on host parameters per statement is 999.
+_SQL_CHUNK = 500
+
+
+class EmbeddingError(Exception):
+    """The embedding model could not produce vectors."""
+
+
+class EmbeddingDimensionMismatch(EmbeddingError, ValueError):
+    """The model's vectors do not fit the patient collection."""
+
+
+class EmbeddingCache:
+    """Vectors keyed by sha256(model, text) in a SQLite file shared by the processes on a host.
+
+    Vectors are stored as float32, the precision Qdrant keeps them in."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings ("
+                         "key BLOB PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, "
+                         "vector BLOB NOT NULL, created_at REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        found = {}
+        conn = self._conn()
+        for start in range(0, len(keys), _SQL_CHUNK):
+            chunk = list(keys[start:start + _SQL_CHUNK])
+            rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                                chunk).fetchall()
+            for key, blob in rows:
+                found[bytes(key)] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, items: Sequence[tuple]):
+        """Store (key, vector) pairs."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(key, model, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                              for key, vector in items])
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._conn().execute("SELECT model, dim, COUNT(*) FROM embeddings GROUP BY model, dim").fetchall()
+        return {"path": self.path, "entries": [{"model": m, "dim": d, "count": n} for m, d, n in rows]}
+
+
+class EmbeddingService:
+    """Embeds texts with one model, sharing backend requests across concurrent callers.
+
+    `backend` takes a list of texts and returns their vectors in order; it
+    defaults to OllamaEmbeddings(EMBED_MODEL).embed_documents, created on
+    first use."""
+
+    def __init__(self, model: str = EMBED_MODEL, backend: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 cache_path: str = EMBED_CACHE_PATH, batch_max: int = EMBED_BATCH_MAX,
+                 batch_wait_ms: float = EMBED_BATCH_WAIT_MS, concurrency: int = EMBED_CONCURRENCY,
+                 dimension: Optional[int] = None):
+        self.model = model
+        self.batch_max = max(1, batch_max)
+        self.batch_wait_s = batch_wait_ms / 1000
+        self.concurrency = max(1, concurrency)
+        # Expected output size; set by validate_dimensions
+        self.dimension = dimension
+        # Set when the startup check fails; every embed then raises it
+        self.dimension_error: Optional[EmbeddingDimensionMismatch] = None
+        self._backend = backend
+        self._cache = EmbeddingCache(cache_path) if cache_path else None
+        self._queue: List[tuple] = []
+        # Keys queued by prefetch() and not embedded yet
+        self._prefetching: set = set()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._workers_pid = None
+        self._metrics_lock = threading.Lock()
+        self.texts = 0
+        self.cache_hits = 0
+        self.cache_errors = 0
+        self.backend_calls = 0
+        self.backend_texts = 0
+        self.backend_s = 0.0
+        self.largest_batch = 0
+
+    # langchain Embeddings interface
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return self.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    def embed(self, texts: Sequence[str], timeout: float = EMBED_TIMEOUT_S) -> List[List[float]]:
+        """Vectors for `texts`, in order: cached ones directly, the rest through the shared batches."""
+        if self.dimension_error is not None:
+            raise self.dimension_error
+        texts = list(texts)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        cached = self._cache_get(keys)
+        pending = []
+        for i, (text, key) in enumerate(zip(texts, keys)):
+            if key in cached:
+                vectors[i] = cached[key]
+            else:
+                pending.append((i, self._submit(text, key)))
+        with self._metrics_lock:
+            self.texts += len(texts)
+            self.cache_hits += len(texts) - len(pending)
+        deadline = time.monotonic() + timeout
+        for i, future in pending:
+            vectors[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        return vectors
+
+    def cached(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts`, None where a text has not been embedded yet. Never calls the model."""
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        cached = self._cache_get(keys)
+        return [cached.get(key) for key in keys]
+
+    def prefetch(self, texts: Sequence[str]) -> int:
+        """Queue uncached `texts` for embedding without waiting; the vectors land in the cache.
+
+        Texts already queued by an earlier prefetch are skipped. Returns the number queued."""
+        if self.dimension_error is not None:
+            return 0
+        keys = {EmbeddingCache.key(self.model, text): text for text in texts}
+        cached = self._cache_get(list(keys))
+        queued = 0
+        for key, text in keys.items():
+            with self._cond:
+                if key in cached or key in self._prefetching:
+                    continue
+                self._prefetching.add(key)
+            future = self._submit(text, key)
+            future.add_done_callback(lambda _, key=key: self._prefetching.discard(key))
+            queued += 1
+        return queued
+
+    def _cache_get(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        if self._cache is None or not keys:
+            return {}
+        try:
+            return self._cache.get_many(keys)
+        except sqlite3.Error as e:
+            with self._metrics_lock:
+                self.cache_errors += 1
+            logging.error(f"Embedding cache read failed: {e}")
+            return {}
+
+    def _cache_put(self, items: List[tuple]):
+        if self._cache is None or not items:
+            return
+        try:
+            self._cache.put_many(self.model, items)
+        except sqlite3.Error as e:
+            with self._metrics_lock:
+                self.cache_errors += 1
+            logging.error(f"Embedding cache write failed: {e}")
+
+    # Micro-batching
+
+    def _submit(self, text: str, key: bytes) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._ensure_workers()
+            self._queue.append((text, key, future))
+            self._cond.notify()
+        return future
+
+    def _ensure_workers(self):
+        # Caller holds the lock. Threads do not survive a fork, so a forked
+        # worker starts its own.
+        if self._workers_pid == os.getpid():
+            return
+        self._workers_pid = os.getpid()
+        self._workers = [threading.Thread(target=self._run, name=f"embed-batch-{i}", daemon=True)
+                         for i in range(self.concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def _next_batch(self) -> List[tuple]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            # Give concurrent callers a moment to join the batch
+            fill_deadline = time.monotonic() + self.batch_wait_s
+            while len(self._queue) < self.batch_max:
+                remaining = fill_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._queue = self._queue[:self.batch_max], self._queue[self.batch_max:]
+            if self._queue:
+                self._cond.notify()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[tuple]):
+        # Identical texts in one batch are embedded once
+        unique: Dict[bytes, str] = {}
+        for text, key, _ in batch:
+            unique.setdefault(key, text)
+        try:
+            if self._backend is None:
+                from langchain_ollama import OllamaEmbeddings
+                self._backend = OllamaEmbeddings(model=self.model, base_url=OLLAMA_BASE_URL).embed_documents
+            started = time.perf_counter()
+            results = self._backend(list(unique.values()))
+            elapsed = time.perf_counter() - started
+            if len(results) != len(unique):
+                raise EmbeddingError(f"{self.model} returned {len(results)} vectors for {len(unique)} texts")
+            for vector in results:
+                if self.dimension is not None and len(vector) != self.dimension:
+                    raise EmbeddingDimensionMismatch(
+                        f"{self.model} returned a {len(vector)}-dim vector, expected {self.dimension}")
+        except Exception as e:
+            error = e if isinstance(e, EmbeddingError) else EmbeddingError(f"{self.model}: {e}")
+            logging.error(f"Embedding batch of {len(unique)} texts failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(error)
+            return
+
+        by_key = dict(zip(unique.keys(), results))
+        self._cache_put(list(by_key.items()))
+        with self._metrics_lock:
+            self.backend_calls += 1
+            self.backend_texts += len(unique)
+            self.backend_s += elapsed
+            self.largest_batch = max(self.largest_batch, len(unique))
+        for _, key, future in batch:
+            future.set_result(list(by_key[key]))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            return {
+                "model": self.model,
+                "dimension": self.dimension,
+                "dimension_error": str(self.dimension_error) if self.dimension_error else None,
+                "texts": self.texts,
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": round(self.cache_hits / self.texts, 3) if self.texts else 0.0,
+                "cache_errors": self.cache_errors,
+                "cache_enabled": self._cache is not None,
+                "backend_calls": self.backend_calls,
+                "backend_texts": self.backend_texts,
+                "avg_batch": round(self.backend_texts / self.backend_calls, 1) if self.backend_calls else 0.0,
+                "largest_batch": self.largest_batch,
+                "backend_ms_per_text": round(self.backend_s * 1000 / self.backend_texts, 2) if self.backend_texts else 0.0,
+                "queued": len(self._queue),
+            }
+
+
+def validate_dimensions(service: Optional[EmbeddingService] = None) -> int:
+    """Check the model's output size against the patient collection and pin it on the service.
+
+    Compares with the live collection's vector size, or VECTOR_SIZE if the
+    collection does not exist yet. Returns the dimension; raises
+    EmbeddingDimensionMismatch (and marks the service unusable) on a mismatch."""
+    from vectors import COLLECTION_NAME, VECTOR_SIZE, collection_vector_size
+    service = service or get_embedding_service()
+    expected = collection_vector_size()
+    source = f"collection {COLLECTION_NAME}"
+    if expected is None:
+        expected, source = VECTOR_SIZE, "VECTOR_SIZE"
+    actual = len(service.embed_query("embedding dimension check"))
+    if actual != expected:
+        error = EmbeddingDimensionMismatch(
+            f"Embedding model {service.model} returns {actual}-dim vectors but {source} expects {expected}; "
+            f"set EMBED_MODEL to the model the collection was built with, or recreate it with VECTOR_SIZE={actual} "
+            f"and re-ingest")
+        service.dimension_error = error
+        raise error
+    service.dimension = actual
+    service.dimension_error = None
+    logging.info(f"Embedding model {service.model} matches {source} ({actual} dims)")
+    return actual
+
+
+def _startup_check(service: EmbeddingService):
+    try:
+        validate_dimensions(service)
+    except EmbeddingDimensionMismatch as e:
+        logging.error(f"Embeddings disabled: {e}")
+    except Exception as e:
+        # Qdrant or Ollama not up yet; vectors are still length-checked against VECTOR_SIZE on upsert
+        logging.warning(f"Embedding dimension check skipped: {e}")
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared EmbeddingService, checking its dimensions when it is first created."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            service = EmbeddingService()
+            if EMBED_VALIDATE_ON_STARTUP:
+                _startup_check(service)
+            _service = service
+        return _service
+
+
+def embedding_metrics() -> Dict[str, Any]:
+    """Service metrics without creating the service (and running its startup check) just to report them."""
+    with _service_lock:
+        service = _service
+    if service is None:
+        return {"model": EMBED_MODEL, "started": False}
+    return {"started": True, **service.metrics()}
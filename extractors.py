@@ -0,0 +1,166 @@
+"""
+Page text extraction for scraped research sources.
+
+Trusted medical sites get a per-domain rule: CSS selectors compiled once at
+import (soupsieve) that go straight to the content node and strip that site's
+known chrome. Other sites, and pages where no rule selector matches, use the
+generic heuristic.
+
+Golden fixtures and a per-domain throughput benchmark live in
+benchmarks/extractor_bench.py.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Never part of readable content on any site.
+NOISE_TAGS = ['script', 'style', 'nav', 'footer', 'iframe', 'noscript', 'svg', 'header']
+
+# Generic fallback: content containers tried in order, and class-name fragments of
+# elements that are likely advertisements or menus.
+GENERIC_CONTENT_SELECTORS = [
+    'article', 'main', '.content', '#content', '.article', '.post-content', '.entry-content',
+    '.main-content', '#main-content', '.article-content', '.page-content', '.post-body',
+    '.abstract', '.summary', '#maincontent', '.maincontent', '[role="main"]',
+    '.mw-parser-output'  # For Wikipedia
+]
+GENERIC_NOISE_CLASSES = ['ad', 'banner', 'menu', 'nav', 'sidebar', 'footer', 'cookie', 'popup']
+
+
+@dataclass
+class DomainExtractor:
+    """Extraction rule for one site. Selectors are tried in order; the first match wins."""
+    domain: str
+    content: Tuple[str, ...]
+    drop: Tuple[str, ...] = ()
+    _content: List[soupsieve.SoupSieve] = field(init=False, repr=False)
+    _drop: Optional[soupsieve.SoupSieve] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._content = [soupsieve.compile(selector) for selector in self.content]
+        self._drop = soupsieve.compile(", ".join(self.drop)) if self.drop else None
+
+    def extract(self, soup: BeautifulSoup) -> Optional[str]:
+        for matcher in self._content:
+            node = matcher.select_one(soup)
+            if node is None:
+                continue
+            if self._drop is not None:
+                for element in self._drop.select(node):
+                    element.decompose()
+            text = clean_text(node.get_text(separator=' ', strip=True))
+            if text:
+                return text
+        return None
+
+
+EXTRACTORS: Dict[str, DomainExtractor] = {rule.domain: rule for rule in [
+    DomainExtractor(
+        "mayoclinic.org",
+        content=('article#main-content .content', '#main-content .content', 'article#main-content'),
+        drop=('.acces-list-container', '.access-list-container', '.mc-ad', '[class*="social"]', '.rc-rail',
+              '.sticky-appt', 'form'),
+    ),
+    DomainExtractor(
+        "medlineplus.gov",
+        content=('#topic-summary', '#ency_summary', '#mplus-content article', 'article'),
+        drop=('.page-actions', '.share', '#toc', '.ency-nav'),
+    ),
+    DomainExtractor(
+        "cdc.gov",
+        content=('.cdc-dfe-body__center', 'main .syndicate', '#content .syndicate', 'main'),
+        drop=('.cdc-dfe-body__right', '.page-share', '.on-this-page', '.last-reviewed', '.social-share'),
+    ),
+    DomainExtractor(
+        "nih.gov",
+        content=('.field--name-body', '#main-content article', 'main'),
+        drop=('.share-links', '.related-links', '.field--name-field-related'),
+    ),
+    DomainExtractor(
+        "who.int",
+        content=('.sf-detail-body-wrapper', 'article .sf-content-block', 'main'),
+        drop=('.sf-share', '.related-links', '.sf-list-vertical'),
+    ),
+    DomainExtractor(
+        "pubmed.ncbi.nlm.nih.gov",
+        content=('main#article-details', '#abstract', '.search-results-chunks'),
+        drop=('.full-text-links', '.citation-tools', '.similar-articles', '.cited-by', '.actions-buttons',
+              '.docsum-citation', '.result-actions-bar', '#copyright', '.keywords-section .keywords-title'),
+    ),
+]}
+
+
+def clean_text(text: str) -> str:
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def get_extractor(url: Optional[str]) -> Optional[DomainExtractor]:
+    """Rule for `url`'s host or its most specific registered parent domain."""
+    if not url:
+        return None
+    host = (urlparse(url).hostname or "").lower()
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        rule = EXTRACTORS.get(".".join(parts[i:]))
+        if rule is not None:
+            return rule
+    return None
+
+
+def generic_extract(soup: BeautifulSoup) -> Optional[str]:
+    """Heuristic extraction for pages without a domain rule."""
+    # Remove elements that are likely advertisements or menus
+    for element in soup.find_all(class_=lambda c: c and any(x in str(c).lower() for x in GENERIC_NOISE_CLASSES)):
+        element.decompose()
+
+    # Try to find the main content area
+    main_content = None
+    for selector in GENERIC_CONTENT_SELECTORS:
+        main_content = soup.select_one(selector)
+        if main_content:
+            logging.info(f"Found main content using selector: {selector}")
+            break
+
+    if main_content:
+        # Extract text from the main content
+        return clean_text(main_content.get_text(separator=' ', strip=True))
+
+    # If no main content area found, extract from body
+    logging.info("No main content area found, extracting from body")
+    body = soup.body
+    if not body:
+        return None
+
+    # Get all paragraphs and headings, keeping only non-trivial text
+    content_parts = []
+    for element in body.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li']):
+        text = element.get_text(strip=True)
+        if text and len(text) > 20:
+            content_parts.append(text)
+
+    if not content_parts:
+        # If no paragraphs found, fall back to all text
+        return clean_text(body.get_text(separator=' ', strip=True))
+    return clean_text(' '.join(content_parts))
+
+
+def extract_text(html: str, url: Optional[str] = None) -> Optional[str]:
+    """Main readable text of an HTML page, using the domain rule for `url` when there is one."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(NOISE_TAGS):
+        element.decompose()
+
+    rule = get_extractor(url)
+    if rule is not None:
+        text = rule.extract(soup)
+        if text:
+            return text
+        logging.info(f"No {rule.domain} content selector matched {url}; using generic extraction")
+    return generic_extract(soup)
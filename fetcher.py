@@ -0,0 +1,403 @@
+"""
+Host-aware fetch scheduler for research requests.
+
+All research HTTP traffic (search pages, medical sites, and the Selenium page
+loads that go through `throttle`) is paced per domain with a token bucket and
+backs off when a host answers 429/503.
+
+Response bodies are streamed with a hard byte cap and decoded incrementally.
+`fetch_page` also skips content types that aren't HTML/text and stops
+downloading once the page has produced enough visible text to summarize, so
+huge result lists and PDFs served as HTML don't cost full downloads.
+
+Each chatbot request runs AreyaAgent inside its own `asyncio.run` loop, and an
+aiohttp session can't outlive the loop that created it. So the fetcher runs a
+single background event loop thread per worker process. That loop owns one
+keep-alive connection pool for the life of the worker, and callers on any loop
+await results through `asyncio.wrap_future`.
+"""
+import asyncio
+import atexit
+import codecs
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+# (requests per second, burst) per domain. Matched on the host or any parent
+# domain, so "www.nih.gov" and "pubmed.ncbi.nlm.nih.gov" pick the most specific entry.
+DOMAIN_LIMITS: Dict[str, Tuple[float, int]] = {
+    "pubmed.ncbi.nlm.nih.gov": (1.0, 2),
+    "eutils.ncbi.nlm.nih.gov": (3.0, 3),  # NCBI allows 3 req/s without an API key
+    "nih.gov": (1.0, 2),
+    "mayoclinic.org": (0.5, 2),
+    "medlineplus.gov": (1.0, 2),
+    "cdc.gov": (1.0, 2),
+    "who.int": (0.5, 2),
+    "duckduckgo.com": (0.5, 1),
+    "google.com": (0.2, 1),
+}
+DEFAULT_LIMIT: Tuple[float, int] = (1.0, 2)
+
+MAX_RETRIES = 2
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+RETRY_STATUSES = (429, 503)
+
+# Hard cap on bytes read from any response body.
+MAX_RESPONSE_BYTES = int(os.getenv("RESEARCH_MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))
+# fetch_page stops once this much visible text has streamed in. The scraper keeps
+# 20,000 chars of extracted content, and page chrome eats part of the visible text.
+PAGE_TEXT_TARGET_CHARS = int(os.getenv("RESEARCH_PAGE_TEXT_TARGET_CHARS", "60000"))
+PAGE_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+CHUNK_BYTES = 16 * 1024
+
+
+def host_key(url: str) -> str:
+    """Scheduling key for a URL: the most specific configured domain, else the bare host."""
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        candidate = ".".join(parts[i:])
+        if candidate in DOMAIN_LIMITS:
+            return candidate
+    return host
+
+
+class VisibleTextCounter(HTMLParser):
+    """Incremental count of text outside script/style, fed chunk by chunk."""
+
+    SKIP_TAGS = frozenset(("script", "style", "noscript", "svg", "head", "template"))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chars = 0
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.chars += len(data.strip())
+
+
+class TokenBucket:
+    """Token bucket driven from a single event loop (no locking needed)."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # set by 429/503 backoff
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline_at: Optional[float] = None) -> float:
+        """Wait for a token; returns seconds spent waiting.
+
+        Raises asyncio.TimeoutError rather than wait past `deadline_at` (a
+        time.monotonic() value)."""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                delay = self.blocked_until - now
+            else:
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            if deadline_at is not None and now + delay > deadline_at:
+                raise asyncio.TimeoutError(f"No request slot within the timeout (next in {delay:.1f}s)")
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    responses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    throttled: int = 0
+    retries: int = 0
+    bytes: int = 0
+    truncated: int = 0
+    skipped_type: int = 0
+    latency_s: float = 0.0
+    wait_s: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        completed = max(self.requests - self.errors, 1)
+        return {
+            "requests": self.requests,
+            "responses": dict(self.responses),
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "truncated": self.truncated,
+            "skipped_type": self.skipped_type,
+            "avg_latency_ms": round(self.latency_s * 1000.0 / completed, 1),
+            "total_wait_s": round(self.wait_s, 3),
+        }
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    text: str
+    headers: Dict[str, str]
+    content_type: str = ""
+    truncated: bool = False  # stopped at the byte cap or the text target
+    skipped: bool = False  # content type not accepted; body was not read
+
+
+class ResearchFetcher:
+    """Per-worker fetch scheduler with shared keep-alive pools and per-domain metrics."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, HostStats] = {}
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------ loop plumbing
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="research-fetcher", daemon=True)
+            self._thread.start()
+            logging.info("Research fetcher loop started")
+
+    async def _run(self, coro):
+        """Run `coro` on the fetcher loop and await it from the caller's loop."""
+        self._ensure_started()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only ever called on the fetcher loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=6,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            logging.info("Created shared research aiohttp session")
+        return self._session
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = DOMAIN_LIMITS.get(key, DEFAULT_LIMIT)
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _host_stats(self, key: str) -> HostStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = HostStats()
+        return stats
+
+    # ------------------------------------------------------------ fetching
+
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]], timeout: float,
+                     max_bytes: int = MAX_RESPONSE_BYTES, content_types: Optional[Tuple[str, ...]] = None,
+                     text_target: int = 0) -> FetchResult:
+        key = host_key(url)
+        bucket = self._bucket(key)
+        session = self._get_session()
+        # `timeout` bounds the whole call: rate-limit waits, backoff and retries included
+        deadline_at = time.monotonic() + timeout
+        for attempt in range(MAX_RETRIES + 1):
+            waited = await bucket.acquire(deadline_at)
+            start = time.monotonic()
+            with self._stats_lock:
+                stats = self._host_stats(key)
+                stats.requests += 1
+                stats.wait_s += waited
+            try:
+                attempt_timeout = aiohttp.ClientTimeout(total=max(deadline_at - start, 0.001))
+                async with session.get(url, headers=headers, timeout=attempt_timeout) as response:
+                    with self._stats_lock:
+                        stats.responses[str(response.status)] = stats.responses.get(str(response.status), 0) + 1
+
+                    if response.status in RETRY_STATUSES:
+                        delay = self._backoff_delay(response.headers.get("Retry-After"), attempt)
+                        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+                        with self._stats_lock:
+                            stats.throttled += 1
+                            stats.latency_s += time.monotonic() - start
+                        logging.warning(f"{key} answered {response.status}; backing off {delay:.1f}s")
+                        # Retry only if the backoff ends before the timeout; otherwise return the 429/503
+                        if attempt < MAX_RETRIES and time.monotonic() + delay < deadline_at:
+                            with self._stats_lock:
+                                stats.retries += 1
+                            continue
+
+                    content_type = (response.content_type or "").lower()
+                    if content_types and content_type and not content_type.startswith(content_types):
+                        with self._stats_lock:
+                            stats.skipped_type += 1
+                            stats.latency_s += time.monotonic() - start
+                        logging.info(f"Skipping {url}: content type {content_type}")
+                        return FetchResult(url=str(response.url), status=response.status, text="",
+                                           headers=dict(response.headers), content_type=content_type, skipped=True)
+
+                    text, nbytes, truncated = await self._read_capped(
+                        response, max_bytes, text_target if content_type != "text/plain" else 0)
+                    if text_target and content_type == "text/plain" and len(text) > text_target:
+                        text, truncated = text[:text_target], True
+                    with self._stats_lock:
+                        stats.bytes += nbytes
+                        stats.latency_s += time.monotonic() - start
+                        if truncated:
+                            stats.truncated += 1
+                    return FetchResult(url=str(response.url), status=response.status, text=text,
+                                       headers=dict(response.headers), content_type=content_type,
+                                       truncated=truncated)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                with self._stats_lock:
+                    stats.errors += 1
+                if attempt >= MAX_RETRIES or time.monotonic() >= deadline_at:
+                    raise
+                logging.warning(f"Fetch error for {url} ({e!r}), retrying")
+        raise RuntimeError(f"Exhausted retries for {url}")  # pragma: no cover - loop always returns/raises
+
+    @staticmethod
+    async def _read_capped(response: aiohttp.ClientResponse, max_bytes: int, text_target: int) -> Tuple[str, int, bool]:
+        """Stream and decode the body, stopping at `max_bytes` or `text_target` visible chars.
+
+        Returns (text, bytes_read, truncated)."""
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        counter = VisibleTextCounter() if text_target else None
+        parts = []
+        nbytes = 0
+        truncated = False
+        async for chunk in response.content.iter_chunked(CHUNK_BYTES):
+            if nbytes + len(chunk) >= max_bytes:
+                chunk = chunk[:max_bytes - nbytes]
+                truncated = True
+            nbytes += len(chunk)
+            piece = decoder.decode(chunk)
+            parts.append(piece)
+            if counter is not None:
+                counter.feed(piece)
+                if counter.chars >= text_target:
+                    truncated = True
+            if truncated:
+                break
+        parts.append(decoder.decode(b"", final=True))
+        # Leaving the `async with` early closes the connection instead of draining
+        # the rest of the body, which is the point of stopping.
+        return "".join(parts), nbytes, truncated
+
+    @staticmethod
+    def _backoff_delay(retry_after: Optional[str], attempt: int) -> float:
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX_S, max(0.0, float(retry_after)))
+            except ValueError:
+                pass  # HTTP-date form; fall through to exponential backoff
+        return min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt) * (1.0 + random.random() * 0.25))
+
+    async def fetch_text(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 15) -> FetchResult:
+        """GET `url` through the per-domain scheduler. Callable from any event loop.
+
+        `timeout` covers the whole call, including waits for the host's rate
+        limit and retries; it raises asyncio.TimeoutError when it runs out."""
+        return await self._run(self._fetch(url, headers, timeout))
+
+    async def fetch_page(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 15,
+                         max_bytes: int = MAX_RESPONSE_BYTES, text_target: int = PAGE_TEXT_TARGET_CHARS) -> FetchResult:
+        """GET an HTML/text page for scraping.
+
+        Other content types come back with `skipped=True` and no body. The
+        download stops at `max_bytes` or once `text_target` visible characters
+        have arrived (`truncated=True`). `timeout` is bounded as in fetch_text."""
+        return await self._run(self._fetch(url, headers, timeout, max_bytes=max_bytes,
+                                           content_types=PAGE_CONTENT_TYPES, text_target=text_target))
+
+    async def throttle(self, url: str, timeout: Optional[float] = None) -> float:
+        """Take a token for `url`'s host without fetching (for browser page loads).
+
+        Raises asyncio.TimeoutError if no token is free within `timeout` seconds."""
+        key = host_key(url)
+        deadline_at = time.monotonic() + timeout if timeout is not None else None
+
+        async def _acquire():
+            return await self._bucket(key).acquire(deadline_at)
+
+        waited = await self._run(_acquire())
+        with self._stats_lock:
+            self._host_stats(key).wait_s += waited
+        return waited
+
+    def record(self, url: str, latency_s: float, nbytes: int = 0, error: bool = False):
+        """Record a fetch done outside the scheduler's session (e.g. Selenium)."""
+        with self._stats_lock:
+            stats = self._host_stats(host_key(url))
+            stats.requests += 1
+            stats.latency_s += latency_s
+            stats.bytes += nbytes
+            if error:
+                stats.errors += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {key: stats.snapshot() for key, stats in sorted(self._stats.items())}
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None and not self._session.closed:
+            try:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+            except Exception as e:
+                logging.warning(f"Error closing research session: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_fetcher: Optional[ResearchFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> ResearchFetcher:
+    """Process-wide ResearchFetcher (created lazily; the loop starts on first fetch)."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ResearchFetcher()
+            atexit.register(_fetcher.close)
+        return _fetcher
@@ -0,0 +1,237 @@
+"""
+Bulk-load patient records into Qdrant.
+
+Reads a CSV (header row) or NDJSON file of patients, embeds a text summary of
+each record in batches on several threads, and upserts the points in large
+batches with wait=false so Qdrant can index while the next batch is embedded.
+The last batch is written with wait=true and every point of the run is then
+read back to confirm it landed.
+
+The collection and its payload indexes are created first if missing
+(qdrant_schema.ensure_collection). Progress is checkpointed after every
+acknowledged batch next to the input (<input>.checkpoint.json); rerunning the
+same command resumes after the last checkpointed row. Point IDs come from a
+`point_id` column (an unsigned integer or a UUID, as Qdrant requires), else
+are derived from `guid` (or the row number), so replayed rows overwrite
+instead of duplicating.
+
+    python ingest_patients.py clinic_patients.csv
+    python ingest_patients.py patients.ndjson --embed-batch 32 --concurrency 4 --upsert-batch 512
+    python ingest_patients.py clinic_patients.csv --restart      # ignore the checkpoint
+
+CSV list columns (conditions, medications, ...) are split on ';'.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from qdrant_schema import ensure_collection
+from vectors import (COLLECTION_NAME, VECTOR_SIZE, existing_point_ids, get_embeddings, patient_point_id,
+                     upsert_patient_records)
+
+EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "32"))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+UPSERT_BATCH = int(os.getenv("INGEST_UPSERT_BATCH", "256"))
+VERIFY_BATCH = 1000
+
+TEXT_FIELDS = ["name", "age", "gender", "conditions", "medical_history", "medications", "allergies",
+               "last_condition", "notes"]
+LIST_FIELDS = ["conditions", "medications", "allergies", "medical_history", "medical_conditions", "alerts"]
+INT_FIELDS = ["age"]
+
+
+def read_rows(path, fmt):
+    """Yield (row_number, record dict) from a CSV or NDJSON file."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                yield number, normalize_csv_row(row)
+        else:
+            for number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield number, json.loads(line)
+
+
+def normalize_csv_row(row):
+    record = {}
+    for key, value in row.items():
+        if key is None or value is None or value == "":
+            continue
+        key = key.strip()
+        value = value.strip()
+        if key in LIST_FIELDS:
+            record[key] = [item.strip() for item in value.split(";") if item.strip()]
+        elif key in INT_FIELDS and value.isdigit():
+            record[key] = int(value)
+        else:
+            record[key] = value
+    return record
+
+
+def normalize_point_id(value, number):
+    """`value` as a Qdrant point ID: an int for digits, else a canonical UUID string."""
+    # Same rule as app.py applies to patients.qdrant_point_id; CSV cells arrive as strings
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    try:
+        return str(uuid.UUID(text))
+    except ValueError:
+        raise ValueError(f"Row {number}: point_id {value!r} is neither an unsigned integer nor a UUID") from None
+
+
+def point_id_for(record, source, number):
+    if record.get("point_id") not in (None, ""):
+        return normalize_point_id(record.pop("point_id"), number)
+    if record.get("guid"):
+        return patient_point_id(record["guid"])
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"areya:patient:row:{os.path.basename(source)}:{number}"))
+
+
+def embedding_text(record):
+    parts = []
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if value in (None, "", []):
+            continue
+        parts.append(f"{field}: {', '.join(map(str, value)) if isinstance(value, list) else value}")
+    return "\n".join(parts) or json.dumps(record, sort_keys=True)
+
+
+class Checkpoint:
+    """Rows already ingested from one input file, stored as JSON beside it."""
+
+    def __init__(self, input_path):
+        self.path = input_path + ".checkpoint.json"
+        stat = os.stat(input_path)
+        self.fingerprint = {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+        self.rows_done = 0
+        self.points = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as handle:
+            state = json.load(handle)
+        if state.get("fingerprint") != self.fingerprint:
+            logging.warning(f"{self.path} is for a different version of the input; starting over")
+            return
+        self.rows_done = state["rows_done"]
+        self.points = state["points"]
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            json.dump({"fingerprint": self.fingerprint, "rows_done": self.rows_done, "points": self.points,
+                       "updated_at": time.time()}, handle)
+        os.replace(tmp, self.path)
+
+
+def embed_all(texts, pool, embed_batch):
+    """Embed `texts` in batches of `embed_batch` spread over the thread pool, keeping order."""
+    embeddings = get_embeddings()
+    batches = [texts[i:i + embed_batch] for i in range(0, len(texts), embed_batch)]
+    vectors = []
+    for batch_vectors in pool.map(embeddings.embed_documents, batches):
+        vectors.extend(batch_vectors)
+    for vector in vectors:
+        if len(vector) != VECTOR_SIZE:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, collection expects {VECTOR_SIZE}")
+    return vectors
+
+
+def verify(point_ids):
+    missing = []
+    for start in range(0, len(point_ids), VERIFY_BATCH):
+        batch = point_ids[start:start + VERIFY_BATCH]
+        present = existing_point_ids(batch)
+        missing.extend(point_id for point_id in batch if point_id not in present)
+    return missing
+
+
+def ingest(path, fmt, embed_batch, concurrency, upsert_batch, restart=False, limit=None):
+    for problem in ensure_collection()["problems"]:
+        logging.warning(f"{COLLECTION_NAME}: {problem}")
+    checkpoint = Checkpoint(path)
+    if not restart:
+        checkpoint.load()
+    if checkpoint.rows_done:
+        logging.info(f"Resuming {path} after row {checkpoint.rows_done} ({checkpoint.points} points already loaded)")
+
+    rows = islice(read_rows(path, fmt), checkpoint.rows_done, None if limit is None else checkpoint.rows_done + limit)
+    written = []
+    stats = {"rows": 0, "embed_s": 0.0, "upsert_s": 0.0}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-embed") as pool:
+        chunk = list(islice(rows, upsert_batch))
+        while chunk:
+            next_chunk = list(islice(rows, upsert_batch))
+            last = not next_chunk
+
+            points = []
+            for number, record in chunk:
+                points.append((point_id_for(record, path, number), record))
+            t0 = time.perf_counter()
+            vectors = embed_all([embedding_text(record) for _, record in points], pool, embed_batch)
+            t1 = time.perf_counter()
+            # The final batch waits so everything before it is applied when the check runs
+            upsert_patient_records([(point_id, vector, record) for (point_id, record), vector in zip(points, vectors)],
+                                   wait=last)
+            t2 = time.perf_counter()
+
+            stats["rows"] += len(chunk)
+            stats["embed_s"] += t1 - t0
+            stats["upsert_s"] += t2 - t1
+            written.extend(point_id for point_id, _ in points)
+            checkpoint.rows_done += len(chunk)
+            checkpoint.points += len(points)
+            checkpoint.save()
+            elapsed = time.perf_counter() - started
+            logging.info(f"{checkpoint.rows_done} rows ingested ({stats['rows'] / elapsed:.1f} rec/s this run)")
+            chunk = next_chunk
+
+    elapsed = time.perf_counter() - started
+    missing = verify(written)
+    return {
+        "input": path,
+        "rows": stats["rows"],
+        "total_points": checkpoint.points,
+        "seconds": round(elapsed, 2),
+        "records_per_s": round(stats["rows"] / elapsed, 1) if elapsed else 0.0,
+        "embed_records_per_s": round(stats["rows"] / stats["embed_s"], 1) if stats["embed_s"] else 0.0,
+        "upsert_records_per_s": round(stats["rows"] / stats["upsert_s"], 1) if stats["upsert_s"] else 0.0,
+        "verified": len(written) - len(missing),
+        "missing": len(missing),
+        "missing_sample": missing[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or NDJSON file of patient records")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="texts per embedding request")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="parallel embedding requests")
+    parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH, help="points per Qdrant upsert")
+    parser.add_argument("--limit", type=int, help="stop after this many rows")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    result = ingest(args.input, fmt, args.embed_batch, args.concurrency, args.upsert_batch,
+                    restart=args.restart, limit=args.limit)
+    print(json.dumps(result, indent=2))
+    if result["missing"]:
+        raise SystemExit(f"{result['missing']} points missing after ingestion")
+
+
+if __name__ == "__main__":
+    main()
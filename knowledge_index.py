@@ -0,0 +1,389 @@
+"""
+Persistent local retrieval index over scraped medical pages.
+
+Every page that AreyaAgent scrapes successfully is split into passages and
+appended here, so repeat deep-research queries can be answered from disk
+instead of re-scraping and re-summarizing the same sources.
+
+Storage (under KNOWLEDGE_INDEX_DIR, default data/knowledge_index/):
+  passages.jsonl  one JSON passage per line (append-only)
+  vectors.f32     float32 hashed TF-IDF vectors, row i <-> line i
+
+Retrieval is hybrid: BM25 over passage tokens plus cosine similarity of the
+hashed vectors. Superseded versions of a URL stay in the log until `compact`.
+
+CLI:
+    python knowledge_index.py build [--import pages.ndjson]
+    python knowledge_index.py compact [--max-age-days 90]
+    python knowledge_index.py inspect
+    python knowledge_index.py query "asthma treatment" [-k 5]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+from filelock import FileLock
+
+from summarizers import split_sentences, tokenize
+
+INDEX_DIR = os.getenv("KNOWLEDGE_INDEX_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_index"))
+PASSAGES_FILE = "passages.jsonl"
+VECTORS_FILE = "vectors.f32"
+LOCK_FILE = ".lock"
+
+VECTOR_DIM = 1024
+PASSAGE_CHARS = 800
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Weight of the (max-normalized) BM25 score in the hybrid score; the rest is cosine.
+BM25_WEIGHT = 0.6
+
+# Coverage rules for answering a query from the index alone.
+MIN_SOURCES = int(os.getenv("KNOWLEDGE_INDEX_MIN_SOURCES", "3"))
+# Fraction of the query's content words a passage must contain to count as covering it.
+MIN_TERM_COVERAGE = float(os.getenv("KNOWLEDGE_INDEX_MIN_TERM_COVERAGE", "0.6"))
+MAX_AGE_DAYS = int(os.getenv("KNOWLEDGE_INDEX_MAX_AGE_DAYS", "30"))
+
+
+def _domain(url: str) -> str:
+    domain = urlparse(url).netloc.lower()
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def _parse_time(value: Optional[str]) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (AttributeError, ValueError):
+        return datetime.min.replace(tzinfo=timezone.utc)
+
+
+def chunk_passages(content: str, passage_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Group sentences into passages of roughly `passage_chars` characters."""
+    passages, current = [], ""
+    for sentence in split_sentences(content, min_chars=15, max_sentences=2000):
+        if current and len(current) + len(sentence) + 1 > passage_chars:
+            passages.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        passages.append(current)
+    return passages
+
+
+def hashed_vector(text: str, dim: int = VECTOR_DIM) -> np.ndarray:
+    """Signed feature-hashing vector over unigrams and bigrams, L2-normalized."""
+    tokens = tokenize(text)
+    features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, count in Counter(features).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += (1.0 if (h >> 31) & 1 else -1.0) * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class KnowledgeIndex:
+    """On-disk passage index with hybrid BM25 + vector retrieval."""
+
+    def __init__(self, directory: str = INDEX_DIR, vector_dim: int = VECTOR_DIM):
+        self.directory = directory
+        self.vector_dim = vector_dim
+        self.passages_path = os.path.join(directory, PASSAGES_FILE)
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(directory, LOCK_FILE))
+        self._lock = threading.Lock()
+        self._loaded_size = -1
+        self._reset()
+
+    def _reset(self):
+        self.passages: List[Dict[str, Any]] = []
+        self.vectors = np.zeros((0, self.vector_dim), dtype=np.float32)
+        self._postings: Dict[str, List[tuple]] = defaultdict(list)
+        self._doc_lengths = np.zeros(0, dtype=np.float32)
+        self._latest: Dict[str, int] = {}  # url -> newest fetched_at ordinal (line number)
+
+    # ------------------------------------------------------------------ loading
+
+    def _file_size(self) -> int:
+        return os.path.getsize(self.passages_path) if os.path.exists(self.passages_path) else 0
+
+    def _ensure_loaded(self):
+        """(Re)load from disk if another process wrote to it since the last load.
+
+        This process's own appends are applied in memory by add_document and
+        move _loaded_size along with the file, so they never trigger a reload."""
+        if self._file_size() == self._loaded_size:
+            return
+        with self._file_lock:
+            self._load()
+
+    def _load(self):
+        self._reset()
+        if os.path.exists(self.passages_path):
+            with open(self.passages_path, encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        self.passages.append(json.loads(line))
+        if os.path.exists(self.vectors_path):
+            vectors = np.fromfile(self.vectors_path, dtype=np.float32)
+            self.vectors = vectors.reshape(-1, self.vector_dim)
+        if len(self.vectors) != len(self.passages):
+            logging.warning(f"Knowledge index vectors out of sync ({len(self.vectors)} vs {len(self.passages)} passages); "
+                            "run `python knowledge_index.py build`")
+            self.vectors = np.stack([hashed_vector(p["text"], self.vector_dim) for p in self.passages]) \
+                if self.passages else np.zeros((0, self.vector_dim), dtype=np.float32)
+
+        self._index_passages(0)
+        self._loaded_size = self._file_size()
+
+    def _index_passages(self, start: int):
+        """Add postings, lengths and latest-version entries for passages[start:]."""
+        lengths = []
+        for i in range(start, len(self.passages)):
+            passage = self.passages[i]
+            terms = Counter(tokenize(passage["text"]))
+            for term, tf in terms.items():
+                self._postings[term].append((i, tf))
+            lengths.append(sum(terms.values()))
+            self._latest[passage["url"]] = i
+        self._doc_lengths = np.concatenate([self._doc_lengths, np.array(lengths, dtype=np.float32)])
+
+    # ------------------------------------------------------------------ writing
+
+    def add_document(self, url: str, content: str, title: Optional[str] = None,
+                     fetched_at: Optional[str] = None) -> int:
+        """Split `content` into passages and append them. Returns passages added.
+
+        Nothing is added when `content` is what the index already holds as the
+        newest version of `url`, so re-scraping an unchanged page is free."""
+        if not url or not content:
+            return 0
+        passages = chunk_passages(content)
+        if not passages:
+            return 0
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat()
+        doc_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        records = [{
+            "url": url,
+            "domain": _domain(url),
+            "title": title or _domain(url),
+            "text": text,
+            "fetched_at": fetched_at,
+            "doc_hash": doc_hash,
+            "position": position,
+        } for position, text in enumerate(passages)]
+        vectors = np.stack([hashed_vector(text, self.vector_dim) for text in passages]).astype(np.float32)
+
+        with self._lock, self._file_lock:
+            if self._file_size() != self._loaded_size:
+                self._load()
+            latest = self._latest.get(url)
+            if latest is not None and self.passages[latest]["doc_hash"] == doc_hash:
+                return 0
+            with open(self.passages_path, "a", encoding="utf-8") as handle:
+                for record in records:
+                    handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            with open(self.vectors_path, "ab") as handle:
+                vectors.tofile(handle)
+            # Memory was in sync with the file before this append; keep it that way
+            start = len(self.passages)
+            self.passages.extend(records)
+            self.vectors = np.concatenate([self.vectors, vectors])
+            self._index_passages(start)
+            self._loaded_size = self._file_size()
+        logging.info(f"Knowledge index: added {len(records)} passages from {url}")
+        return len(records)
+
+    def build(self, import_path: Optional[str] = None) -> Dict[str, int]:
+        """Optionally import an NDJSON dump of pages, then rebuild the vector file."""
+        imported = 0
+        if import_path:
+            with open(import_path, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    page = json.loads(line)
+                    imported += self.add_document(page["url"], page.get("content") or page.get("text", ""),
+                                                  title=page.get("title"), fetched_at=page.get("fetched_at"))
+        with self._lock, self._file_lock:
+            self._load()
+            self._rewrite(self.passages)
+            self._load()
+        return {"imported_passages": imported, "passages": len(self.passages)}
+
+    def compact(self, max_age_days: Optional[int] = None) -> Dict[str, int]:
+        """Drop superseded versions of each URL, exact duplicates and (optionally) stale passages."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days) if max_age_days else None
+        with self._lock, self._file_lock:
+            self._load()
+            before = len(self.passages)
+            newest_hash = {}
+            for passage in self.passages:
+                newest_hash[passage["url"]] = passage["doc_hash"]
+            kept, seen_text = [], set()
+            for passage in self.passages:
+                if passage["doc_hash"] != newest_hash[passage["url"]]:
+                    continue
+                if cutoff and _parse_time(passage.get("fetched_at")) < cutoff:
+                    continue
+                text_key = hashlib.sha1(passage["text"].encode("utf-8")).hexdigest()
+                if text_key in seen_text:
+                    continue
+                seen_text.add(text_key)
+                kept.append(passage)
+            self._rewrite(kept)
+            self._load()
+        return {"before": before, "after": len(kept), "removed": before - len(kept)}
+
+    def _rewrite(self, passages: List[Dict[str, Any]]):
+        """Atomically replace both files with `passages` (caller holds the locks)."""
+        tmp_passages = self.passages_path + ".tmp"
+        tmp_vectors = self.vectors_path + ".tmp"
+        with open(tmp_passages, "w", encoding="utf-8") as handle:
+            for passage in passages:
+                handle.write(json.dumps(passage, ensure_ascii=False) + "\n")
+        vectors = np.stack([hashed_vector(p["text"], self.vector_dim) for p in passages]).astype(np.float32) \
+            if passages else np.zeros((0, self.vector_dim), dtype=np.float32)
+        vectors.tofile(tmp_vectors)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_passages, self.passages_path)
+
+    # ------------------------------------------------------------------ reading
+
+    def _bm25(self, query_terms: List[str]) -> np.ndarray:
+        n = len(self.passages)
+        scores = np.zeros(n, dtype=np.float32)
+        if not n:
+            return scores
+        avg_length = float(self._doc_lengths.mean()) or 1.0
+        for term in set(query_terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            docs = np.fromiter((doc for doc, _ in postings), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter((tf for _, tf in postings), dtype=np.float32, count=len(postings))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_lengths[docs] / avg_length)
+            scores[docs] += idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 8) -> List[Dict[str, Any]]:
+        """Return up to `top_k` passages ranked by the hybrid score.
+
+        Only the newest version of each URL is eligible, and a passage text is
+        returned once even if the index holds several copies of it."""
+        with self._lock:
+            self._ensure_loaded()
+            if not self.passages:
+                return []
+            query_terms = tokenize(query)
+            unique_terms = set(query_terms)
+            bm25 = self._bm25(query_terms)
+            cosine = self.vectors @ hashed_vector(query, self.vector_dim)
+            top_bm25 = float(bm25.max())
+            hybrid = BM25_WEIGHT * (bm25 / top_bm25 if top_bm25 > 0 else bm25) + (1.0 - BM25_WEIGHT) * cosine
+
+            # Only passages from the latest version of each URL are eligible.
+            latest_hash = {url: self.passages[i]["doc_hash"] for url, i in self._latest.items()}
+            results, seen_text = [], set()
+            for i in np.argsort(-hybrid):
+                if hybrid[i] <= 0 or len(results) >= top_k:
+                    break
+                passage = self.passages[i]
+                if passage["doc_hash"] != latest_hash[passage["url"]] or passage["text"] in seen_text:
+                    continue
+                seen_text.add(passage["text"])
+                passage_terms = set(tokenize(passage["text"]))
+                term_coverage = len(unique_terms & passage_terms) / len(unique_terms) if unique_terms else 0.0
+                results.append({**passage, "score": float(hybrid[i]), "bm25": float(bm25[i]),
+                                "cosine": float(cosine[i]), "term_coverage": term_coverage})
+            return results
+
+    def has_coverage(self, hits: List[Dict[str, Any]], min_sources: int = MIN_SOURCES,
+                     min_term_coverage: float = MIN_TERM_COVERAGE, max_age_days: int = MAX_AGE_DAYS) -> bool:
+        """True when enough distinct, fresh sources cover the query to skip the web."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        sources = {hit["url"] for hit in hits
+                   if hit["term_coverage"] >= min_term_coverage and _parse_time(hit.get("fetched_at")) >= cutoff}
+        return len(sources) >= min_sources
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_loaded()
+            urls = {p["url"] for p in self.passages}
+            times = sorted(p.get("fetched_at", "") for p in self.passages)
+            domains = Counter(p["domain"] for p in self.passages)
+            return {
+                "directory": self.directory,
+                "passages": len(self.passages),
+                "urls": len(urls),
+                "superseded_passages": sum(1 for p in self.passages
+                                           if p["doc_hash"] != self.passages[self._latest[p["url"]]]["doc_hash"]),
+                "terms": len(self._postings),
+                "passages_bytes": os.path.getsize(self.passages_path) if os.path.exists(self.passages_path) else 0,
+                "vectors_bytes": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0,
+                "oldest": times[0] if times else None,
+                "newest": times[-1] if times else None,
+                "domains": dict(domains.most_common(15)),
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Process-wide KnowledgeIndex for INDEX_DIR."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = KnowledgeIndex()
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local medical knowledge index.")
+    parser.add_argument("--dir", default=INDEX_DIR, help="index directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="import pages and rebuild vectors")
+    build.add_argument("--import", dest="import_path", help="NDJSON file of {url, content, title?, fetched_at?}")
+    compact = sub.add_parser("compact", help="drop superseded, duplicate and stale passages")
+    compact.add_argument("--max-age-days", type=int, help="also drop passages older than this")
+    sub.add_parser("inspect", help="print index statistics")
+    query = sub.add_parser("query", help="run a retrieval query")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = KnowledgeIndex(args.dir)
+    if args.command == "build":
+        print(json.dumps(index.build(args.import_path), indent=2))
+    elif args.command == "compact":
+        print(json.dumps(index.compact(args.max_age_days), indent=2))
+    elif args.command == "inspect":
+        print(json.dumps(index.stats(), indent=2))
+    elif args.command == "query":
+        hits = index.search(args.text, top_k=args.k)
+        for hit in hits:
+            print(f"{hit['score']:.3f}  bm25={hit['bm25']:.2f} cos={hit['cosine']:.2f} "
+                  f"terms={hit['term_coverage']:.0%}  {hit['url']}  ({hit['fetched_at']})")
+            print(f"    {hit['text'][:200]}")
+        print(f"coverage: {index.has_coverage(hits)}")
+
+
+if __name__ == "__main__":
+    main()
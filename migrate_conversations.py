@@ -0,0 +1,121 @@
+"""
+Move conversation history from Qdrant payloads into Postgres.
+
+Conversations used to live in each patient point's `conversations` payload
+array. They now live in the append-only `conversation_exchanges` table
+(migrations/001_conversation_exchanges.sql), one row per user/Areya exchange.
+
+    python migrate_conversations.py schema            # apply migrations/*.sql
+    python migrate_conversations.py backfill --dry-run
+    python migrate_conversations.py backfill --clear-payload
+
+Backfill is idempotent: an exchange keeps the id of its user message, and ids
+already in the table are skipped. --clear-payload drops the `conversations`
+key from each point once its history is in Postgres.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import postgres
+from vectors import delete_patient_fields, scroll_patient_records
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def apply_schema():
+    """Run every migrations/*.sql file in name order; the DDL is idempotent."""
+    applied = []
+    conn = postgres.get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+            with open(path, encoding="utf-8") as handle:
+                sql = "\n".join(line for line in handle if not line.lstrip().startswith("--"))
+            # pg8000 runs one statement per execute
+            for statement in filter(None, (part.strip() for part in sql.split(";"))):
+                cur.execute(statement)
+            applied.append(os.path.basename(path))
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+
+def _parse_timestamp(value):
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def group_exchanges(point_id, conversations):
+    """Pair User messages with the Areya reply that follows, as the old /api/conversations did."""
+    exchanges = []
+    current = None
+    for message in conversations:
+        if message.get("sender") == "User" and current is None:
+            current = {
+                "point_id": point_id,
+                "conversation_id": str(message.get("id") or f"{point_id}:{len(exchanges)}"),
+                "user_message": message.get("message", ""),
+                "response": None,
+                "sources": [],
+                "created_at": _parse_timestamp(message.get("timestamp")),
+            }
+        elif message.get("sender") == "Areya" and current is not None:
+            current["response"] = message.get("message", "")
+            current["sources"] = message.get("sources") or []
+            exchanges.append(current)
+            current = None
+    if current is not None:  # unanswered last message
+        exchanges.append(current)
+    return exchanges
+
+
+def backfill(dry_run=False, clear_payload=False):
+    stats = {"points": 0, "points_with_history": 0, "exchanges": 0, "inserted": 0, "cleared": 0}
+    for record in scroll_patient_records(with_payload=["conversations"]):
+        stats["points"] += 1
+        conversations = record["payload"].get("conversations")
+        if not conversations:
+            continue
+        stats["points_with_history"] += 1
+        exchanges = group_exchanges(str(record["id"]), conversations)
+        stats["exchanges"] += len(exchanges)
+        if dry_run:
+            continue
+        stats["inserted"] += postgres.insert_conversation_exchanges(exchanges)
+        if clear_payload:
+            delete_patient_fields(record["id"], ["conversations"])
+            stats["cleared"] += 1
+        logging.info(f"Backfilled {len(exchanges)} exchanges for {record['id']}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("schema", help="apply migrations/*.sql")
+    fill = sub.add_parser("backfill", help="copy Qdrant conversation payloads into Postgres")
+    fill.add_argument("--dry-run", action="store_true", help="count exchanges without writing")
+    fill.add_argument("--clear-payload", action="store_true", help="remove `conversations` from migrated points")
+    args = parser.parse_args()
+
+    if args.command == "schema":
+        print(json.dumps({"applied": apply_schema()}, indent=2))
+    elif args.command == "backfill":
+        print(json.dumps(backfill(dry_run=args.dry_run, clear_payload=args.clear_payload), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Store each patient's Qdrant point ID in their Postgres row.
+
+Login used to validate the password in Postgres and then scroll Qdrant for
+the point whose `guid` or `name` matched the patient. With the point ID in
+patients.qdrant_point_id (migrations/002_patient_point_id.sql), login reads it
+from the row it already fetched and never calls Qdrant.
+
+    python migrate_patient_points.py schema            # apply migrations/*.sql
+    python migrate_patient_points.py backfill --dry-run
+    python migrate_patient_points.py backfill
+
+Backfill scans the collection once and matches points to patients the way
+login did: by `guid` == patient_id, else by a `name` that belongs to exactly
+one patient. It is idempotent, and rows it cannot match are filled by the
+login fallback on the patient's next sign-in. Records loaded by
+ingest_patients.py already use vectors.patient_point_id(patient_id).
+"""
+import argparse
+import json
+import logging
+from collections import defaultdict
+
+import postgres
+from migrate_conversations import apply_schema
+from vectors import scroll_patient_records
+
+
+def match_points(patients, records):
+    """Map patient_id -> point ID; returns (mapping, stats)."""
+    by_id = {str(patient["patient_id"]): patient for patient in patients}
+    by_name = defaultdict(list)
+    for patient in patients:
+        by_name[f"{patient['first_name']} {patient['last_name']}"].append(str(patient["patient_id"]))
+
+    mapping = {}
+    stats = {"points": 0, "matched_guid": 0, "matched_name": 0, "ambiguous_name": 0, "unmatched": 0,
+             "duplicate_points": 0}
+    for record in records:
+        stats["points"] += 1
+        guid = record["payload"].get("guid")
+        name = record["payload"].get("name")
+        if guid and str(guid) in by_id:
+            patient_id, matched = str(guid), "matched_guid"
+        elif name and len(by_name.get(name, [])) == 1:
+            patient_id, matched = by_name[name][0], "matched_name"
+        else:
+            stats["ambiguous_name" if name in by_name else "unmatched"] += 1
+            continue
+        if patient_id in mapping:
+            # Login took whichever point Qdrant returned first; keep the first as well
+            stats["duplicate_points"] += 1
+            logging.warning(f"Patient {patient_id} has several points: {mapping[patient_id]}, {record['id']}")
+            continue
+        stats[matched] += 1
+        mapping[patient_id] = record["id"]
+    stats["patients"] = len(by_id)
+    stats["patients_without_point"] = len(by_id) - len(mapping)
+    return mapping, stats
+
+
+def backfill(dry_run=False):
+    patients = postgres.get_patient_identities()
+    mapping, stats = match_points(patients, scroll_patient_records(with_payload=["guid", "name"]))
+    stats["updated"] = 0 if dry_run else postgres.set_patient_point_ids(list(mapping.items()))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("schema", help="apply migrations/*.sql")
+    fill = sub.add_parser("backfill", help="copy point IDs from Qdrant into patients.qdrant_point_id")
+    fill.add_argument("--dry-run", action="store_true", help="match without writing")
+    args = parser.parse_args()
+
+    if args.command == "schema":
+        print(json.dumps({"applied": apply_schema()}, indent=2))
+    elif args.command == "backfill":
+        print(json.dumps(backfill(dry_run=args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+-- Conversation history, one row per user/Areya exchange.
+-- Rows are only ever inserted (one per chat turn) or deleted by the patient;
+-- reads page through them newest first with a (created_at, id) keyset cursor.
+CREATE TABLE IF NOT EXISTS conversation_exchanges (
+    id               BIGSERIAL PRIMARY KEY,
+    conversation_id  TEXT NOT NULL UNIQUE,
+    patient_point_id TEXT NOT NULL,
+    user_message     TEXT NOT NULL,
+    response         TEXT,
+    sources          JSONB NOT NULL DEFAULT '[]'::jsonb,
+    created_at       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS conversation_exchanges_patient_time
+    ON conversation_exchanges (patient_point_id, created_at DESC, id DESC);
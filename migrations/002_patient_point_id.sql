@@ -0,0 +1,7 @@
+-- Qdrant point ID of each patient's record, read by login from the row it
+-- already fetches instead of scrolling Qdrant by guid/name.
+-- Filled by `python migrate_patient_points.py backfill`; rows it misses are
+-- filled on the patient's next login.
+ALTER TABLE patients ADD COLUMN IF NOT EXISTS qdrant_point_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS patients_qdrant_point_id ON patients (qdrant_point_id);
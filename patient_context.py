@@ -0,0 +1,191 @@
+"""
+Retrieval-augmented patient context for chat prompts.
+
+ask_medical_chatbot used to paste a patient's whole `medical_history` into the
+prompt, so prompt size and Ollama prompt-eval time grew with every entry a
+long-standing patient collected. build_patient_context() sends only what is
+relevant to the question, within a token budget. /api/chatbot
+(app.load_patient_context) and vectors.ask_medical_chatbot both use it.
+
+  * Pinned facts: allergies, medications and conditions are always included
+    (they are short and safety-relevant). Lists that would overflow the budget
+    are cut and end in "(+N more)".
+  * History chunks: each medical_history entry is one chunk; entries longer
+    than CHUNK_CHARS are split at sentence boundaries. Chunks are embedded with
+    the shared EmbeddingService. Its SQLite cache keeps every chunk's vector,
+    so each entry is embedded once per model, and later questions only embed
+    the question. The top CONTEXT_TOP_K chunks by cosine similarity are kept,
+    as far as they fit the budget left after the pinned facts, and listed in
+    their original order.
+  * Cold cache: a request embeds at most COLD_EMBED_MAX uncached chunks, the
+    most recent ones. Older uncached chunks are queued for embedding in the
+    background (EmbeddingService.prefetch) and join the ranking once cached.
+  * Short histories that fit the budget whole are sent as they are, with no
+    embedding call. If embedding fails, the most recent entries that fit are
+    used instead.
+
+Tokens are estimated at CHARS_PER_TOKEN characters each; that is close
+enough for English clinical text to enforce a budget without loading the
+model's tokenizer. benchmarks/patient_context_bench.py reports the reduction.
+"""
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+# Token budget for the whole patient context section of a prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("PATIENT_CONTEXT_TOKENS", "400"))
+# Most history chunks retrieved per question
+CONTEXT_TOP_K = int(os.getenv("PATIENT_CONTEXT_TOP_K", "8"))
+# Uncached history chunks embedded inside one request; the rest are prefetched
+COLD_EMBED_MAX = int(os.getenv("PATIENT_CONTEXT_COLD_EMBED_MAX", "32"))
+CHUNK_CHARS = 600
+CHARS_PER_TOKEN = 4
+
+PINNED_FIELDS = [("allergies", "Allergies"), ("medications", "Medications"), ("conditions", "Conditions")]
+HISTORY_HEADER = "Relevant history:"
+# Payload keys build_patient_context reads
+CONTEXT_FIELDS = ["medical_history"] + [field for field, _ in PINNED_FIELDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text` (CHARS_PER_TOKEN characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _line_tokens(line: str) -> int:
+    # Counting the newline with every line keeps the sum an upper bound for the joined text
+    return estimate_tokens(line + "\n")
+
+
+def _entry_text(entry: Any) -> str:
+    # History entries are free text, or dicts for records imported from the EHR
+    if isinstance(entry, str):
+        return entry.strip()
+    return json.dumps(entry, ensure_ascii=False, separators=(", ", ": "), default=str)
+
+
+def history_chunks(medical_history: Sequence[Any], chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """medical_history as retrieval chunks, oldest first."""
+    from knowledge_index import chunk_passages
+    chunks = []
+    for entry in medical_history or []:
+        text = _entry_text(entry)
+        if not text:
+            continue
+        if len(text) <= chunk_chars:
+            chunks.append(text)
+        else:
+            chunks.extend(chunk_passages(text, chunk_chars) or [text[:chunk_chars]])
+    return chunks
+
+
+def _pinned_lines(payload: Dict[str, Any], budget: int) -> List[str]:
+    lines, used = [], 0
+    for field, label in PINNED_FIELDS:
+        values = [str(v) for v in payload.get(field) or [] if v]
+        if not values:
+            continue
+        # Drop items from the end until the line fits what is left of the budget
+        for keep in range(len(values), 0, -1):
+            more = f" (+{len(values) - keep} more)" if keep < len(values) else ""
+            line = f"{label}: {', '.join(values[:keep])}{more}"
+            if used + _line_tokens(line) <= budget:
+                lines.append(line)
+                used += _line_tokens(line)
+                break
+    return lines
+
+
+@dataclass(frozen=True)
+class PatientContext:
+    """Context section for a prompt, with the numbers behind it."""
+    text: str
+    tokens: int
+    # Tokens of the same fields dumped in full, as the prompts used to
+    full_tokens: int
+    chunks_used: int
+    chunks_total: int
+    # "all" (fits whole), "retrieved" (top-k by similarity) or "recent" (embedding failed)
+    mode: str
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of the full dump's tokens saved."""
+        return 1 - self.tokens / self.full_tokens if self.full_tokens else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"tokens": self.tokens, "full_tokens": self.full_tokens, "reduction": round(self.reduction, 3),
+                "chunks_used": self.chunks_used, "chunks_total": self.chunks_total, "mode": self.mode}
+
+
+def _fit(indices: Sequence[int], chunks: List[str], budget: int, top_k: int) -> List[int]:
+    # Take chunks in the given order of preference while they fit the budget
+    picked, used = [], _line_tokens(HISTORY_HEADER)
+    for i in indices:
+        cost = _line_tokens(f"- {chunks[i]}")
+        if used + cost > budget:
+            continue
+        picked.append(i)
+        used += cost
+        if len(picked) == top_k:
+            break
+    return sorted(picked)
+
+
+def rank_chunks(query: str, chunks: List[str], service=None, cold_max: int = COLD_EMBED_MAX) -> List[int]:
+    """Chunk indices, most similar to `query` first.
+
+    Only cached chunks and the `cold_max` most recent uncached ones are
+    ranked; older uncached chunks are prefetched and left out this time."""
+    if service is None:
+        from embedding_service import get_embedding_service
+        service = get_embedding_service()
+    vectors = service.cached(chunks)
+    uncached = [i for i, vector in enumerate(vectors) if vector is None]
+    embed_now = uncached[len(uncached) - cold_max:] if cold_max > 0 else []
+    fresh = service.embed([query] + [chunks[i] for i in embed_now])
+    # After the request's own embedding, so it doesn't queue behind the prefetch
+    if len(embed_now) < len(uncached):
+        service.prefetch([chunks[i] for i in uncached[:len(uncached) - len(embed_now)]])
+    for i, vector in zip(embed_now, fresh[1:]):
+        vectors[i] = vector
+    ranked = [i for i, vector in enumerate(vectors) if vector is not None]
+    matrix = np.asarray([fresh[0]] + [vectors[i] for i in ranked], dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    scores = matrix[1:] @ matrix[0]
+    return [ranked[j] for j in np.argsort(-scores, kind="stable")]
+
+
+def build_patient_context(payload: Dict[str, Any], query: str, budget: int = CONTEXT_TOKEN_BUDGET,
+                          top_k: int = CONTEXT_TOP_K, service=None) -> PatientContext:
+    """Context section for `query` from a patient payload, at most `budget` tokens.
+
+    `payload` needs medical_history and optionally allergies, medications and
+    conditions. `service` defaults to the shared EmbeddingService."""
+    history = payload.get("medical_history") or []
+    full_tokens = sum(estimate_tokens(str(payload[field])) for field in CONTEXT_FIELDS if payload.get(field))
+    lines = _pinned_lines(payload, budget)
+    remaining = budget - sum(_line_tokens(line) for line in lines)
+    chunks = history_chunks(history)
+
+    mode = "all"
+    picked = list(range(len(chunks)))
+    if chunks and estimate_tokens("\n".join([HISTORY_HEADER] + [f"- {c}" for c in chunks])) > remaining:
+        try:
+            picked = _fit(rank_chunks(query, chunks, service), chunks, remaining, top_k)
+            mode = "retrieved"
+        except Exception as e:
+            logging.warning(f"Patient history retrieval failed, using the most recent entries: {e}")
+            picked = _fit(range(len(chunks) - 1, -1, -1), chunks, remaining, top_k)
+            mode = "recent"
+    if picked:
+        lines += [HISTORY_HEADER] + [f"- {chunks[i]}" for i in picked]
+
+    text = "\n".join(lines)
+    return PatientContext(text=text, tokens=estimate_tokens(text), full_tokens=full_tokens,
+                          chunks_used=len(picked), chunks_total=len(chunks), mode=mode)
@@ -1,3 +1,4 @@
+import base64
 import os
 import pg8000
 import ssl
@@ -5,7 +6,7 @@ import certifi
 import json
 from google.cloud.sql.connector import Connector
 import logging
-from datetime import date, time
+from datetime import date, datetime, time
 import pg8000.dbapi
 
 # Configure logging
@@ -623,6 +624,60 @@ def delete_patient(patient_id):
         cur.close()
         conn.close()
 
+# UPDATE: Record the Qdrant point that holds a patient's record (migrations/002)
+def set_patient_point_id(patient_id, point_id):
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute("UPDATE patients SET qdrant_point_id = %s WHERE patient_id = %s;", (str(point_id), patient_id))
+        conn.commit()
+        return cur.rowcount > 0
+    except Exception as e:
+        logging.error(f"An error occurred while setting point ID for patient {patient_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+# UPDATE: Bulk version for the backfill; returns the number of rows changed
+def set_patient_point_ids(mapping):
+    """`mapping` is a list of (patient_id, point_id); rows already holding that point ID are skipped."""
+    if not mapping:
+        return 0
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        updated = 0
+        for patient_id, point_id in mapping:
+            cur.execute(
+                "UPDATE patients SET qdrant_point_id = %s "
+                "WHERE patient_id = %s AND qdrant_point_id IS DISTINCT FROM %s;",
+                (str(point_id), patient_id, str(point_id)))
+            updated += cur.rowcount
+        conn.commit()
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+# READ: Identity columns of every patient, for matching them to Qdrant records
+def get_patient_identities():
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT patient_id, first_name, last_name, qdrant_point_id FROM patients;")
+        return _rows_to_dicts(cur.fetchall(), cur.description)
+    finally:
+        if cur: cur.close()
+        conn.close()
+
 ###########################
 # APPOINTMENT FUNCTIONS
 ###########################
@@ -881,3 +936,171 @@ def get_appointment_page_details():
         if cur: cur.close()
         if conn: conn.close()
 
+
+
+##########################
+# CONVERSATION FUNCTIONS
+##########################
+# Schema: migrations/001_conversation_exchanges.sql. Backfill from the old
+# Qdrant `conversations` payload: python migrate_conversations.py
+
+CONVERSATION_PAGE_MAX = 100
+
+def _encode_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    """(created_at, id) from a cursor string; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _exchange_to_dict(row):
+    sources = row["sources"]
+    return {
+        "id": row["conversation_id"],
+        "timestamp": row["created_at"].isoformat(),
+        "user_message": row["user_message"],
+        "response": row["response"],
+        "sources": json.loads(sources) if isinstance(sources, str) else (sources or []),
+    }
+
+# CREATE: Append one user/Areya exchange
+def append_conversation_exchange(point_id, conversation_id, user_message, response, sources=None, created_at=None):
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        query = """
+            INSERT INTO conversation_exchanges
+                (conversation_id, patient_point_id, user_message, response, sources, created_at)
+            VALUES (%s, %s, %s, %s, %s::jsonb, COALESCE(%s, now()));
+        """
+        cur.execute(query, (conversation_id, point_id, user_message, response,
+                            json.dumps(sources or []), created_at))
+        conn.commit()
+        return True
+    except Exception as e:
+        logging.error(f"An error occurred while appending conversation for {point_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+# CREATE: Bulk insert exchanges (backfill); existing conversation_ids are skipped
+def insert_conversation_exchanges(exchanges):
+    """`exchanges` are dicts with point_id, conversation_id, user_message, response,
+    sources and created_at. Returns the number of rows inserted."""
+    if not exchanges:
+        return 0
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        query = """
+            INSERT INTO conversation_exchanges
+                (conversation_id, patient_point_id, user_message, response, sources, created_at)
+            VALUES (%s, %s, %s, %s, %s::jsonb, COALESCE(%s, now()))
+            ON CONFLICT (conversation_id) DO NOTHING;
+        """
+        inserted = 0
+        for exchange in exchanges:
+            cur.execute(query, (exchange["conversation_id"], exchange["point_id"], exchange["user_message"],
+                                exchange.get("response"), json.dumps(exchange.get("sources") or []),
+                                exchange.get("created_at")))
+            inserted += max(cur.rowcount, 0)
+        conn.commit()
+        return inserted
+    except Exception as e:
+        logging.error(f"An error occurred while inserting conversations: {e}")
+        conn.rollback()
+        raise
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+# READ: One page of a patient's exchanges, newest first
+def get_conversation_exchanges(point_id, limit=20, cursor=None, since=None, until=None):
+    """Returns (exchanges, next_cursor); next_cursor is None on the last page.
+
+    `since`/`until` are datetimes bounding created_at (inclusive/exclusive).
+    Raises ValueError for a malformed cursor."""
+    limit = max(1, min(int(limit), CONVERSATION_PAGE_MAX))
+    conditions, values = _exchange_filters(point_id, since, until)
+    if cursor:
+        created_at, row_id = _decode_cursor(cursor)
+        conditions.append("(created_at, id) < (%s, %s)")
+        values += [created_at, row_id]
+    values.append(limit + 1)
+
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        query = f"""
+            SELECT id, conversation_id, user_message, response, sources, created_at
+            FROM conversation_exchanges
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s;
+        """
+        cur.execute(query, values)
+        rows = _rows_to_dicts(cur.fetchall(), cur.description)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [_exchange_to_dict(row) for row in rows], next_cursor
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+def count_conversation_exchanges(point_id, since=None, until=None):
+    """Number of exchanges matching the same filters as get_conversation_exchanges, over all pages."""
+    conditions, values = _exchange_filters(point_id, since, until)
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM conversation_exchanges WHERE {' AND '.join(conditions)};", values)
+        return cur.fetchone()[0]
+    finally:
+        if cur: cur.close()
+        conn.close()
+
+def _exchange_filters(point_id, since=None, until=None):
+    # WHERE conditions and values shared by the conversation reads
+    conditions = ["patient_point_id = %s"]
+    values = [point_id]
+    if since is not None:
+        conditions.append("created_at >= %s"); values.append(since)
+    if until is not None:
+        conditions.append("created_at < %s"); values.append(until)
+    return conditions, values
+
+# DELETE: Remove one exchange; returns the number of exchanges left, or None if it wasn't found
+def delete_conversation_exchange(point_id, conversation_id):
+    conn = get_connection()
+    cur = None
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM conversation_exchanges WHERE patient_point_id = %s AND conversation_id = %s;",
+                    (point_id, conversation_id))
+        deleted = cur.rowcount
+        cur.execute("SELECT COUNT(*) FROM conversation_exchanges WHERE patient_point_id = %s;", (point_id,))
+        remaining = cur.fetchone()[0]
+        conn.commit()
+        logging.info(f"Deleted conversation {conversation_id} for {point_id}")
+        return remaining if deleted else None
+    except Exception as e:
+        logging.error(f"An error occurred while deleting conversation: {e}")
+        conn.rollback()
+        raise
+    finally:
+        if cur: cur.close()
+        conn.close()
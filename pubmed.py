@@ -0,0 +1,218 @@
+"""
+PubMed research source over NCBI E-utilities.
+
+Replaces loading `pubmed.ncbi.nlm.nih.gov/?term=...` in headless Chrome. A query
+runs one ESearch with `usehistory=y`; abstracts are then pulled with EFetch,
+either by paging through the server-side history (WebEnv/query_key with
+retstart/retmax) or, when some articles are already cached, by batched ID
+lookups for the missing PMIDs only.
+
+Requests go through the research fetcher, so the eutils rate limit (3 req/s
+without an API key) and 429 backoff apply. ESearch results and parsed
+articles are cached in memory.
+
+Set PUBMED_EUTILS_URL to point at a local stub (benchmarks/eutils_stub.py)
+to run against recorded responses.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from fetcher import get_fetcher
+
+EUTILS_BASE_URL = os.getenv("PUBMED_EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils").rstrip("/")
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+NCBI_EMAIL = os.getenv("NCBI_EMAIL")
+NCBI_TOOL = os.getenv("NCBI_TOOL", "asendhealth-areya")
+
+EFETCH_BATCH_SIZE = int(os.getenv("PUBMED_EFETCH_BATCH_SIZE", "20"))
+PUBMED_MAX_ARTICLES = int(os.getenv("PUBMED_MAX_ARTICLES", "10"))
+PUBMED_CACHE_TTL_S = int(os.getenv("PUBMED_CACHE_TTL_S", "21600"))
+PUBMED_CACHE_SIZE = int(os.getenv("PUBMED_CACHE_SIZE", "2048"))
+PUBMED_TIMEOUT_S = 15
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl_s` seconds."""
+
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self._items: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_s, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    return "".join(element.itertext()).strip() if element is not None else ""
+
+
+def parse_efetch(xml_text: str) -> List[Dict[str, Any]]:
+    """Articles from an EFetch `PubmedArticleSet` (retmode=xml) response."""
+    articles = []
+    root = ET.fromstring(xml_text)
+    for node in root.iter("PubmedArticle"):
+        citation = node.find("MedlineCitation")
+        if citation is None:
+            continue
+        pmid = _text(citation.find("PMID"))
+        article = citation.find("Article")
+        if not pmid or article is None:
+            continue
+        sections = []
+        for part in article.findall("Abstract/AbstractText"):
+            text = _text(part)
+            if text:
+                label = part.get("Label")
+                sections.append(f"{label.title()}: {text}" if label else text)
+        year = _text(article.find("Journal/JournalIssue/PubDate/Year")) or \
+            _text(article.find("Journal/JournalIssue/PubDate/MedlineDate"))[:4]
+        articles.append({
+            "pmid": pmid,
+            "title": _text(article.find("ArticleTitle")),
+            "abstract": " ".join(sections),
+            "journal": _text(article.find("Journal/Title")),
+            "year": year,
+            "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+        })
+    return articles
+
+
+class PubMedClient:
+    def __init__(self, base_url: str = EUTILS_BASE_URL, api_key: Optional[str] = NCBI_API_KEY):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.fetcher = get_fetcher()
+        self.searches = TTLCache(256, PUBMED_CACHE_TTL_S)
+        self.articles = TTLCache(PUBMED_CACHE_SIZE, PUBMED_CACHE_TTL_S)
+
+    def _url(self, utility: str, **params) -> str:
+        params.update(db="pubmed", tool=NCBI_TOOL)
+        if NCBI_EMAIL:
+            params["email"] = NCBI_EMAIL
+        if self.api_key:
+            params["api_key"] = self.api_key
+        return f"{self.base_url}/{utility}.fcgi?{urlencode(params)}"
+
+    async def _get(self, url: str, timeout: float) -> str:
+        response = await self.fetcher.fetch_text(url, timeout=timeout)
+        if response.status != 200:
+            raise RuntimeError(f"E-utilities returned {response.status} for {url.split('?')[0]}")
+        return response.text
+
+    async def esearch(self, term: str, retmax: int = PUBMED_MAX_ARTICLES,
+                      timeout: float = PUBMED_TIMEOUT_S) -> Dict[str, Any]:
+        """ESearch with usehistory=y: {"count", "ids", "webenv", "query_key"} (cached per term)."""
+        key = (term.lower().strip(), retmax)
+        cached = self.searches.get(key)
+        if cached is not None:
+            return cached
+        body = await self._get(self._url("esearch", term=term, retmax=retmax, usehistory="y",
+                                         sort="relevance", retmode="json"), timeout)
+        result = json.loads(body).get("esearchresult", {})
+        search = {
+            "count": int(result.get("count", 0)),
+            "ids": result.get("idlist", []),
+            "webenv": result.get("webenv"),
+            "query_key": result.get("querykey"),
+        }
+        self.searches.set(key, search)
+        return search
+
+    async def efetch_history(self, webenv: str, query_key: str, total: int,
+                             timeout: float = PUBMED_TIMEOUT_S) -> List[Dict[str, Any]]:
+        """Page through a search's server-side history in EFETCH_BATCH_SIZE chunks."""
+        articles = []
+        for retstart in range(0, total, EFETCH_BATCH_SIZE):
+            body = await self._get(self._url("efetch", WebEnv=webenv, query_key=query_key, retstart=retstart,
+                                             retmax=min(EFETCH_BATCH_SIZE, total - retstart),
+                                             rettype="abstract", retmode="xml"), timeout)
+            articles.extend(parse_efetch(body))
+        return articles
+
+    async def efetch_ids(self, pmids: List[str], timeout: float = PUBMED_TIMEOUT_S) -> List[Dict[str, Any]]:
+        """Fetch articles by PMID, EFETCH_BATCH_SIZE IDs per request."""
+        articles = []
+        for start in range(0, len(pmids), EFETCH_BATCH_SIZE):
+            batch = pmids[start:start + EFETCH_BATCH_SIZE]
+            body = await self._get(self._url("efetch", id=",".join(batch), rettype="abstract", retmode="xml"),
+                                   timeout)
+            articles.extend(parse_efetch(body))
+        return articles
+
+    async def research(self, term: str, max_articles: int = PUBMED_MAX_ARTICLES,
+                       timeout: float = PUBMED_TIMEOUT_S) -> List[Dict[str, Any]]:
+        """Most relevant articles for `term` that have an abstract, in relevance order.
+
+        Each article has "fetched": True when EFetch returned it in this call
+        and False when it came from the article cache."""
+        search = await self.esearch(term, retmax=max_articles, timeout=timeout)
+        ids = search["ids"][:max_articles]
+        if not ids:
+            return []
+
+        cached = {pmid: self.articles.get(pmid) for pmid in ids}
+        missing = [pmid for pmid, article in cached.items() if article is None]
+        fetched_ids = set()
+        if missing:
+            if len(missing) == len(ids) and search["webenv"] and search["query_key"]:
+                fetched = await self.efetch_history(search["webenv"], search["query_key"], len(ids), timeout)
+            else:
+                fetched = await self.efetch_ids(missing, timeout)
+            for article in fetched:
+                self.articles.set(article["pmid"], article)
+                cached[article["pmid"]] = article
+                fetched_ids.add(article["pmid"])
+            logging.info(f"PubMed: fetched {len(fetched)} articles for '{term}' ({len(ids) - len(missing)} cached)")
+
+        return [{**cached[pmid], "fetched": pmid in fetched_ids}
+                for pmid in ids if cached.get(pmid) and cached[pmid]["abstract"]]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "search_cache": {"hits": self.searches.hits, "misses": self.searches.misses},
+            "article_cache": {"hits": self.articles.hits, "misses": self.articles.misses},
+        }
+
+
+def articles_to_text(articles: List[Dict[str, Any]]) -> str:
+    """Join titles and abstracts into one document for the summarizer."""
+    return " ".join(f"{article['title']} {article['abstract']}" for article in articles)
+
+
+_client: Optional[PubMedClient] = None
+_client_lock = threading.Lock()
+
+
+def get_pubmed_client() -> PubMedClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PubMedClient()
+        return _client
@@ -0,0 +1,290 @@
+"""
+Bootstrap and verify the patient_records collection.
+
+Login looks patients up with a `should` filter on `guid` and `name`, and
+patient search filters on age, location and conditions. Without payload
+indexes Qdrant answers those filters by scanning every point's payload, so
+login latency grows with the number of patients. This module creates the
+collection with the app's vector parameters and a payload index for each
+filtered field, and checks an existing collection against that schema.
+
+    python qdrant_schema.py bootstrap     # create what is missing; safe to rerun
+    python qdrant_schema.py verify        # exit 1 if the live schema differs
+    python qdrant_schema.py describe
+    python qdrant_schema.py apply-profile --profile int8-disk
+
+Storage profiles trade vector RAM for latency. A 3072-dim float32 vector is
+12 KB per patient before HNSW links; with int8 scalar quantization the copy
+searched in RAM is 3 KB and the originals can live on disk, read back only to
+rescore the top candidates:
+
+    memory          float32 vectors and HNSW graph in RAM (the original setup)
+    int8            int8 copy in RAM for search, float32 also in RAM; rescored
+    int8-disk       int8 copy in RAM, float32 on disk; rescored from disk
+    int8-disk-hnsw  int8-disk with the HNSW graph on disk too
+    disk            float32 vectors and HNSW graph on disk, no quantization
+
+QDRANT_STORAGE_PROFILE picks the profile for bootstrap and for the search
+parameters vectors.py sends; `apply-profile` converts an existing collection
+in place (Qdrant rebuilds the affected storage in the background).
+benchmarks/storage_profile_eval.py compares recall, latency and memory.
+
+vectors.get_client() runs the same check once per worker when it creates the
+client (QDRANT_VERIFY_SCHEMA, on by default) and logs what is missing; it
+never changes the collection itself.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from vectors import COLLECTION_NAME, VECTOR_SIZE, get_client
+
+QDRANT_VERIFY_SCHEMA = os.getenv("QDRANT_VERIFY_SCHEMA", "true").lower() in ("1", "true", "yes")
+
+# Payload field -> index type, for every field the app filters on.
+PAYLOAD_INDEXES = {
+    "guid": "keyword",      # login
+    "name": "keyword",      # login
+    "location": "keyword",  # patient search
+    "conditions": "keyword",
+    "age": "integer",
+}
+DISTANCE = "Cosine"
+HNSW_M = 16
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    name: str
+    quantization: Optional[str] = None   # "int8" for scalar quantization
+    vectors_on_disk: bool = False
+    hnsw_on_disk: bool = False
+    # Candidates rescored with the original vectors = limit * oversampling
+    oversampling: float = 2.0
+
+    def vectors_config(self, size: int):
+        from qdrant_client.http.models import Distance, VectorParams
+        return VectorParams(size=size, distance=Distance(DISTANCE), on_disk=self.vectors_on_disk)
+
+    def hnsw_config(self):
+        from qdrant_client.http.models import HnswConfigDiff
+        return HnswConfigDiff(on_disk=self.hnsw_on_disk)
+
+    def quantization_config(self):
+        if self.quantization is None:
+            return None
+        from qdrant_client.http.models import ScalarQuantization, ScalarQuantizationConfig, ScalarType
+        # quantile 0.99 clips outlier components so the int8 range is spent on typical values
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99,
+                                                                  always_ram=True))
+
+    def search_params(self):
+        """Per-query parameters; None when the profile needs none."""
+        if self.quantization is None:
+            return None
+        from qdrant_client.http.models import QuantizationSearchParams, SearchParams
+        return SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=self.oversampling))
+
+    def estimate_bytes(self, points: int, dim: int) -> Dict[str, int]:
+        """Rough vector + HNSW footprint in RAM and on disk, payload excluded.
+
+        Qdrant's own sizing guidance adds ~50% on top for segments and
+        bookkeeping; use this to compare profiles, not to size a node."""
+        ram = disk = 0
+        original = points * dim * 4
+        if self.vectors_on_disk:
+            disk += original
+        else:
+            ram += original
+        if self.quantization == "int8":
+            ram += points * (dim + 4)  # one byte per component plus a per-vector offset
+        graph = points * HNSW_M * 2 * 4  # layer-0 links dominate
+        if self.hnsw_on_disk:
+            disk += graph
+        else:
+            ram += graph
+        return {"ram": ram, "disk": disk}
+
+
+STORAGE_PROFILES = {
+    "memory": StorageProfile("memory"),
+    "int8": StorageProfile("int8", quantization="int8"),
+    "int8-disk": StorageProfile("int8-disk", quantization="int8", vectors_on_disk=True),
+    "int8-disk-hnsw": StorageProfile("int8-disk-hnsw", quantization="int8", vectors_on_disk=True,
+                                     hnsw_on_disk=True),
+    "disk": StorageProfile("disk", vectors_on_disk=True, hnsw_on_disk=True),
+}
+QDRANT_STORAGE_PROFILE = os.getenv("QDRANT_STORAGE_PROFILE", "memory")
+
+
+def get_storage_profile(name: Optional[str] = None) -> StorageProfile:
+    name = name or QDRANT_STORAGE_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {name!r}; choose from {', '.join(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+
+def _vector_params(info):
+    params = info.config.params.vectors
+    if isinstance(params, dict):  # named vectors; the app only uses the default one
+        params = params.get("") or next(iter(params.values()))
+    return params
+
+
+def _index_type(index_info):
+    data_type = getattr(index_info, "data_type", index_info)
+    return str(getattr(data_type, "value", data_type)).lower()
+
+
+def describe(client=None, collection_name=COLLECTION_NAME):
+    """Vector params and payload indexes of the live collection, or None if it does not exist."""
+    client = client or get_client()
+    if not client.collection_exists(collection_name):
+        return None
+    info = client.get_collection(collection_name)
+    params = _vector_params(info)
+    quantization = info.config.quantization_config
+    scalar = getattr(quantization, "scalar", None)
+    return {
+        "collection": collection_name,
+        "status": str(getattr(info.status, "value", info.status)),
+        "points": info.points_count,
+        "vector_size": params.size,
+        "distance": str(getattr(params.distance, "value", params.distance)),
+        "vectors_on_disk": bool(params.on_disk),
+        "hnsw_on_disk": bool(info.config.hnsw_config.on_disk),
+        "quantization": str(getattr(scalar.type, "value", scalar.type)) if scalar else None,
+        "payload_indexes": {field: _index_type(index) for field, index in (info.payload_schema or {}).items()},
+    }
+
+
+def schema_problems(client=None, collection_name=COLLECTION_NAME, vector_size=VECTOR_SIZE, profile=None):
+    """Differences between the live collection and the expected schema; empty when it matches."""
+    profile = profile or get_storage_profile()
+    current = describe(client, collection_name)
+    if current is None:
+        return [f"collection {collection_name} does not exist"]
+    problems = []
+    if current["vector_size"] != vector_size:
+        problems.append(f"vector size is {current['vector_size']}, expected {vector_size}")
+    if current["distance"] != DISTANCE:
+        problems.append(f"distance is {current['distance']}, expected {DISTANCE}")
+    if (current["quantization"], current["vectors_on_disk"], current["hnsw_on_disk"]) != (
+            profile.quantization, profile.vectors_on_disk, profile.hnsw_on_disk):
+        problems.append(f"storage is quantization={current['quantization']}, vectors_on_disk="
+                        f"{current['vectors_on_disk']}, hnsw_on_disk={current['hnsw_on_disk']}; profile "
+                        f"{profile.name} expects {profile.quantization}, {profile.vectors_on_disk}, "
+                        f"{profile.hnsw_on_disk} (run `python qdrant_schema.py apply-profile`)")
+    for field, index_type in PAYLOAD_INDEXES.items():
+        actual = current["payload_indexes"].get(field)
+        if actual is None:
+            problems.append(f"no {index_type} payload index on {field}")
+        elif actual != index_type:
+            problems.append(f"payload index on {field} is {actual}, expected {index_type}")
+    return problems
+
+
+def ensure_payload_indexes(client=None, collection_name=COLLECTION_NAME, wait=True):
+    """Create the missing PAYLOAD_INDEXES; returns the fields indexed.
+
+    An index of the wrong type is left alone and reported by schema_problems:
+    replacing it means dropping it first, which is a deliberate step."""
+    from qdrant_client.http.models import PayloadSchemaType
+    client = client or get_client()
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for field, index_type in PAYLOAD_INDEXES.items():
+        if field in existing:
+            continue
+        client.create_payload_index(collection_name, field_name=field,
+                                    field_schema=PayloadSchemaType(index_type), wait=wait)
+        logging.info(f"Created {index_type} payload index on {collection_name}.{field}")
+        created.append(field)
+    return created
+
+
+def ensure_collection(client=None, collection_name=COLLECTION_NAME, vector_size=VECTOR_SIZE, profile=None):
+    """Create the collection (with the storage profile) and its payload indexes if missing. Idempotent.
+
+    Returns {"created": bool, "indexes_created": [...], "problems": [...]};
+    problems are differences that are not fixed in place, such as the vector
+    size or storage profile of an existing collection."""
+    client = client or get_client()
+    profile = profile or get_storage_profile()
+    created = False
+    if not client.collection_exists(collection_name):
+        client.create_collection(collection_name, vectors_config=profile.vectors_config(vector_size),
+                                 hnsw_config=profile.hnsw_config(),
+                                 quantization_config=profile.quantization_config())
+        logging.info(f"Created collection {collection_name} ({vector_size} dims, {DISTANCE}, "
+                     f"storage profile {profile.name})")
+        created = True
+    indexes_created = ensure_payload_indexes(client, collection_name)
+    return {"created": created, "indexes_created": indexes_created,
+            "problems": schema_problems(client, collection_name, vector_size, profile)}
+
+
+def apply_profile(client=None, collection_name=COLLECTION_NAME, profile=None):
+    """Switch an existing collection to `profile`; Qdrant rebuilds storage in the background."""
+    from qdrant_client.http.models import Disabled, VectorParamsDiff
+    client = client or get_client()
+    profile = profile or get_storage_profile()
+    client.update_collection(
+        collection_name,
+        vectors_config={"": VectorParamsDiff(on_disk=profile.vectors_on_disk)},
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config() or Disabled.DISABLED,
+    )
+    logging.info(f"Applied storage profile {profile.name} to {collection_name}")
+
+
+def startup_check(client):
+    """Log schema problems once per worker; never raises, never modifies the collection."""
+    if not QDRANT_VERIFY_SCHEMA:
+        return
+    try:
+        problems = schema_problems(client)
+    except Exception as e:
+        logging.warning(f"Qdrant schema check skipped: {e}")
+        return
+    for problem in problems:
+        logging.error(f"Qdrant schema: {problem} (run `python qdrant_schema.py bootstrap`)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--profile", choices=list(STORAGE_PROFILES), default=QDRANT_STORAGE_PROFILE,
+                        help="storage profile (default: QDRANT_STORAGE_PROFILE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    boot = sub.add_parser("bootstrap", help="create the collection and payload indexes if missing")
+    boot.add_argument("--vector-size", type=int, default=VECTOR_SIZE)
+    sub.add_parser("verify", help="exit 1 if the collection differs from the expected schema")
+    sub.add_parser("describe", help="print the live vector params and payload indexes")
+    sub.add_parser("apply-profile", help="convert the existing collection to --profile")
+    args = parser.parse_args()
+    profile = get_storage_profile(args.profile)
+
+    if args.command == "bootstrap":
+        result = ensure_collection(collection_name=args.collection, vector_size=args.vector_size, profile=profile)
+        print(json.dumps(result, indent=2))
+        if result["problems"]:
+            sys.exit(1)
+    elif args.command == "verify":
+        problems = schema_problems(collection_name=args.collection, profile=profile)
+        print(json.dumps({"collection": args.collection, "ok": not problems, "problems": problems}, indent=2))
+        if problems:
+            sys.exit(1)
+    elif args.command == "describe":
+        print(json.dumps(describe(collection_name=args.collection), indent=2))
+    elif args.command == "apply-profile":
+        apply_profile(collection_name=args.collection, profile=profile)
+        print(json.dumps(describe(collection_name=args.collection), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Per-worker read-through cache for patient record payloads.
+
+Pages such as the dashboard and the chatbot read the same patient payload
+several times within seconds, and each read was a Qdrant round trip.
+vectors.get_patient_payload serves those reads from a small LRU whose entries
+expire after RECORD_CACHE_TTL_S, and every payload write in vectors.py
+invalidates the record it touched.
+
+Invalidations only reach the worker that made the write. With several
+gunicorn workers on one host, set RECORD_CACHE_INVALIDATION_FILE to a shared
+path: writers append the point ID to it, and every worker checks its size on
+each cache read and evicts the IDs appended since its last check. Other
+workers without the file still converge within the TTL.
+"""
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+RECORD_CACHE_MAX_ITEMS = int(os.getenv("RECORD_CACHE_MAX_ITEMS", "1024"))
+# 0 disables caching.
+RECORD_CACHE_TTL_S = float(os.getenv("RECORD_CACHE_TTL_S", "30"))
+RECORD_CACHE_INVALIDATION_FILE = os.getenv("RECORD_CACHE_INVALIDATION_FILE", "")
+# The invalidation file is truncated once it grows past this; workers that see
+# it shrink drop their whole cache, which is always safe.
+INVALIDATION_FILE_MAX_BYTES = 1 << 20
+
+
+class InvalidationLog:
+    """Append-only file of invalidated point IDs shared by the workers on a host."""
+
+    def __init__(self, path: str):
+        from filelock import FileLock
+        self.path = path
+        self._lock = FileLock(path + ".lock")
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def publish(self, key: str):
+        with self._lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > INVALIDATION_FILE_MAX_BYTES:
+                open(self.path, "w").close()
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(f"{key}\n")
+
+    def poll(self) -> Optional[list]:
+        """Keys published since the last poll; None if the log was truncated (evict everything)."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size == self._offset:
+            return []
+        if size < self._offset:
+            self._offset = size
+            return None
+        with open(self.path, "r", encoding="utf-8") as handle:
+            handle.seek(self._offset)
+            data = handle.read()
+        # Only consume complete lines; a writer may be mid-append
+        consumed = data[:data.rfind("\n") + 1]
+        self._offset += len(consumed.encode("utf-8"))
+        return consumed.split()
+
+
+class RecordCache:
+    """Thread-safe LRU of payload dicts with TTL expiry and version-checked fills.
+
+    A record can be cached under several `variant`s (field projections); an
+    invalidation drops all of them."""
+
+    def __init__(self, max_items: int = RECORD_CACHE_MAX_ITEMS, ttl_s: float = RECORD_CACHE_TTL_S,
+                 invalidation_file: str = RECORD_CACHE_INVALIDATION_FILE):
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._variants: Dict[str, set] = {}
+        # Set to a new _clock value on every invalidation so a fill that raced with
+        # a write is dropped. Bounded like the LRU: keys dropped from it fall back to
+        # _floor, which is at least every dropped version, so their fills can't pass.
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+        self._log = InvalidationLog(invalidation_file) if invalidation_file else None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and self.max_items > 0
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, self._floor)
+
+    def get(self, key: str, variant: Any = None) -> Optional[Dict[str, Any]]:
+        """A copy of the cached payload, or None on a miss."""
+        self._apply_remote_invalidations()
+        with self._lock:
+            item = self._items.get((key, variant))
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._remove((key, variant))
+                self.misses += 1
+                return None
+            self._items.move_to_end((key, variant))
+            self.hits += 1
+            payload = item[1]
+        return copy.deepcopy(payload)
+
+    def set(self, key: str, payload: Dict[str, Any], version: int, variant: Any = None):
+        """Store `payload` unless `key` was invalidated after `version` was read."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._versions.get(key, self._floor) != version:
+                return
+            self._items[(key, variant)] = (time.monotonic() + self.ttl_s, copy.deepcopy(payload))
+            self._items.move_to_end((key, variant))
+            self._variants.setdefault(key, set()).add(variant)
+            while len(self._items) > self.max_items:
+                self._remove(next(iter(self._items)))
+                self.evictions += 1
+
+    def _remove(self, item_key: tuple):
+        # Caller holds the lock
+        self._items.pop(item_key, None)
+        variants = self._variants.get(item_key[0])
+        if variants is not None:
+            variants.discard(item_key[1])
+            if not variants:
+                del self._variants[item_key[0]]
+
+    def invalidate(self, key: str):
+        key = str(key)
+        self._evict(key)
+        with self._lock:
+            self.invalidations += 1
+        if self._log is not None:
+            try:
+                self._log.publish(key)
+            except OSError as e:
+                logging.error(f"Record cache: could not publish invalidation for {key}: {e}")
+
+    def _evict(self, key: str):
+        with self._lock:
+            for variant in self._variants.pop(key, ()):
+                self._items.pop((key, variant), None)
+            self._bump(key)
+
+    def _bump(self, key: str):
+        # Caller holds the lock. Versions only grow, so the oldest entry has the smallest.
+        self._clock += 1
+        self._versions[key] = self._clock
+        self._versions.move_to_end(key)
+        while len(self._versions) > max(self.max_items, 1):
+            _, self._floor = self._versions.popitem(last=False)
+
+    def _apply_remote_invalidations(self):
+        if self._log is None:
+            return
+        keys = self._log.poll()
+        if keys is None:
+            with self._lock:
+                # Every key falls back to a new floor, which also drops in-flight fills
+                self._clock += 1
+                self._floor = self._clock
+                self._versions.clear()
+                self._items.clear()
+                self._variants.clear()
+            return
+        for key in keys:
+            self._evict(key)
+        if keys:
+            with self._lock:
+                self.remote_invalidations += len(keys)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._items),
+                "max_items": self.max_items,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+                "evictions": self.evictions,
+                "cross_worker": self._log is not None,
+            }
+
+
+_cache: Optional[RecordCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_record_cache() -> RecordCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RecordCache()
+        return _cache
@@ -0,0 +1,154 @@
+"""
+Background deep-research jobs with progress events.
+
+`/api/chatbot` in deep research mode returns the LLM answer right away and
+hands the search/scrape/summarize pipeline to a ResearchJobManager. The
+pipeline publishes progress events (search done, source N scraped,
+summarized, done), which the browser reads with long-polling
+(`/api/research/<id>`) or Server-Sent Events (`/api/research/<id>/stream`).
+
+Jobs live in the memory of the worker process that created them. With several
+gunicorn workers, route a client's research requests to one worker (sticky
+sessions) or run the research endpoints on threaded workers.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RESEARCH_JOB_WORKERS = int(os.getenv("RESEARCH_JOB_WORKERS", "2"))
+# Finished jobs are kept this long so slow clients can still fetch the result.
+RESEARCH_JOB_TTL_S = int(os.getenv("RESEARCH_JOB_TTL_S", "900"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class ResearchJob:
+    def __init__(self, query: str, owner: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        # Patient (point ID) the job was started for; only they can read it
+        self.owner = None if owner is None else str(owner)
+        self.status = QUEUED
+        self.events: List[Dict[str, Any]] = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def publish(self, stage: str, **data):
+        """Append a progress event and wake any waiting readers."""
+        with self._changed:
+            self.events.append({"seq": len(self.events), "stage": stage, "time": time.time(), **data})
+            self._changed.notify_all()
+
+    def _finish(self, status: str, message: str, result: Any = None, error: Optional[str] = None):
+        # Status, result and the terminal event change together so readers never
+        # see a finished job without its final event (or vice versa).
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.events.append({"seq": len(self.events), "stage": status, "time": self.finished_at,
+                                "progress": 100, "message": message})
+            self._changed.notify_all()
+
+    def wait_events(self, since: int, timeout: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """Events with seq >= `since`, waiting up to `timeout` seconds for new ones.
+
+        Returns (events, finished)."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while len(self.events) <= since and not self.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self.events[since:], self.finished
+
+    def to_dict(self, since: int = 0) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "events": self.events[since:],
+            "next": len(self.events),
+            "research": self.result if self.finished else None,
+            "error": self.error,
+        }
+
+
+class ResearchJobManager:
+    def __init__(self, max_workers: int = RESEARCH_JOB_WORKERS, ttl_s: int = RESEARCH_JOB_TTL_S):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="research-job")
+        self._jobs: Dict[str, ResearchJob] = {}
+        self._lock = threading.Lock()
+        self.ttl_s = ttl_s
+
+    def submit(self, query: str, run: Callable[[ResearchJob], Any],
+               on_complete: Optional[Callable[[ResearchJob], None]] = None,
+               owner: Optional[str] = None) -> ResearchJob:
+        """Queue `run(job)`; its return value becomes the job result."""
+        job = ResearchJob(query, owner)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        job.publish("queued", progress=0, message="Research queued")
+        self._executor.submit(self._execute, job, run, on_complete)
+        return job
+
+    def _execute(self, job: ResearchJob, run, on_complete):
+        job.status = RUNNING
+        try:
+            result = run(job)
+            job._finish(DONE, "Research complete", result=result)
+        except Exception as e:
+            logging.error(f"Research job {job.id} failed: {e}", exc_info=True)
+            job._finish(FAILED, "Research failed", error=str(e))
+        if on_complete:
+            try:
+                on_complete(job)
+            except Exception as e:
+                logging.error(f"Research job {job.id} completion hook failed: {e}", exc_info=True)
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[ResearchJob]:
+        """The job, or None if it doesn't exist or was started for someone other than `owner`.
+
+        Jobs submitted without an owner, and lookups without one, match nothing."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.owner is None or owner is None or job.owner != str(owner):
+            return None
+        return job
+
+    def active_count(self) -> int:
+        """Jobs queued or running in this worker."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at and now - job.finished_at > self.ttl_s]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_manager: Optional[ResearchJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> ResearchJobManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ResearchJobManager()
+        return _manager
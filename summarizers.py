@@ -0,0 +1,149 @@
+"""
+Extractive summarization with NumPy.
+
+A fast path next to the distilbart pipeline in agents.py: sentences are turned
+into TF-IDF vectors, ranked with TextRank (PageRank over the cosine-similarity
+graph) and the best ones are returned in document order. A 20k-character page
+summarizes in a few milliseconds on CPU, versus seconds for the abstractive
+model.
+"""
+import re
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+# Sentence boundary: terminal punctuation followed by whitespace and something
+# that looks like the start of a new sentence.
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])')
+TOKEN_RE = re.compile(r"[a-z][a-z0-9\-]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers herself him himself his how i if in into is it its itself just
+may me might more most must my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them themselves
+then there these they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# Boilerplate that shows up on scraped medical pages and should never be picked.
+BOILERPLATE_TERMS = ('cookie', 'privacy', 'advertisement', 'subscribe')
+
+
+def split_sentences(text: str, min_chars: int = 25, max_sentences: int = 400) -> List[str]:
+    """Split text into candidate sentences, dropping fragments and boilerplate."""
+    if not text:
+        return []
+    sentences = []
+    for sentence in SENTENCE_SPLIT_RE.split(re.sub(r'\s+', ' ', text).strip()):
+        sentence = sentence.strip()
+        if len(sentence) < min_chars:
+            continue
+        lowered = sentence.lower()
+        if any(term in lowered for term in BOILERPLATE_TERMS):
+            continue
+        sentences.append(sentence)
+        if len(sentences) >= max_sentences:
+            break
+    return sentences
+
+
+def tokenize(sentence: str) -> List[str]:
+    """Lowercased content words of `sentence` (stopwords removed)."""
+    return [token for token in TOKEN_RE.findall(sentence.lower()) if token not in STOPWORDS]
+
+
+def tfidf_matrix(sentences: List[str]) -> np.ndarray:
+    """Return an L2-normalized (n_sentences x vocabulary) TF-IDF matrix."""
+    tokenized = [tokenize(sentence) for sentence in sentences]
+    vocabulary = {}
+    rows, cols = [], []
+    for row, tokens in enumerate(tokenized):
+        for token in tokens:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float32)
+    if rows:
+        np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+
+    tf = np.log1p(counts)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + df)) + 1.0
+    matrix = tf * idf.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def textrank_scores(matrix: np.ndarray, damping: float = 0.85,
+                    max_iterations: int = 100, tolerance: float = 1e-6) -> np.ndarray:
+    """PageRank over the sentence cosine-similarity graph."""
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no overlap get uniform outgoing weight so they don't sink rank.
+    transition = np.where(row_sums > 0, similarity / np.where(row_sums == 0, 1.0, row_sums), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float64)
+    for _ in range(max_iterations):
+        updated = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences: List[str], method: str = "textrank",
+                   query_terms: Optional[Iterable[str]] = None) -> np.ndarray:
+    """Score sentences; higher is more central. `query_terms` boosts matching sentences."""
+    matrix = tfidf_matrix(sentences)
+    if method == "textrank":
+        scores = textrank_scores(matrix)
+    elif method == "tfidf":
+        # Similarity to the document centroid.
+        centroid = matrix.mean(axis=0)
+        scores = matrix @ centroid
+    else:
+        raise ValueError(f"Unknown extractive method: {method}")
+
+    if query_terms:
+        terms = [term.lower() for term in query_terms]
+        boost = np.array([sum(term in sentence.lower() for term in terms) for sentence in sentences],
+                         dtype=np.float64)
+        scores = scores * (1.0 + 0.5 * np.minimum(boost, 3))
+    return scores
+
+
+def extractive_summarize(text: str, max_sentences: int = 3, max_chars: Optional[int] = 900,
+                         method: str = "textrank", query_terms: Optional[Iterable[str]] = None) -> str:
+    """Pick the top sentences of `text` and return them in their original order."""
+    sentences = split_sentences(text)
+    if not sentences:
+        return text[:max_chars].strip() if max_chars else text.strip()
+    if len(sentences) <= max_sentences:
+        selected = sentences
+    else:
+        scores = rank_sentences(sentences, method=method, query_terms=query_terms)
+        top = np.argsort(-scores, kind="stable")[:max_sentences]
+        selected = [sentences[i] for i in sorted(top)]
+
+    summary = " ".join(selected)
+    if max_chars and len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(" ", 1)[0] + "..."
+    return summary
+
+
+def key_points(text: str, max_points: int = 3, query_terms: Optional[Iterable[str]] = None) -> List[str]:
+    """Top `max_points` sentences of `text` in document order."""
+    sentences = split_sentences(text)
+    if len(sentences) <= max_points:
+        return sentences
+    scores = rank_sentences(sentences, query_terms=query_terms)
+    top = np.argsort(-scores, kind="stable")[:max_points]
+    return [sentences[i] for i in sorted(top)]
@@ -1,11 +1,14 @@
+import asyncio
 import requests
 import json
+import math
+from contextlib import contextmanager
 from pydantic import BaseModel
 import logging
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance
 import os
-from langchain_ollama import OllamaEmbeddings
+import threading
+import uuid
+import weakref
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,12 +17,107 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION_NAME = "patient_records"
+# gRPC keeps one multiplexed HTTP/2 channel per worker and skips JSON encoding
+# of vectors; REST (the default) reuses pooled keep-alive connections.
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() in ("1", "true", "yes")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+# Transport timeout for every Qdrant call; per-call timeouts can only lower it.
+QDRANT_TIMEOUT_S = int(os.getenv("QDRANT_TIMEOUT_S", "10"))
+# Search paging limits; Qdrant gathers offset + limit candidates for every page.
+SEARCH_LIMIT_MAX = 100
+SEARCH_OFFSET_MAX = 1000
 
-# Initialize Qdrant and embeddings
-client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-embeddings = OllamaEmbeddings(model="deepseek-r1:7b")
-VECTOR_SIZE = 3072
-VECTOR_PARAMS = VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+# Size of the patient_records vectors; must match the embedding model's output
+# (embedding_service checks this against the live collection at startup).
+VECTOR_SIZE = int(os.getenv("VECTOR_SIZE", "3072"))
+
+# Qdrant client and embeddings are created on first use; importing qdrant_client
+# and langchain_ollama at module load slows down every worker boot.
+_client = None
+_client_lock = threading.Lock()
+# AsyncQdrantClient per event loop, see get_async_client()
+_async_clients = weakref.WeakKeyDictionary()
+
+def make_client(prefer_grpc=None, timeout=QDRANT_TIMEOUT_S):
+    """Build a QdrantClient for QDRANT_URL; prefer_grpc defaults to QDRANT_PREFER_GRPC."""
+    from qdrant_client import QdrantClient
+    return QdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc,
+        grpc_port=QDRANT_GRPC_PORT,
+        timeout=timeout,
+    )
+
+def get_client():
+    """Return the shared QdrantClient, creating it on first use.
+
+    The client is thread-safe and keeps its connections open, so every vector
+    operation in the worker goes through this one instance."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = make_client()
+            # Before publishing, so no request uses an unchecked client; if the
+            # check raises, the next call builds a client and checks again
+            from qdrant_schema import startup_check
+            startup_check(client)
+            _client = client
+            logging.info(f"Qdrant client ready ({'gRPC' if QDRANT_PREFER_GRPC else 'REST'}, timeout {QDRANT_TIMEOUT_S}s)")
+        return _client
+
+def make_async_client(prefer_grpc=None, timeout=QDRANT_TIMEOUT_S):
+    """Build an AsyncQdrantClient for QDRANT_URL, configured like make_client()."""
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc,
+        grpc_port=QDRANT_GRPC_PORT,
+        timeout=timeout,
+    )
+
+def get_async_client():
+    """Return the AsyncQdrantClient of the running event loop, creating it on first use.
+
+    Async connections belong to the loop that opened them, and every request
+    runs its agent in its own loop (asyncio.run), so there is one client per
+    loop rather than one per worker. Call close_async_client() before the loop
+    finishes."""
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = make_async_client()
+        return client
+
+async def close_async_client():
+    """Close the running loop's AsyncQdrantClient, if it has one."""
+    with _client_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+def get_embeddings():
+    """Return the shared EmbeddingService (embed_documents/embed_query like OllamaEmbeddings)."""
+    from embedding_service import get_embedding_service
+    return get_embedding_service()
+
+def get_vector_params():
+    """Vector parameters for the patient_records collection."""
+    from qdrant_client.http.models import VectorParams, Distance
+    return VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+
+def __getattr__(name):
+    # Keep `vectors.client`, `vectors.embeddings` and `vectors.VECTOR_PARAMS`
+    # working for existing callers without constructing them at import time.
+    if name == "client":
+        return get_client()
+    if name == "embeddings":
+        return get_embeddings()
+    if name == "VECTOR_PARAMS":
+        return get_vector_params()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Data model for Patient
 class Patient(BaseModel):
@@ -29,103 +127,506 @@ class Patient(BaseModel):
     location: str
     notes: str = None
 
+class VectorStoreError(Exception):
+    """A Qdrant operation failed."""
+
+class VectorStoreUnavailable(VectorStoreError):
+    """Qdrant could not be reached."""
+
+class VectorStoreTimeout(VectorStoreError, TimeoutError):
+    """A Qdrant operation did not finish within its timeout."""
+
+class RecordNotFound(VectorStoreError, LookupError):
+    """No point with the requested ID."""
+
+def _call_timeout(timeout):
+    # qdrant-client takes whole seconds; round up so short stage budgets stay > 0
+    return None if timeout is None else max(1, math.ceil(timeout))
+
+@contextmanager
+def _qdrant_errors(action):
+    """Translate REST (httpx) and gRPC client errors into VectorStoreError subclasses."""
+    try:
+        yield
+    except VectorStoreError:
+        raise
+    except Exception as e:
+        import httpx
+        from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+        cause = e.source if isinstance(e, ResponseHandlingException) else e
+        if isinstance(cause, UnexpectedResponse):
+            if cause.status_code == 404:
+                raise RecordNotFound(f"{action}: not found") from e
+            raise VectorStoreError(f"{action}: HTTP {cause.status_code} {cause.reason_phrase}") from e
+        if isinstance(cause, httpx.TimeoutException):
+            raise VectorStoreTimeout(f"{action}: timed out") from e
+        if isinstance(cause, httpx.TransportError):
+            raise VectorStoreUnavailable(f"{action}: {cause}") from e
+        import grpc  # installed with qdrant-client
+        if isinstance(cause, grpc.RpcError):
+            code = cause.code()
+            if code == grpc.StatusCode.DEADLINE_EXCEEDED:
+                raise VectorStoreTimeout(f"{action}: timed out") from e
+            if code == grpc.StatusCode.UNAVAILABLE:
+                raise VectorStoreUnavailable(f"{action}: {cause.details()}") from e
+            if code == grpc.StatusCode.NOT_FOUND:
+                raise RecordNotFound(f"{action}: not found") from e
+            raise VectorStoreError(f"{action}: {code.name} {cause.details()}") from e
+        raise VectorStoreError(f"{action}: {e}") from e
+
+@contextmanager
+def _payload_write(action, point_id):
+    """_qdrant_errors for a write, evicting the record from the payload cache even if it fails."""
+    from record_cache import get_record_cache
+    try:
+        with _qdrant_errors(action):
+            yield
+    finally:
+        get_record_cache().invalidate(point_id)
+
+def _record_to_dict(record):
+    # Same shape as the REST point body the callers were written against
+    return {"id": record.id, "payload": record.payload or {}, "vector": record.vector}
+
 # CRUD Operations
 def create_patient_record(point_id, vector, payload_data):
     """Create a new patient record."""
-    url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points"
-    payload = {
-        "points": [
-            {
-                "id": point_id,
-                "vector": vector,
-                "payload": payload_data
-            }
-        ]
-    }
-    headers = {'api-key': QDRANT_API_KEY, 'Content-Type': 'application/json'}
-    try:
-        response = requests.put(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()  # Raise an HTTPError for bad responses
+    from qdrant_client.http.models import PointStruct
+    try:
+        with _payload_write(f"create {point_id}", point_id):
+            result = get_client().upsert(
+                collection_name=COLLECTION_NAME,
+                points=[PointStruct(id=point_id, vector=vector, payload=payload_data)],
+            )
         logging.info(f"Patient record created successfully for ID: {point_id}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return result
+    except VectorStoreError as e:
         logging.error(f"Error creating patient record for ID: {point_id}. Exception: {e}")
         raise
 
-def get_existing_record(point_id):
-    """Retrieve a patient record by point ID."""
-    url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/{point_id}"
-    headers = {'api-key': QDRANT_API_KEY, 'Content-Type': 'application/json'}
+def _payload_selector(include=None, exclude=None):
+    """Qdrant `with_payload` value for an include or exclude list of top-level keys."""
+    from qdrant_client.http.models import PayloadSelectorExclude, PayloadSelectorInclude
+    if include is not None and exclude is not None:
+        raise ValueError("Pass include or exclude, not both")
+    if include is not None:
+        return PayloadSelectorInclude(include=list(include))
+    if exclude is not None:
+        return PayloadSelectorExclude(exclude=list(exclude))
+    return True
+
+def upsert_patient_records(points, wait=True, timeout=QDRANT_TIMEOUT_S):
+    """Upsert many (point_id, vector, payload) tuples in one request.
+
+    With wait=False Qdrant acknowledges once the batch is in its write-ahead
+    log, before it is indexed."""
+    from qdrant_client.http.models import PointStruct
+    from record_cache import get_record_cache
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()["result"]
-    except requests.exceptions.RequestException as e:
+        with _qdrant_errors(f"upsert {len(points)} records"):
+            return get_client().upsert(
+                collection_name=COLLECTION_NAME,
+                points=[PointStruct(id=point_id, vector=vector, payload=payload) for point_id, vector, payload in points],
+                wait=wait,
+                timeout=_call_timeout(timeout),
+            )
+    finally:
+        cache = get_record_cache()
+        for point_id, _, _ in points:
+            cache.invalidate(point_id)
+
+def collection_vector_size(collection_name=COLLECTION_NAME):
+    """Vector size the collection was created with, or None if it does not exist yet."""
+    with _qdrant_errors(f"describe collection {collection_name}"):
+        client = get_client()
+        if not client.collection_exists(collection_name):
+            return None
+        params = client.get_collection(collection_name).config.params.vectors
+    if isinstance(params, dict):  # named vectors; the app only uses the default one
+        params = params.get("") or next(iter(params.values()))
+    return params.size
+
+def existing_point_ids(point_ids, timeout=QDRANT_TIMEOUT_S):
+    """The subset of `point_ids` present in the collection (ints, or UUIDs as canonical strings)."""
+    with _qdrant_errors(f"check {len(point_ids)} records"):
+        records = get_client().retrieve(
+            collection_name=COLLECTION_NAME,
+            ids=list(point_ids),
+            with_payload=False,
+            with_vectors=False,
+            timeout=_call_timeout(timeout),
+        )
+    return {record.id for record in records}
+
+def get_existing_record(point_id, timeout=QDRANT_TIMEOUT_S, include=None, exclude=None, with_vector=True):
+    """Retrieve a patient record by point ID as {"id", "payload", "vector"}.
+
+    `include`/`exclude` limit the payload to (or drop) those top-level keys and
+    with_vector=False leaves out the vector; Qdrant applies both server-side.
+    Raises RecordNotFound when the point does not exist."""
+    with_payload = _payload_selector(include, exclude)
+    try:
+        with _qdrant_errors(f"read {point_id}"):
+            records = get_client().retrieve(
+                collection_name=COLLECTION_NAME,
+                ids=[point_id],
+                with_payload=with_payload,
+                with_vectors=with_vector,
+                timeout=_call_timeout(timeout),
+            )
+        if not records:
+            raise RecordNotFound(f"read {point_id}: not found")
+        return _record_to_dict(records[0])
+    except VectorStoreError as e:
         logging.error(f"Error reading patient record for ID: {point_id}. Exception: {e}")
         raise
 
-def put_patient_record(url, api_key, collection_name, point_id, vector, payload):
+def _payload_variant(include, exclude):
+    # Record cache key for an include/exclude projection
+    return ("include", tuple(include)) if include is not None else \
+        ("exclude", tuple(exclude)) if exclude is not None else None
+
+def get_patient_payload(point_id, timeout=QDRANT_TIMEOUT_S, include=None, exclude=None):
+    """Payload of a patient record, served from the per-worker record cache when fresh.
+
+    Each include/exclude projection is cached separately. Raises RecordNotFound
+    when the point does not exist."""
+    from record_cache import get_record_cache
+    cache = get_record_cache()
+    key = str(point_id)
+    variant = _payload_variant(include, exclude)
+    payload = cache.get(key, variant)
+    if payload is not None:
+        return payload
+    version = cache.version(key)
+    payload = get_existing_record(point_id, timeout=timeout, include=include, exclude=exclude,
+                                  with_vector=False)["payload"]
+    cache.set(key, payload, version, variant)
+    return payload
+
+def patient_point_id(patient_id):
+    """Deterministic point ID for a patient: UUIDv5 of their Postgres patient_id (the payload `guid`).
+
+    ingest_patients.py writes new records under this ID; records created
+    before it keep their random IDs, mapped in patients.qdrant_point_id."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"areya:patient:guid:{patient_id}"))
+
+def find_patient_point_id(guid, name, timeout=QDRANT_TIMEOUT_S):
+    """Point ID of the record whose guid or name matches, or None."""
+    from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+    with _qdrant_errors(f"find patient {guid}"):
+        points, _ = get_client().scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=Filter(should=[
+                FieldCondition(key="guid", match=MatchValue(value=guid)),
+                FieldCondition(key="name", match=MatchValue(value=name)),
+            ]),
+            limit=1,
+            with_payload=False,
+            with_vectors=False,
+            timeout=_call_timeout(timeout),
+        )
+    return points[0].id if points else None
+
+def patient_filter(age_min=None, age_max=None, location=None, conditions=None):
+    """Qdrant filter for the search facets, or None when none is set.
+
+    `conditions` matches records listing any of the given conditions."""
+    from qdrant_client.http.models import FieldCondition, Filter, MatchAny, MatchValue, Range
+    must = []
+    if age_min is not None or age_max is not None:
+        must.append(FieldCondition(key="age", range=Range(gte=age_min, lte=age_max)))
+    if location:
+        must.append(FieldCondition(key="location", match=MatchValue(value=location)))
+    if conditions:
+        must.append(FieldCondition(key="conditions", match=MatchAny(any=list(conditions))))
+    return Filter(must=must) if must else None
+
+def _search_page(points, limit, offset):
+    # One extra point is requested to tell whether another page exists
+    hits = [{"id": point.id, "score": point.score, "payload": point.payload or {}} for point in points[:limit]]
+    next_offset = offset + limit if len(points) > limit and offset + limit <= SEARCH_OFFSET_MAX else None
+    return hits, next_offset
+
+def _search_params():
+    # Quantized storage profiles rescore candidates with the original vectors
+    from qdrant_schema import get_storage_profile
+    return get_storage_profile().search_params()
+
+def _check_page(limit, offset):
+    if not 1 <= limit <= SEARCH_LIMIT_MAX:
+        raise ValueError(f"limit must be between 1 and {SEARCH_LIMIT_MAX}")
+    if not 0 <= offset <= SEARCH_OFFSET_MAX:
+        raise ValueError(f"offset must be between 0 and {SEARCH_OFFSET_MAX}")
+
+def search_patient_records(query_vector, limit=10, offset=0, score_threshold=None, query_filter=None,
+                           include=None, exclude=None, timeout=QDRANT_TIMEOUT_S):
+    """Nearest patient records to `query_vector`, best first.
+
+    Returns (hits, next_offset): hits are {"id", "score", "payload"} dicts,
+    next_offset is None on the last page. Points scoring below
+    `score_threshold` (cosine similarity) are left out."""
+    _check_page(limit, offset)
+    with _qdrant_errors("search patient records"):
+        response = get_client().query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_vector,
+            query_filter=query_filter,
+            limit=limit + 1,
+            offset=offset,
+            score_threshold=score_threshold,
+            search_params=_search_params(),
+            with_payload=_payload_selector(include, exclude),
+            with_vectors=False,
+            timeout=_call_timeout(timeout),
+        )
+    return _search_page(response.points, limit, offset)
+
+def search_patient_records_batch(searches, include=None, exclude=None, timeout=QDRANT_TIMEOUT_S):
+    """Run several searches in one Qdrant batch request.
+
+    `searches` are dicts with "vector" and optional "limit", "offset",
+    "score_threshold" and "filter"; returns one (hits, next_offset) per search,
+    as search_patient_records does."""
+    from qdrant_client.http.models import QueryRequest
+    params = _search_params()
+    pages = []
+    queries = []
+    for search in searches:
+        limit, offset = search.get("limit", 10), search.get("offset", 0)
+        _check_page(limit, offset)
+        pages.append((limit, offset))
+        queries.append(QueryRequest(
+            query=search["vector"],
+            filter=search.get("filter"),
+            limit=limit + 1,
+            offset=offset,
+            score_threshold=search.get("score_threshold"),
+            params=params,
+            with_payload=_payload_selector(include, exclude),
+            with_vector=False,
+        ))
+    with _qdrant_errors(f"search patient records ({len(searches)} queries)"):
+        responses = get_client().query_batch_points(
+            collection_name=COLLECTION_NAME,
+            requests=queries,
+            timeout=_call_timeout(timeout),
+        )
+    return [_search_page(response.points, limit, offset) for response, (limit, offset) in zip(responses, pages)]
+
+def put_patient_record(point_id, vector, payload, collection_name=COLLECTION_NAME):
     """Upserts a patient record into Qdrant."""
-    endpoint = f"{url}/collections/{collection_name}/points"
-    headers = {'api-key': api_key, 'Content-Type': 'application/json'}
-    data = {
-        "points": [
-            {
-                "id": point_id,
-                "vector": vector,
-                "payload": payload
-            }
-        ]
-    }
-    try:
-        response = requests.put(endpoint, json=data, headers=headers)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+    from qdrant_client.http.models import PointStruct
+    try:
+        with _payload_write(f"upsert {point_id}", point_id):
+            get_client().upsert(
+                collection_name=collection_name,
+                points=[PointStruct(id=point_id, vector=vector, payload=payload)],
+            )
+    except VectorStoreError as e:
         logging.error(f"Error upserting record for ID: {point_id}. Exception: {e}")
         raise
 
-def update_patient_record(point_id, updated_payload, new_vector=None):
-    """Update an existing patient record with new data."""
+def set_patient_fields(point_id, fields, timeout=QDRANT_TIMEOUT_S):
+    """Set top-level payload keys of a record; other keys and the vector are untouched."""
+    try:
+        with _payload_write(f"set payload {point_id}", point_id):
+            get_client().set_payload(
+                collection_name=COLLECTION_NAME,
+                payload=fields,
+                points=[point_id],
+                timeout=_call_timeout(timeout),
+            )
+    except VectorStoreError as e:
+        logging.error(f"Error setting payload for ID: {point_id}. Exception: {e}")
+        raise
+
+def overwrite_patient_payload(point_id, payload, timeout=QDRANT_TIMEOUT_S):
+    """Replace the whole payload of a record, keeping its vector."""
+    try:
+        with _payload_write(f"overwrite payload {point_id}", point_id):
+            get_client().overwrite_payload(
+                collection_name=COLLECTION_NAME,
+                payload=payload,
+                points=[point_id],
+                timeout=_call_timeout(timeout),
+            )
+    except VectorStoreError as e:
+        logging.error(f"Error overwriting payload for ID: {point_id}. Exception: {e}")
+        raise
+
+def set_patient_vector(point_id, vector, timeout=QDRANT_TIMEOUT_S):
+    """Replace the vector of a record, keeping its payload."""
+    from qdrant_client.http.models import PointVectors
+    try:
+        with _qdrant_errors(f"update vector {point_id}"):
+            get_client().update_vectors(
+                collection_name=COLLECTION_NAME,
+                points=[PointVectors(id=point_id, vector=vector)],
+                timeout=_call_timeout(timeout),
+            )
+    except VectorStoreError as e:
+        logging.error(f"Error updating vector for ID: {point_id}. Exception: {e}")
+        raise
+
+def get_payload_fields(point_id, keys, timeout=QDRANT_TIMEOUT_S):
+    """Only the given payload keys of a record (no vector); missing keys are omitted."""
+    return get_existing_record(point_id, timeout=timeout, include=keys, with_vector=False)["payload"]
+
+def delete_patient_fields(point_id, keys, timeout=QDRANT_TIMEOUT_S):
+    """Remove payload keys from a record."""
     try:
-        # Retrieve the existing record
-        existing_record = get_existing_record(point_id)
-        existing_payload = existing_record.get("payload", {})
-        existing_vector = existing_record.get("vector", [])
+        with _payload_write(f"delete payload {point_id}", point_id):
+            get_client().delete_payload(
+                collection_name=COLLECTION_NAME,
+                keys=list(keys),
+                points=[point_id],
+                timeout=_call_timeout(timeout),
+            )
+    except VectorStoreError as e:
+        logging.error(f"Error deleting payload keys for ID: {point_id}. Exception: {e}")
+        raise
 
-        # Merge the new data with the existing payload
-        merged_payload = {**existing_payload, **updated_payload}
+def scroll_patient_records(with_payload=True, with_vectors=False, batch_size=256):
+    """Yield every record of the collection as {"id", "payload", "vector"}, one page at a time."""
+    offset = None
+    while True:
+        with _qdrant_errors("scroll patient records"):
+            records, offset = get_client().scroll(
+                collection_name=COLLECTION_NAME,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+        for record in records:
+            yield _record_to_dict(record)
+        if offset is None:
+            return
 
-        # Handle lists explicitly to append data (if needed)
-        for key in updated_payload:
-            if isinstance(existing_payload.get(key), list) and isinstance(updated_payload[key], list):
-                merged_payload[key] = existing_payload[key] + updated_payload[key]
+def update_patient_record(point_id, updated_payload, new_vector=None, append_lists=True):
+    """Update an existing patient record with new data.
 
-        # Use the existing vector if a new one is not provided
-        final_vector = new_vector if new_vector else existing_vector
+    Only the keys in `updated_payload` are written (set_payload), and the vector
+    is sent only when `new_vector` is given. With append_lists, list values are
+    appended to the stored lists; Qdrant has no server-side append, so just those
+    keys are read first. Pass append_lists=False to replace lists instead."""
+    try:
+        fields = dict(updated_payload)
+        list_keys = [key for key, value in updated_payload.items() if isinstance(value, list)]
+        if append_lists and list_keys:
+            existing = get_payload_fields(point_id, list_keys)
+            for key in list_keys:
+                if isinstance(existing.get(key), list):
+                    fields[key] = existing[key] + updated_payload[key]
 
-        # Upsert the merged record back to Qdrant
-        put_patient_record(QDRANT_URL, QDRANT_API_KEY, COLLECTION_NAME, point_id, final_vector, merged_payload)
+        set_patient_fields(point_id, fields)
+        if new_vector:
+            set_patient_vector(point_id, new_vector)
 
         logging.info(f"Patient record with ID '{point_id}' has been updated successfully.")
-        logging.debug(f"Merged Record: {json.dumps(merged_payload, indent=2)}")
+        logging.debug(f"Updated fields: {json.dumps(fields, indent=2)}")
 
     except Exception as e:
         logging.error(f"Failed to update the record for ID: {point_id}. Exception: {e}")
 
 def delete_patient_record(point_id):
     """Delete a patient record by point ID."""
-    url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/delete"
-    payload = {"points": [point_id]}
-    headers = {'api-key': QDRANT_API_KEY, 'Content-Type': 'application/json'}
+    from qdrant_client.http.models import PointIdsList
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
+        with _payload_write(f"delete {point_id}", point_id):
+            result = get_client().delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=PointIdsList(points=[point_id]),
+            )
         logging.info(f"Patient record deleted successfully for ID: {point_id}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return result
+    except VectorStoreError as e:
         logging.error(f"Error deleting patient record for ID: {point_id}. Exception: {e}")
         raise
 
+# Async operations, for code running on an event loop (the agent). They go
+# through get_async_client() and behave like their sync counterparts above:
+# same errors, same payload cache.
+async def aget_existing_record(point_id, timeout=QDRANT_TIMEOUT_S, include=None, exclude=None, with_vector=True):
+    """Async get_existing_record."""
+    try:
+        with _qdrant_errors(f"read {point_id}"):
+            records = await get_async_client().retrieve(
+                collection_name=COLLECTION_NAME,
+                ids=[point_id],
+                with_payload=_payload_selector(include, exclude),
+                with_vectors=with_vector,
+                timeout=_call_timeout(timeout),
+            )
+        if not records:
+            raise RecordNotFound(f"read {point_id}: not found")
+        return _record_to_dict(records[0])
+    except VectorStoreError as e:
+        logging.error(f"Error reading patient record for ID: {point_id}. Exception: {e}")
+        raise
+
+async def aget_patient_payload(point_id, timeout=QDRANT_TIMEOUT_S, include=None, exclude=None):
+    """Async get_patient_payload, sharing its record cache."""
+    from record_cache import get_record_cache
+    cache = get_record_cache()
+    key = str(point_id)
+    variant = _payload_variant(include, exclude)
+    payload = cache.get(key, variant)
+    if payload is not None:
+        return payload
+    version = cache.version(key)
+    record = await aget_existing_record(point_id, timeout=timeout, include=include, exclude=exclude,
+                                        with_vector=False)
+    cache.set(key, record["payload"], version, variant)
+    return record["payload"]
+
+async def aset_patient_fields(point_id, fields, timeout=QDRANT_TIMEOUT_S):
+    """Async set_patient_fields."""
+    try:
+        with _payload_write(f"set payload {point_id}", point_id):
+            await get_async_client().set_payload(
+                collection_name=COLLECTION_NAME,
+                payload=fields,
+                points=[point_id],
+                timeout=_call_timeout(timeout),
+            )
+    except VectorStoreError as e:
+        logging.error(f"Error setting payload for ID: {point_id}. Exception: {e}")
+        raise
+
+async def aupdate_patient_record(point_id, updated_payload, append_lists=True, timeout=QDRANT_TIMEOUT_S):
+    """Async update_patient_record for payload keys; errors are raised, not just logged."""
+    fields = dict(updated_payload)
+    list_keys = [key for key, value in updated_payload.items() if isinstance(value, list)]
+    if append_lists and list_keys:
+        existing = (await aget_existing_record(point_id, timeout=timeout, include=list_keys,
+                                               with_vector=False))["payload"]
+        for key in list_keys:
+            if isinstance(existing.get(key), list):
+                fields[key] = existing[key] + updated_payload[key]
+    await aset_patient_fields(point_id, fields, timeout=timeout)
+    logging.info(f"Patient record with ID '{point_id}' has been updated successfully.")
+
+async def asearch_patient_records(query_vector, limit=10, offset=0, score_threshold=None, query_filter=None,
+                                  include=None, exclude=None, timeout=QDRANT_TIMEOUT_S):
+    """Async search_patient_records; returns (hits, next_offset)."""
+    _check_page(limit, offset)
+    with _qdrant_errors("search patient records"):
+        response = await get_async_client().query_points(
+            collection_name=COLLECTION_NAME,
+            query=query_vector,
+            query_filter=query_filter,
+            limit=limit + 1,
+            offset=offset,
+            score_threshold=score_threshold,
+            search_params=_search_params(),
+            with_payload=_payload_selector(include, exclude),
+            with_vectors=False,
+            timeout=_call_timeout(timeout),
+        )
+    return _search_page(response.points, limit, offset)
+
 def ensure_model_is_pulled(model_name="deepseek-r1:7b"):
     """Ensure the required model is pulled before using it."""
     pull_url = "http://localhost:11434/api/pull"
@@ -151,12 +652,13 @@ def ask_medical_chatbot(user_query, point_id):
     if is_greeting:
         return "Hello! How can I assist you today?"
 
-    # Retrieve context if available
+    # Retrieve the parts of the patient's record relevant to the question, within a token budget
     context = ""
     try:
-        record = get_existing_record(point_id)
-        if record and "payload" in record and "medical_history" in record["payload"]:
-            context = record["payload"]["medical_history"]
+        from patient_context import CONTEXT_FIELDS, build_patient_context
+        patient = build_patient_context(get_patient_payload(point_id, include=CONTEXT_FIELDS), user_query)
+        context = patient.text
+        logging.info(f"Patient context for ID {point_id}: {patient.to_dict()}")
     except Exception as e:
         logging.error(f"Error retrieving context for chatbot for ID: {point_id}. Exception: {e}")
 
@@ -187,7 +689,7 @@ def ask_medical_chatbot(user_query, point_id):
             "• Key considerations\n\n"
             "## Medical Advisory\n"
             "Consult healthcare professionals for personalized medical advice.\n\n"
-            f"Context: {context}\nQuery: {user_query}"
+            f"Patient context:\n{context}\n\nQuery: {user_query}"
         )
 
     # Call Ollama